@@ -1,10 +1,142 @@
 const BTSensor = require("../BTSensor");
 
+// v2 presence mask bits (fields follow the header in this order)
+const V2_TEMPERATURE = 0x01;  // sint16, 0.01°C
+const V2_HUMIDITY = 0x02;     // uint16, 0.01%
+const V2_PRESSURE = 0x04;     // uint24, 0.1 Pa
+const V2_VOLTAGE = 0x08;      // uint16, mV
+const V2_BATTERY = 0x10;      // uint8, %
+
+// v3 channels in mask bit order: [name, bytes, signed, divisor, multiplier]
+const V3_CHANNELS = [
+    ["temperature", 2, true, 100.0, 1],
+    ["humidity", 2, false, 100.0, 1],
+    ["pressure", 3, false, 10.0, 1],
+    ["voltage", 2, false, 1000.0, 1],
+    ["battery", 1, false, 1, 1],
+    ...[0, 1, 2, 3, 4, 5, 6, 7].map((i) => ["probe" + i, 2, true, 100.0, 1]),
+    ["uptime", 2, false, 1, 60],        // sent in minutes, reported in seconds
+    ["mem_free", 2, false, 1, 16],      // sent in 16-byte units, reported in bytes
+    ["overruns", 2, false, 1, 1],
+    ["worst_cycle", 2, false, 1, 1],    // ms
+];
+const V3_FIELDS = V3_CHANNELS.map((ch) => ch[0]);
+const FIELDS = ["temperature", "humidity", "pressure", "voltage", "battery"];
+
+// History frames repeat past broadcasts. A history entry and a live receipt
+// of the same sequence number this close together are the same update (seq
+// wraps after 256 updates, at least 256 s).
+const HISTORY_VERSION = 0x04;
+const SAME_UPDATE_MS = 60000;
+
+// Backfilled updates go to SignalK as deltas through the server app's
+// handleMessage(), on the path each tag's path record holds (defaults below
+// unless configured) and attributed to the device as its live values are
+const PLUGIN_ID = "bt-sensors-plugin-sk";
+const DEFAULT_PATHS = {
+    temperature: "environment.temperature",
+    humidity: "environment.humidity",
+    pressure: "environment.pressure",
+    battery: "sensors.batteryStrength",
+};
+
+// Repeat suppression (DedupCache)
+const DEDUP_MAX_DEVICES = 1024;   // Least recently heard devices evicted beyond this
+const DEDUP_MAX_AGE_MS = 30000;   // Entries expire; unchanged frames re-forwarded this often
+
+// Engineering units to SignalK units (K, ratio, Pa, V, ratio)
+const TO_SIGNALK = {
+    temperature: (t) => parseFloat((273.15 + t).toFixed(2)),
+    humidity: (h) => parseFloat((h / 100.0).toFixed(4)),
+    pressure: (p) => parseFloat(p.toFixed(1)),
+    voltage: (v) => v,
+    battery: (b) => b / 100.0,
+};
+
+/**
+ * Suppresses repeated advertisements before they are decoded. A node
+ * re-advertises each update until the next one (every 100 ms for a 1 s
+ * update), so most frames a receiver sees are exact repeats. Per device
+ * the cache keeps the sequence number of the current update and the raw
+ * bytes last forwarded for each frame slot (the frame index for v3, one
+ * slot per version otherwise); a frame matching its slot under the same
+ * sequence number is a repeat. A new sequence number clears the slots.
+ *
+ * Devices are kept in least recently heard order: those not heard for
+ * maxAgeMs are evicted, as is the oldest one beyond maxDevices. A slot
+ * forwarded more than maxAgeMs ago is forwarded again, so values of a
+ * node without sequence numbers (v1) are still refreshed.
+ */
+class DedupCache {
+    constructor(maxDevices = DEDUP_MAX_DEVICES, maxAgeMs = DEDUP_MAX_AGE_MS) {
+        this.maxDevices = maxDevices;
+        this.maxAgeMs = maxAgeMs;
+        this.devices = new Map();  // device -> { seq, heard, slots: Map(slot -> { data, at }) }
+        this.forwarded = 0;
+        this.suppressed = 0;
+        this.evicted = 0;
+    }
+
+    /**
+     * Note a frame (company ID stripped) received at now. Returns true if
+     * it is new and should be decoded, false if it is a repeat.
+     */
+    check(device, data, now = Date.now()) {
+        let entry = this.devices.get(device);
+        if (entry === undefined) {
+            entry = { seq: null, heard: now, slots: new Map() };
+            this.devices.set(device, entry);
+            this.evict(now);
+        } else {
+            this.devices.delete(device);  // Move to the most recently heard end
+            this.devices.set(device, entry);
+            entry.heard = now;
+        }
+
+        const version = data.length ? data[0] : null;
+        const seq = (version == 2 || version == 3) && data.length > 1 ? data[1] : null;
+        const slot = version == 3 && data.length > 2 ? 0x30 | (data[2] >> 4) : version;
+        if (seq !== null && seq !== entry.seq) {
+            entry.seq = seq;
+            entry.slots.clear();
+        }
+        const last = entry.slots.get(slot);
+        if (last && now - last.at < this.maxAgeMs && last.data.equals(data)) {
+            this.suppressed++;
+            return false;
+        }
+        entry.slots.set(slot, { data: Buffer.from(data), at: now });
+        this.forwarded++;
+        return true;
+    }
+
+    evict(now) {
+        for (const [device, entry] of this.devices) {
+            if (this.devices.size <= this.maxDevices && now - entry.heard < this.maxAgeMs) {
+                break;
+            }
+            this.devices.delete(device);
+            this.evicted++;
+        }
+    }
+}
+
 class ESP32SignalK extends BTSensor {
     static manufacturerID = 0xFFFF;
+    static dedup = new DedupCache();  // Shared by all nodes, keyed by sensor instance
     static Domain = BTSensor.SensorDomains.environmental;
     static Manufacturer = "ESP32";
 
+    /**
+     * config.app is the SignalK server app the plugin was started with:
+     * backfilled updates are published with its handleMessage(), the
+     * server plugin API (see publishBackfill()).
+     */
+    constructor(device, config = {}, gattConfig = {}) {
+        super(device, config, gattConfig);
+        this.app = config.app || null;
+    }
+
     static async identify(device) {
         // Identify by manufacturer ID to avoid GATT connection
         if (await this.getManufacturerID(device) == this.manufacturerID) {
@@ -13,6 +145,225 @@ class ESP32SignalK extends BTSensor {
         return null;
     }
 
+    /**
+     * Decode manufacturer data (company ID already stripped).
+     * Returns engineering units (°C, %, Pa, V, %); missing fields are null.
+     *
+     * v1: [0:Ver=1][1-2:Temp][3-4:Humid][5-8:Press][9:Batt]
+     * v2: [0:Ver=2][1:Seq][2:Mask][fields for each set mask bit...]
+     * v3: [0:Ver=3][1:Seq][2:Index<<4|Count][3-5:Mask][fields...]
+     *     One frame of a multi-frame update; see assemble().
+     * v4: [0:Ver=4][entries...], entry = [Seq][Mask][Age:2 s][v2 fields...]
+     *     History frame rotated with the v3 frames; see backfill().
+     */
+    static decode(buffer) {
+        if (!buffer || buffer.length < 1) {
+            return null;
+        }
+        const values = {
+            version: buffer[0], seq: null,
+            temperature: null, humidity: null, pressure: null, voltage: null, battery: null
+        };
+
+        if (values.version == 0x01) {
+            if (buffer.length < 10) {
+                return null;
+            }
+            values.temperature = buffer.readInt16LE(1) / 100.0;
+            values.humidity = buffer.readUInt16LE(3) / 100.0;
+            values.pressure = buffer.readUInt32LE(5) / 10.0;
+            values.battery = buffer[9];
+            return values;
+        }
+
+        if (values.version == 0x02) {
+            if (buffer.length < 3) {
+                return null;
+            }
+            values.seq = buffer[1];
+            return this.decodeFields(buffer, 3, buffer[2], values) === null ? null : values;
+        }
+
+        if (values.version == 0x03) {
+            return this.decodeFrame(buffer);
+        }
+
+        if (values.version == HISTORY_VERSION) {
+            return this.decodeHistory(buffer);
+        }
+
+        return null;  // Unknown format version
+    }
+
+    // v2 fields for the set mask bits; returns the offset after them (null if short)
+    static decodeFields(buffer, offset, mask, values) {
+        const need = (n) => offset + n <= buffer.length;
+
+        if (mask & V2_TEMPERATURE) {
+            if (!need(2)) return null;
+            values.temperature = buffer.readInt16LE(offset) / 100.0;
+            offset += 2;
+        }
+        if (mask & V2_HUMIDITY) {
+            if (!need(2)) return null;
+            values.humidity = buffer.readUInt16LE(offset) / 100.0;
+            offset += 2;
+        }
+        if (mask & V2_PRESSURE) {
+            if (!need(3)) return null;
+            values.pressure = buffer.readUIntLE(offset, 3) / 10.0;
+            offset += 3;
+        }
+        if (mask & V2_VOLTAGE) {
+            if (!need(2)) return null;
+            values.voltage = buffer.readUInt16LE(offset) / 1000.0;
+            offset += 2;
+        }
+        if (mask & V2_BATTERY) {
+            if (!need(1)) return null;
+            values.battery = buffer[offset];
+            offset += 1;
+        }
+        return offset;
+    }
+
+    static decodeHistory(buffer) {
+        const entries = [];
+        let offset = 1;
+        while (offset < buffer.length) {
+            if (offset + 4 > buffer.length) {
+                return null;
+            }
+            const entry = Object.fromEntries(FIELDS.map((name) => [name, null]));
+            entry.seq = buffer[offset];
+            entry.age = buffer.readUInt16LE(offset + 2);
+            offset = this.decodeFields(buffer, offset + 4, buffer[offset + 1], entry);
+            if (offset === null) {
+                return null;
+            }
+            entries.push(entry);
+        }
+        return { version: HISTORY_VERSION, entries: entries };
+    }
+
+    static decodeFrame(buffer) {
+        if (buffer.length < 6) {
+            return null;
+        }
+        const values = { version: 3, seq: buffer[1], frame: buffer[2] >> 4, frames: buffer[2] & 0x0F };
+        const mask = buffer.readUIntLE(3, 3);
+        let offset = 6;
+        for (let bit = 0; bit < V3_CHANNELS.length; bit++) {
+            const [name, size, signed, divisor, multiplier] = V3_CHANNELS[bit];
+            values[name] = null;
+            if (!(mask & (1 << bit))) {
+                continue;
+            }
+            if (offset + size > buffer.length) {
+                return null;
+            }
+            const raw = signed ? buffer.readIntLE(offset, size) : buffer.readUIntLE(offset, size);
+            values[name] = divisor == 1 ? raw * multiplier : raw / divisor;
+            offset += size;
+        }
+        return values;
+    }
+
+    /**
+     * Merge a v3 frame into the current snapshot. Frames of one update
+     * share a sequence number; the update is complete once all of its
+     * frame indexes have been seen. Channel values carry over between
+     * updates, so the snapshot always holds the latest known values.
+     */
+    assemble(values) {
+        if (!this._snapshot) {
+            this._snapshot = Object.fromEntries(V3_FIELDS.map((name) => [name, null]));
+            this._snapshot.version = 3;
+            this._snapshot.seq = null;
+            this._seen = 0;
+            this._done = false;
+            this.snapshotsComplete = 0;
+            this.snapshotsIncomplete = 0;
+        }
+        const snapshot = this._snapshot;
+        if (values.seq !== snapshot.seq) {
+            if (this._seen && !this._done) {
+                this.snapshotsIncomplete++;
+            }
+            snapshot.seq = values.seq;
+            this._seen = 0;
+            this._done = false;
+        }
+        const bit = 1 << values.frame;
+        if (!(this._seen & bit)) {
+            for (const name of V3_FIELDS) {
+                if (values[name] !== null) {
+                    snapshot[name] = values[name];
+                }
+            }
+            this._seen |= bit;
+            if (this._seen == (1 << values.frames) - 1) {
+                this._done = true;
+                this.snapshotsComplete++;
+            }
+        }
+        return snapshot;
+    }
+
+    /**
+     * Updates missed live, recovered from a history frame. Live updates
+     * (noted by decoded()) and history entries are tracked by sequence
+     * number and time; an entry not seen within SAME_UPDATE_MS of its
+     * broadcast time (receipt time minus its age) is returned once, as
+     * { timestamp, values } with values in SignalK units by path name.
+     */
+    backfill(history, now = Date.now()) {
+        const seen = this.seenAt();
+        const updates = [];
+        for (const entry of history.entries) {
+            const timestamp = now - entry.age * 1000;
+            const last = seen[entry.seq];
+            if (last !== null && Math.abs(timestamp - last) <= SAME_UPDATE_MS) {
+                continue;
+            }
+            seen[entry.seq] = timestamp;
+            const values = {};
+            for (const name of FIELDS) {
+                if (entry[name] !== null) {
+                    values[name] = TO_SIGNALK[name](entry[name]);
+                }
+            }
+            updates.push({ timestamp: new Date(timestamp).toISOString(), values: values });
+        }
+        this.updatesBackfilled = (this.updatesBackfilled || 0) + updates.length;
+        return updates;
+    }
+
+    seenAt() {
+        if (!this._seenAt) {
+            this._seenAt = new Array(256).fill(null);  // Time each seq was received or backfilled
+        }
+        return this._seenAt;
+    }
+
+    // Decode once per advertisement, shared by all path readers
+    decoded(buffer) {
+        if (buffer !== this._lastBuffer) {
+            this._lastBuffer = buffer;
+            const values = this.constructor.decode(buffer);
+            if (values && values.seq !== null && values.seq !== undefined
+                    && FIELDS.some((name) => values[name] !== null)) {
+                const seen = this.seenAt();
+                const now = Date.now();
+                if (seen[values.seq] === null || Math.abs(now - seen[values.seq]) > SAME_UPDATE_MS) {
+                    seen[values.seq] = now;
+                }
+            }
+            this._lastDecoded = values && values.version == 3 ? this.assemble(values) : values;
+        }
+        return this._lastDecoded;
+    }
+
     hasGATT() {
         return false;  // Using advertisements, not GATT
     }
@@ -27,33 +378,124 @@ class ESP32SignalK extends BTSensor {
 
         // Get manufacturer data buffer
         const md = this.valueIfVariant(this.getManufacturerData(this.constructor.manufacturerID));
-        
-        if (!md || md.length < 10) {
+
+        if (!md || !this.constructor.decode(md)) {
             throw new Error("ESP32-SK: Invalid or missing manufacturer data");
         }
 
-        // Temperature: sint16, units of 0.01°C, convert to Kelvin  
-        // Buffer: [0:Ver][1-2:Temp][3-4:Humid][5-8:Press][9:Batt]
-        this.addDefaultPath("temperature", "environment.temperature")
-        .read=(buffer)=> buffer && buffer.length >= 3 ? parseFloat((273.15 + buffer.readInt16LE(1)/100.0).toFixed(2)) : null
+        const field = (buffer, name) => {
+            const values = this.decoded(buffer);
+            return values ? values[name] : null;
+        };
+
+        // Path records of the SignalK tags, kept for publishBackfill()
+        this.tagPaths = {};
+        const path = (tag) => (this.tagPaths[tag] = this.addDefaultPath(tag, DEFAULT_PATHS[tag]));
+
+        // Temperature: °C, convert to Kelvin
+        path("temperature")
+        .read=(buffer)=> { const t = field(buffer, "temperature"); return t === null ? null : TO_SIGNALK.temperature(t) }
 
-        // Humidity: uint16, units of 0.01%, convert to ratio (0-1)
-        this.addDefaultPath("humidity", "environment.humidity")
-        .read=(buffer)=> buffer && buffer.length >= 5 ? parseFloat((buffer.readUInt16LE(3)/10000.0).toFixed(4)) : null
+        // Humidity: %, convert to ratio (0-1)
+        path("humidity")
+        .read=(buffer)=> { const h = field(buffer, "humidity"); return h === null ? null : TO_SIGNALK.humidity(h) }
+
+        // Pressure: Pa
+        path("pressure")
+        .read=(buffer)=> { const p = field(buffer, "pressure"); return p === null ? null : TO_SIGNALK.pressure(p) }
+
+        // Supply voltage: V (v2 only)
+        this.addMetadatum("voltage", "V", "supply voltage")
+        .read=(buffer)=> field(buffer, "voltage")
+
+        // Battery: %, convert to ratio (0-1) (v2 only; v1 sends a placeholder)
+        path("battery")
+        .read=(buffer)=> { const b = field(buffer, "battery"); const v = this.decoded(buffer); return b === null || v.version < 2 ? null : b / 100.0 }
+
+        // DS18B20 probes: °C, convert to Kelvin (v3 only)
+        for (let i = 0; i < 8; i++) {
+            this.addMetadatum("probe" + i, "K", "probe " + i + " temperature")
+            .read=(buffer)=> { const t = field(buffer, "probe" + i); return t === undefined || t === null ? null : parseFloat((273.15 + t).toFixed(2)) }
+        }
 
-        // Pressure: uint32, units of 0.1 Pa
-        this.addDefaultPath("pressure", "environment.pressure")
-        .read=(buffer)=> buffer && buffer.length >= 9 ? parseFloat((buffer.readUInt32LE(5)/10.0).toFixed(1)) : null
+        // Diagnostics (v3 only)
+        this.addMetadatum("uptime", "s", "time since boot")
+        .read=(buffer)=> field(buffer, "uptime") ?? null
+        this.addMetadatum("memFree", "B", "free heap memory")
+        .read=(buffer)=> field(buffer, "mem_free") ?? null
+        this.addMetadatum("overruns", "", "scheduler overruns")
+        .read=(buffer)=> field(buffer, "overruns") ?? null
+        this.addMetadatum("worstCycle", "ms", "worst cycle time (deadline to done)")
+        .read=(buffer)=> field(buffer, "worst_cycle") ?? null
 
         return this;
     }
 
+    /**
+     * Publish updates recovered from a history frame (see backfill()) as
+     * one SignalK delta: an update per entry, stamped with its broadcast
+     * time and attributed to this device, on the paths the live values of
+     * each tag go to. Live values are emitted per tag and stamped on
+     * arrival by the plugin, which has no way to carry an earlier
+     * timestamp, so the delta goes straight to the server through
+     * app.handleMessage().
+     */
+    publishBackfill(updates) {
+        const updatesOut = [];
+        for (const update of updates) {
+            const values = [];
+            for (const [tag, value] of Object.entries(update.values)) {
+                const path = this.pathFor(tag);
+                if (path) {
+                    values.push({ path: path, value: value });
+                }
+            }
+            if (values.length) {
+                updatesOut.push({ $source: this.source(), timestamp: update.timestamp, values: values });
+            }
+        }
+        if (updatesOut.length && this.app) {
+            this.app.handleMessage(PLUGIN_ID, { updates: updatesOut });
+        }
+        return updatesOut.length;
+    }
+
+    // Path a tag is published on: the one its path record holds, as the
+    // plugin's live values use it (configured, else the default)
+    pathFor(tag) {
+        const record = this.tagPaths && this.tagPaths[tag];
+        return (record && record.path) || null;
+    }
+
+    // $source of this device's deltas
+    source() {
+        return PLUGIN_ID + "." + this.getMacAddress();
+    }
+
+    /**
+     * Repeats of a frame already emitted are dropped before decoding (see
+     * DedupCache). History frames are not live values: the updates they
+     * recover are published with their original timestamps (see
+     * publishBackfill()).
+     */
     propertiesChanged(props) {
         super.propertiesChanged(props);
         if (props.ManufacturerData) {
-            this.emitValuesFrom(this.getManufacturerData(this.constructor.manufacturerID));
+            const md = this.getManufacturerData(this.constructor.manufacturerID);
+            const buffer = this.valueIfVariant(md);
+            if (buffer && !this.constructor.dedup.check(this, buffer)) {
+                return;
+            }
+            const values = this.decoded(buffer);
+            if (values && values.version == HISTORY_VERSION) {
+                this.publishBackfill(this.backfill(values));
+                return;
+            }
+            this.emitValuesFrom(md);
         }
     }
 }
 
+ESP32SignalK.DedupCache = DedupCache;
+
 module.exports = ESP32SignalK;
@@ -8,10 +8,14 @@ Uses a simple custom format that's easy to parse.
 import bluetooth
 import struct
 import time
+from array import array
 from micropython import const
 
 # Import configuration
 import config
+import log
+from history import History
+from profiler import STAGE_ENCODE, STAGE_RADIO
 
 # BLE Event Constants
 _IRQ_CENTRAL_CONNECT = const(1)
@@ -22,105 +26,852 @@ _ADV_TYPE_FLAGS = const(0x01)
 _ADV_TYPE_NAME = const(0x09)
 _ADV_TYPE_MANUFACTURER = const(0xFF)
 
+# Manufacturer data formats
+# v1 (12 bytes, fixed slots): company ID, version, then the value fields
+_V1_DATA_LEN = const(12)
+_V1_VALUES_FMT = '<hHIB'     # Temperature, humidity, pressure, battery
+# v2 (5-15 bytes): company ID, version, sequence, presence mask, then only
+# the fields whose mask bit is set, in channel order
+_V2_HEADER_LEN = const(5)
+_V2_MAX_LEN = const(15)
+
+# Channels: index into the value arrays and bit number in the v2 mask
+_CH_TEMPERATURE = const(0)   # sint16, 0.01 °C
+_CH_HUMIDITY = const(1)      # uint16, 0.01 %
+_CH_PRESSURE = const(2)      # uint24 (v2) / uint32 (v1), 0.1 Pa
+_CH_VOLTAGE = const(3)       # uint16, mV (v2 only)
+_CH_BATTERY = const(4)       # uint8, % (v2; v1 sends 100 if unknown)
+_NUM_CHANNELS = const(5)
+
+# v3 (multi-frame): the channel set is spread over up to 15 frames that are
+# rotated on air. Each frame is a complete advertisement:
+#   [Flags AD][Mfg AD header][company ID][0x03][seq][index<<4 | count]
+#   [24-bit channel mask][fields for the set bits, in channel order]
+# All frames of one update share the sequence number, so a receiver has a
+# full snapshot once it has seen `count` frames with the same seq. The
+# device name moves to the scan response.
+_V3_MFG_OFFSET = const(5)          # Company ID, after flags + mfg AD header
+_V3_FIELDS_OFFSET = const(13)      # After company ID, version, seq, frame, mask
+_V3_MAX_FIELDS = const(18)         # 31 - 13
+_CH_PROBE0 = const(5)              # 5-12: DS18B20 probes, sint16, 0.01 °C
+_MAX_PROBES = const(8)
+_CH_UPTIME = const(13)             # uint16, minutes
+_CH_MEM_FREE = const(14)           # uint16, 16-byte units
+_CH_OVERRUNS = const(15)           # uint16, scheduler overruns
+_CH_WORST_CYCLE = const(16)        # uint16, worst cycle time (ms)
+_V3_DIAG_MASK = const(0x1E000)     # Diagnostics channels 13-16
+
+# History frame (rotated with the v3 frames): past broadcasts, so a receiver
+# that missed an update can backfill it at its original time.
+#   [Flags AD][Mfg AD header][company ID][0x04][entries...]
+# Entry: [seq][mask][age, uint16 seconds][fields for the set mask bits, as
+# in v2]. Ages are refreshed every time the frame goes on air.
+_HISTORY_VERSION = const(4)
+_HISTORY_ENTRIES_OFFSET = const(8)  # After company ID and version
+_HISTORY_MAX_BYTES = const(23)      # 31 - 8
+_HISTORY_ENTRY_HEADER = const(4)    # seq, mask, age
+
+# Rotation policies
+ROTATE_ROUND_ROBIN = const(0)      # 0, 1, 2, 0, 1, 2, ...
+ROTATE_PRIMARY = const(1)          # 0, 1, 0, 2, 0, 1, ... (frame 0 every other slot)
+
+ROTATION_POLICIES = {
+    'round_robin': ROTATE_ROUND_ROBIN,
+    'primary': ROTATE_PRIMARY,
+}
+
 class BLEAdvertiser:
     """Simple BLE Advertiser for sensor data"""
     
-    def __init__(self):
+    # Channel names and scale to encoded units (index = channel number)
+    CHANNELS = ('temperature', 'humidity', 'pressure', 'voltage', 'battery')
+    SCALES = (100, 100, 10, 1000, 1)
+    
+    def __init__(self, activate=True):
+        """
+        Args:
+            activate: Power up the radio now. With False (deep-sleep duty
+                      cycle) it is powered up by the first broadcast, so a
+                      wake with nothing new to send never turns it on.
+        """
         self.ble = bluetooth.BLE()
+        self.radio_on = False
+        if activate:
+            self.activate()
+        
+        # Preallocated advertisement payload (see _build_payload)
+        # Format 1 or 2 (format 3 is FrameAdvertiser)
+        self.format_version = 1 if config.ADV_FORMAT_VERSION == 1 else 2
+        self._build_payload()
+        self._length = 0                # Manufacturer data length on air
+        
+        # Adaptive interval: level 0 is the fast floor used after a change;
+        # each quiet ADV_EVENTS_PER_LEVEL events the interval doubles, up to
+        # the ceiling. Fixed at BLE_ADVERTISING_INTERVAL_MS if not adaptive.
+        if config.ADV_ADAPTIVE:
+            levels = [config.ADV_INTERVAL_FLOOR_MS]
+            while levels[-1] < config.ADV_INTERVAL_CEILING_MS:
+                levels.append(min(levels[-1] * 2, config.ADV_INTERVAL_CEILING_MS))
+        else:
+            levels = [config.BLE_ADVERTISING_INTERVAL_MS]
+        self.intervals = tuple(levels)
+        self.level_ms = array('q', [0] * len(levels))   # Time spent per level (ms)
+        self._level = 0
+        self._level_start_ms = time.ticks_ms()
+        self._events_per_level = config.ADV_EVENTS_PER_LEVEL
+        self._interval_us = levels[0] * 1000
+        
+        # Current and last broadcast values, in encoded units
+        # (0.01°C, 0.01%, 0.1 Pa, mV, %), plus which channels were present
+        count = len(self.CHANNELS)
+        self._values = array('l', [0] * count)
+        self._last_values = array('l', [0] * count)
+        self._last_mask = 0
+        self.seq = 0                    # Rolling sequence number (v2+)
+        
+        # Change detection deadbands, in encoded units
+        deadbands = config.ADV_DEADBANDS
+        self._deadbands = array('l', [
+            int(round(deadbands.get(name, 0) * scale))
+            for name, scale in zip(self.CHANNELS, self.SCALES)
+        ])
+        self._watch_mask = (1 << count) - 1     # Channels that trigger a broadcast
+        self._max_stale_ms = config.ADV_MAX_STALE_MS
+        self._last_adv_ms = 0
+        self.profiler = None            # Optional Profiler for encode/radio timing
+        
+        # Counters
+        self.adv_count = 0              # Radio re-programmed
+        self.skip_count = 0             # Re-programs avoided (within deadband)
+        self.stale_count = 0            # Re-programs forced by ADV_MAX_STALE_MS
+        
+        log.info("[BLE] Advertiser initialized")
+    
+    def activate(self):
+        """Power up the radio (no-op if already on)"""
+        if self.radio_on:
+            return
         self.ble.active(True)
         self.ble.irq(self._irq_handler)
-        
-        if config.DEBUG_BLE:
-            print("[BLE] Advertiser initialized")
+        self.radio_on = True
     
     def _irq_handler(self, event, data):
         """Handle BLE events"""
         if event == _IRQ_CENTRAL_CONNECT:
-            if config.DEBUG_BLE:
-                print("[BLE] Device tried to connect (not accepting connections)")
+            log.warn("[BLE] Device tried to connect (not accepting connections)")
         elif event == _IRQ_CENTRAL_DISCONNECT:
             # Resume advertising after disconnect
             pass
     
-    def advertise_sensor_data(self, temperature=None, humidity=None, pressure=None):
+    def _build_payload(self):
+        """Build the advertisement buffer once; only the values change later
+        
+        Layout: [Flags AD][Name AD][Manufacturer AD header][Manufacturer data]
+        The flags/name header and the company ID/version bytes are constant,
+        so advertise_sensor_data only rewrites the value fields in place.
+        
+        v2 payloads vary in length, so a memoryview of the buffer is
+        prepared for every possible length - handing one to gap_advertise
+        allocates nothing.
+        """
+        name = config.DEVICE_NAME.encode('utf-8')
+        header_len = 3 + 2 + len(name) + 2
+        max_len = _V1_DATA_LEN if self.format_version == 1 else _V2_MAX_LEN
+        buf = bytearray(header_len + max_len)
+        
+        # Flags
+        struct.pack_into('BBB', buf, 0, 2, _ADV_TYPE_FLAGS, 0x06)
+        
+        # Complete name
+        struct.pack_into('BB', buf, 3, len(name) + 1, _ADV_TYPE_NAME)
+        buf[5:5 + len(name)] = name
+        
+        # Manufacturer data header + company ID (0xFFFF = test/custom) + version
+        offset = 5 + len(name)
+        struct.pack_into('<BBHB', buf, offset, max_len + 1, _ADV_TYPE_MANUFACTURER,
+                         0xFFFF, self.format_version)
+        
+        self._adv_data = buf
+        self._mfg_len_offset = offset
+        self._values_offset = offset + 2 + 3   # After company ID and version
+        
+        view = memoryview(buf)
+        self._views = tuple(view[:offset + 2 + n] for n in range(max_len + 1))
+    
+    def advertise_sensor_data(self, temperature=None, humidity=None, pressure=None,
+                              voltage=None, battery=None):
         """
         Advertise sensor data in manufacturer-specific data format
         
-        Format (12 bytes):
+        Format v1 (12 bytes):
         - Bytes 0-1: Company ID (0xFFFF for testing/custom)
         - Byte 2: Data format version (0x01)
         - Bytes 3-4: Temperature in 0.01°C (sint16)
         - Bytes 5-6: Humidity in 0.01% (uint16)
         - Bytes 7-10: Pressure in 0.1 Pa (uint32)
         - Byte 11: Battery level 0-100% (uint8)
-        """
+        Missing values are sent as zero (battery as 100).
         
-        # Build manufacturer data
-        mfg_data = bytearray()
+        Format v2 (5-15 bytes):
+        - Bytes 0-1: Company ID (0xFFFF for testing/custom)
+        - Byte 2: Data format version (0x02)
+        - Byte 3: Sequence number (uint8, +1 per changed broadcast)
+        - Byte 4: Presence mask, then one field per set bit, in bit order:
+          - bit 0: Temperature in 0.01°C (sint16)
+          - bit 1: Humidity in 0.01% (uint16)
+          - bit 2: Pressure in 0.1 Pa (uint24)
+          - bit 3: Voltage in mV (uint16)
+          - bit 4: Battery level 0-100% (uint8)
         
-        # Company ID (0xFFFF = test/custom)
-        mfg_data.extend(struct.pack('<H', 0xFFFF))
+        The payload is written in place into the buffer built at init, and
+        that same buffer is handed to gap_advertise (the BLE stack copies it
+        into the controller), so a call allocates nothing.
         
-        # Format version
-        mfg_data.append(0x01)
+        The radio is left alone while every value is within its deadband
+        (config.ADV_DEADBANDS) of the last broadcast and that broadcast is
+        younger than config.ADV_MAX_STALE_MS.
         
-        # Temperature (sint16, 0.01°C)
-        if temperature is not None:
-            temp_int = int(temperature * 100)
-            mfg_data.extend(struct.pack('<h', temp_int))
-        else:
-            mfg_data.extend(b'\x00\x00')
+        Values are rounded to the nearest encoded unit; advertise_readings()
+        takes readings already in those units.
         
-        # Humidity (uint16, 0.01%)
-        if humidity is not None:
-            humid_int = int(humidity * 100)
-            mfg_data.extend(struct.pack('<H', humid_int))
+        Args:
+            temperature: Celsius
+            humidity: Percent
+            pressure: Pascals
+            voltage: Volts
+            battery: Percent (0-100)
+        
+        Returns:
+            bool: True if the advertisement was updated, False if skipped
+        """
+        return self._send(self._load_values(temperature, humidity, pressure, voltage, battery))
+    
+    def advertise_readings(self, readings):
+        """Advertise a readings record (SensorHandler.latest)
+        
+        The record holds fixed-point integers in the encoded units
+        (0.01 °C, 0.01 %, 0.1 Pa, mV, %), which go into the payload as
+        they are.
+        
+        Returns:
+            bool: True if the advertisement was updated, False if skipped
+        """
+        return self._send(self._load_scaled(readings.temperature, readings.humidity,
+                                            readings.pressure, readings.voltage,
+                                            readings.battery))
+    
+    def _send(self, mask):
+        """Broadcast the loaded values unless change detection skips them"""
+        profiler = self.profiler
+        if profiler:
+            mark = time.ticks_us()
+        if not self._commit(mask):
+            if profiler:
+                profiler.record(STAGE_ENCODE, mark)
+            return False
+        
+        mask = self._last_mask
+        if self.format_version == 1:
+            length = self._encode_v1(mask)
         else:
-            mfg_data.extend(b'\x00\x00')
+            length = self._encode_v2(mask)
+        if profiler:
+            mark = profiler.record(STAGE_ENCODE, mark)
+        
+        # Start advertising with data
+        self._length = length
+        self.ble.gap_advertise(self._interval_us, adv_data=self._views[length])
+        if profiler:
+            profiler.record(STAGE_RADIO, mark)
+        
+        if __debug__:
+            values = self._values
+            log.debug("[BLE] Advertising seq {}: T={} H={} P={} (0.01°C, 0.01%, 0.1Pa)", self.seq,
+                      values[_CH_TEMPERATURE], values[_CH_HUMIDITY], values[_CH_PRESSURE])
+        
+        return True
+    
+    def _load_values(self, temperature, humidity, pressure, voltage, battery):
+        """Round readings in natural units (floats) to encoded units
+        
+        Returns:
+            int: Presence mask (bit n set = channel n has a value)
+        """
+        return self._load_scaled(
+            None if temperature is None else round(temperature * 100),
+            None if humidity is None else round(humidity * 100),
+            None if pressure is None else round(pressure * 10),
+            None if voltage is None else round(voltage * 1000),
+            None if battery is None else round(battery))
+    
+    def _load_scaled(self, temperature, humidity, pressure, voltage, battery):
+        """Load readings in encoded units (ints) into self._values
         
-        # Pressure (uint32, 0.1 Pa)
+        Clamps with comparisons rather than min()/max(), which build an
+        argument tuple per call.
+        
+        Returns:
+            int: Presence mask (bit n set = channel n has a value)
+        """
+        values = self._values
+        mask = 0
+        if temperature is not None:
+            values[_CH_TEMPERATURE] = temperature
+            mask |= 1 << _CH_TEMPERATURE
+        if humidity is not None:
+            values[_CH_HUMIDITY] = humidity
+            mask |= 1 << _CH_HUMIDITY
         if pressure is not None:
-            press_int = int(pressure * 10)
-            mfg_data.extend(struct.pack('<I', press_int))
+            values[_CH_PRESSURE] = 0 if pressure < 0 else 0xFFFFFF if pressure > 0xFFFFFF else pressure
+            mask |= 1 << _CH_PRESSURE
+        if voltage is not None:
+            values[_CH_VOLTAGE] = 0 if voltage < 0 else 0xFFFF if voltage > 0xFFFF else voltage
+            mask |= 1 << _CH_VOLTAGE
+        if battery is not None:
+            values[_CH_BATTERY] = 0 if battery < 0 else 100 if battery > 100 else battery
+            mask |= 1 << _CH_BATTERY
+        return mask
+    
+    def _commit(self, mask):
+        """Decide whether the loaded values need a new broadcast
+        
+        Skips (returns False) if the same channels are present and nothing
+        moved beyond its deadband since the last broadcast, unless that
+        broadcast is older than ADV_MAX_STALE_MS. Otherwise records the
+        values as broadcast and advances the sequence number.
+        
+        Also steps the adaptive interval: a change drops it to the floor,
+        quiet periods back it off (re-advertising the current payload at
+        the new interval).
+        """
+        now = time.ticks_ms()
+        changed = (not self.adv_count or mask != self._last_mask
+                   or not self._within_deadbands(mask))
+        if not changed:
+            if time.ticks_diff(now, self._last_adv_ms) < self._max_stale_ms:
+                self.skip_count += 1
+                if self._adapt(now, False) and self.radio_on:
+                    self._readvertise()
+                return False
+            self.stale_count += 1
+        self._adapt(now, changed)
+        
+        values = self._values
+        last = self._last_values
+        for ch in range(len(values)):
+            last[ch] = values[ch]
+        self._last_mask = mask
+        self._last_adv_ms = now
+        self.adv_count += 1
+        self.seq = (self.seq + 1) & 0xFF
+        if not self.radio_on:
+            self.activate()
+        return True
+    
+    def _adapt(self, now, changed):
+        """Update the interval level; returns True if the interval changed"""
+        level = self._level
+        if changed:
+            new_level = 0
         else:
-            mfg_data.extend(b'\x00\x00\x00\x00')
+            held = time.ticks_diff(now, self._level_start_ms)
+            if (level + 1 >= len(self.intervals)
+                    or held < self._events_per_level * self.intervals[level]):
+                return False
+            new_level = level + 1
         
-        # Battery level (placeholder - always 100% for now)
-        mfg_data.append(100)
+        # Account the time spent at the current level, (re)start the new one
+        self.level_ms[level] += time.ticks_diff(now, self._level_start_ms)
+        self._level_start_ms = now
+        if new_level == level:
+            return False
+        self._level = new_level
+        self._interval_us = self.intervals[new_level] * 1000
+        return True
+    
+    def _readvertise(self):
+        """Put the current payload back on air (after an interval change)"""
+        self.ble.gap_advertise(self._interval_us, adv_data=self._views[self._length])
+    
+    def interval_ms(self):
+        """Current advertising interval"""
+        return self.intervals[self._level]
+    
+    def save_state(self):
+        """Change-detection state to carry across deep sleep
         
-        # Build complete advertisement payload
-        adv_data = bytearray()
+        Returns:
+            tuple: (seq, mask, values, since_ms) - sequence number, presence
+                   mask and values (array, encoded units) of the last
+                   broadcast, and milliseconds since it was made
+        """
+        since_ms = time.ticks_diff(time.ticks_ms(), self._last_adv_ms) if self.adv_count else -1
+        return self.seq, self._last_mask, self._last_values, since_ms
+    
+    def restore_state(self, seq, mask, values, since_ms):
+        """Resume from save_state() output after a deep-sleep wake
         
-        # Flags
-        adv_data.extend(struct.pack('BBB', 2, _ADV_TYPE_FLAGS, 0x06))
+        The next broadcast then continues the sequence and is skipped if
+        nothing moved beyond its deadband (unless it is stale by then).
         
-        # Complete name
-        name = config.DEVICE_NAME.encode('utf-8')
-        adv_data.extend(struct.pack('BB', len(name) + 1, _ADV_TYPE_NAME))
-        adv_data.extend(name)
+        Args:
+            seq: Sequence number of the last broadcast
+            mask: Presence mask of the last broadcast
+            values: Encoded values of the last broadcast
+            since_ms: Milliseconds since the last broadcast (-1 = never)
+        """
+        self.seq = seq
+        if since_ms < 0:
+            return
+        last = self._last_values
+        for ch in range(min(len(last), len(values))):
+            last[ch] = values[ch]
+        self._last_mask = mask
+        self._last_adv_ms = time.ticks_add(time.ticks_ms(), -min(since_ms, self._max_stale_ms))
+        self.adv_count = 1
+    
+    def _within_deadbands(self, mask):
+        """True if every present channel is within its deadband"""
+        values = self._values
+        last = self._last_values
+        deadbands = self._deadbands
+        mask &= self._watch_mask
+        for ch in range(len(values)):
+            if mask & (1 << ch) and abs(values[ch] - last[ch]) > deadbands[ch]:
+                return False
+        return True
+    
+    def _encode_v1(self, mask):
+        """Write the v1 fixed-slot fields; returns manufacturer data length"""
+        values = self._values
+        struct.pack_into(_V1_VALUES_FMT, self._adv_data, self._values_offset,
+                         values[_CH_TEMPERATURE] if mask & (1 << _CH_TEMPERATURE) else 0,
+                         values[_CH_HUMIDITY] if mask & (1 << _CH_HUMIDITY) else 0,
+                         values[_CH_PRESSURE] if mask & (1 << _CH_PRESSURE) else 0,
+                         values[_CH_BATTERY] if mask & (1 << _CH_BATTERY) else 100)
+        return _V1_DATA_LEN
+    
+    def _encode_v2(self, mask):
+        """Write the v2 header and present fields; returns manufacturer data length"""
+        buf = self._adv_data
+        values = self._values
+        offset = self._values_offset
         
-        # Manufacturer data
-        adv_data.extend(struct.pack('BB', len(mfg_data) + 1, _ADV_TYPE_MANUFACTURER))
-        adv_data.extend(mfg_data)
+        buf[offset] = self.seq
+        buf[offset + 1] = mask
+        offset += 2
         
-        # Start advertising with data
-        self.ble.gap_advertise(
-            config.BLE_ADVERTISING_INTERVAL_MS * 1000,  # interval in microseconds
-            adv_data=bytes(adv_data)
-        )
+        if mask & (1 << _CH_TEMPERATURE):
+            struct.pack_into('<h', buf, offset, values[_CH_TEMPERATURE])
+            offset += 2
+        if mask & (1 << _CH_HUMIDITY):
+            struct.pack_into('<H', buf, offset, values[_CH_HUMIDITY])
+            offset += 2
+        if mask & (1 << _CH_PRESSURE):
+            pressure = values[_CH_PRESSURE]
+            struct.pack_into('<HB', buf, offset, pressure & 0xFFFF, pressure >> 16)
+            offset += 3
+        if mask & (1 << _CH_VOLTAGE):
+            struct.pack_into('<H', buf, offset, values[_CH_VOLTAGE])
+            offset += 2
+        if mask & (1 << _CH_BATTERY):
+            buf[offset] = values[_CH_BATTERY]
+            offset += 1
+        
+        length = offset - self._mfg_len_offset - 2
+        buf[self._mfg_len_offset] = length + 1
+        return length
+    
+    def get_stats(self):
+        """Get change-detection counters
         
-        if config.DEBUG_BLE:
-            print(f"[BLE] Advertising: T={temperature}°C H={humidity}% P={pressure/100:.1f}hPa")
+        Returns:
+            dict: advertised, skipped and stale-refresh counts, the current
+                  interval, time spent at each interval (ms) and the
+                  advertising events that amounts to
+        """
+        level_ms = list(self.level_ms)
+        level_ms[self._level] += time.ticks_diff(time.ticks_ms(), self._level_start_ms)
+        events = 0
+        for ms, interval in zip(level_ms, self.intervals):
+            events += ms // interval
+        return {
+            'advertised': self.adv_count,
+            'skipped': self.skip_count,
+            'stale_refreshes': self.stale_count,
+            'interval_ms': self.intervals[self._level],
+            'interval_time_ms': dict(zip(self.intervals, level_ms)),
+            'adv_events': events,
+        }
     
     def stop_advertising(self):
         """Stop BLE advertising"""
         self.ble.gap_advertise(None)
-        if config.DEBUG_BLE:
-            print("[BLE] Advertising stopped")
+        log.info("[BLE] Advertising stopped")
     
     def deinit(self):
         """Cleanup and deactivate BLE"""
-        self.stop_advertising()
-        self.ble.active(False)
-        if config.DEBUG_BLE:
-            print("[BLE] Advertiser deactivated")
+        if self.radio_on:
+            self.stop_advertising()
+            self.ble.active(False)
+            self.radio_on = False
+        log.info("[BLE] Advertiser deactivated")
+
+
+class FrameAdvertiser(BLEAdvertiser):
+    """Multi-frame (v3) advertiser for larger channel sets
+    
+    Besides the environment channels it carries up to eight DS18B20 probes
+    and a few diagnostics values, packed into as few frames as the present
+    channels need. The frames are encoded together when the values change
+    and rotate on air every ADV_FRAME_ROTATE_MS (see rotate()).
+    
+    With ADV_HISTORY_DEPTH set, a history frame joins the rotation: it
+    carries a window of the broadcasts before the current one (the
+    ADV_HISTORY_CHANNELS values, sequence number and age), and the window
+    moves on each time the frame comes round.
+    """
+    
+    CHANNELS = BLEAdvertiser.CHANNELS + tuple('probe%d' % i for i in range(_MAX_PROBES)) + (
+        'uptime', 'mem_free', 'overruns', 'worst_cycle')
+    SCALES = BLEAdvertiser.SCALES + (100,) * _MAX_PROBES + (1, 1, 1, 1)
+    # Encoded field size per channel (bytes on air)
+    SIZES = (2, 2, 3, 2, 1) + (2,) * _MAX_PROBES + (2, 2, 2, 2)
+    
+    def __init__(self, activate=True):
+        self._max_probes = min(_MAX_PROBES, config.ADV_MAX_PROBES)
+        self._frame_fields = min(_V3_MAX_FIELDS, config.ADV_FRAME_BYTES)
+        
+        # History of past broadcasts (entry 0 is the one on air)
+        self._hist_mask = 0
+        entry = _HISTORY_ENTRY_HEADER
+        for name in config.ADV_HISTORY_CHANNELS:
+            ch = BLEAdvertiser.CHANNELS.index(name)
+            self._hist_mask |= 1 << ch
+            entry += self.SIZES[ch]
+        self._hist_per_frame = _HISTORY_MAX_BYTES // entry
+        depth = config.ADV_HISTORY_DEPTH
+        self.history = History(depth + 1, _NUM_CHANNELS) if depth and self._hist_mask else None
+        super().__init__(activate)
+        self.format_version = 3
+        
+        # Diagnostics only ride along with updates; they never trigger one
+        self._diag_mask = _V3_DIAG_MASK if config.ADV_DIAGNOSTICS else 0
+        self._watch_mask &= ~_V3_DIAG_MASK
+        
+        self._policy = ROTATION_POLICIES[config.ADV_ROTATION_POLICY]
+        self._rotate_ms = config.ADV_FRAME_ROTATE_MS
+        self._held = 0                  # Rotation slots the frame has been on air
+        self.frame_count = 0            # Frames in the current update
+        self._frame = 0                 # Frame on air
+        self._slot = 0                  # Rotation slot since the last update
+        self.rotations = 0              # Frame switches
+    
+    def _build_payload(self):
+        """Build one advertisement buffer per possible frame, plus the scan response
+        
+        The flags, manufacturer header, company ID and version are written
+        once; _encode_frames only fills in seq, frame byte, mask and fields.
+        As in the single-frame formats, a memoryview per possible length
+        keeps gap_advertise allocation-free.
+        """
+        # Worst case frame count: every channel present
+        frames = 1
+        used = 0
+        for ch in range(len(self.CHANNELS)):
+            if _CH_PROBE0 + self._max_probes <= ch < _CH_UPTIME:
+                continue
+            if ch >= _CH_UPTIME and not config.ADV_DIAGNOSTICS:
+                break
+            if used + self.SIZES[ch] > self._frame_fields:
+                frames += 1
+                used = 0
+            used += self.SIZES[ch]
+        
+        self._frames = []
+        self._frame_views = []
+        for _ in range(frames):
+            buf = bytearray(_V3_FIELDS_OFFSET + self._frame_fields)
+            struct.pack_into('<BBBBBHB', buf, 0, 2, _ADV_TYPE_FLAGS, 0x06,
+                             0, _ADV_TYPE_MANUFACTURER, 0xFFFF, 3)
+            view = memoryview(buf)
+            self._frames.append(buf)
+            self._frame_views.append(tuple(view[:_V3_FIELDS_OFFSET + n]
+                                           for n in range(self._frame_fields + 1)))
+        self._frame_lengths = array('B', bytes(frames))
+        
+        if self.history is not None:
+            buf = bytearray(_HISTORY_ENTRIES_OFFSET + _HISTORY_MAX_BYTES)
+            struct.pack_into('<BBBBBHB', buf, 0, 2, _ADV_TYPE_FLAGS, 0x06,
+                             0, _ADV_TYPE_MANUFACTURER, 0xFFFF, _HISTORY_VERSION)
+            view = memoryview(buf)
+            self._hist_buf = buf
+            self._hist_views = tuple(view[:_HISTORY_ENTRIES_OFFSET + n]
+                                     for n in range(_HISTORY_MAX_BYTES + 1))
+        
+        # Scan response: complete name (only sent to active scanners)
+        name = config.DEVICE_NAME.encode('utf-8')
+        self._scan_resp = bytes((len(name) + 1, _ADV_TYPE_NAME)) + name
+    
+    def advertise_readings(self, readings):
+        """Advertise a readings record (SensorHandler.latest, with probes)
+        
+        Fixed-point integers in the encoded units go into the payload as
+        they are (see BLEAdvertiser.advertise_readings).
+        """
+        mask = self._load_scaled(readings.temperature, readings.humidity,
+                                 readings.pressure, readings.voltage, readings.battery)
+        return self._send(mask | self._load_probes(readings.probes, 1))
+    
+    def advertise_sensor_data(self, temperature=None, humidity=None, pressure=None,
+                              voltage=None, battery=None, probes=None):
+        """
+        Encode all frames and put the first on air
+        
+        Change detection works as for the single-frame formats, over the
+        environment and probe channels. The latest set_diagnostics() values
+        are included in every update.
+        
+        Args:
+            temperature: Celsius
+            humidity: Percent
+            pressure: Pascals
+            voltage: Volts
+            battery: Percent (0-100)
+            probes: List of probe temperatures in Celsius (None = no reading)
+        
+        Returns:
+            bool: True if the advertisement was updated, False if skipped
+        """
+        mask = self._load_values(temperature, humidity, pressure, voltage, battery)
+        return self._send(mask | self._load_probes(probes, 100))
+    
+    def _load_probes(self, probes, scale):
+        """Load probe temperatures (x scale = 0.01 °C); returns their mask bits"""
+        mask = 0
+        if probes:
+            values = self._values
+            count = len(probes)
+            if count > self._max_probes:
+                count = self._max_probes
+            for i in range(count):
+                if probes[i] is not None:
+                    values[_CH_PROBE0 + i] = round(probes[i] * scale)
+                    mask |= 1 << (_CH_PROBE0 + i)
+        return mask
+    
+    def _send(self, mask):
+        """Encode all frames and put the first on air, unless skipped"""
+        profiler = self.profiler
+        if profiler:
+            mark = time.ticks_us()
+        mask |= self._diag_mask
+        
+        if not self._commit(mask):
+            if profiler:
+                profiler.record(STAGE_ENCODE, mark)
+            return False
+        
+        self._encode_frames(mask)
+        if profiler:
+            mark = profiler.record(STAGE_ENCODE, mark)
+        self._slot = 0
+        self._show(0)
+        if profiler:
+            profiler.record(STAGE_RADIO, mark)
+        
+        if __debug__:
+            values = self._values
+            log.debug("[BLE] Advertising seq {}: T={} H={} in {} frames (0.01°C, 0.01%)",
+                      self.seq, values[_CH_TEMPERATURE], values[_CH_HUMIDITY], self.frame_count)
+        return True
+    
+    def _commit(self, mask):
+        """As BLEAdvertiser._commit, also recording the broadcast in the history"""
+        if not super()._commit(mask):
+            return False
+        if self.history is not None:
+            self.history.push(self.seq, mask, self._values, self._last_adv_ms)
+        return True
+    
+    def set_diagnostics(self, uptime_s, mem_free, overruns, worst_cycle_ms):
+        """Update the diagnostics channels (sent with the next update)
+        
+        Args:
+            uptime_s: Seconds since boot
+            mem_free: Free heap in bytes
+            overruns: Scheduler overrun count
+            worst_cycle_ms: Worst cycle time (deadline to done) in milliseconds
+        """
+        # Called every housekeeping tick: clamp with comparisons, not min()
+        values = self._values
+        uptime_min = uptime_s // 60
+        mem_free >>= 4
+        values[_CH_UPTIME] = 0xFFFF if uptime_min > 0xFFFF else uptime_min
+        values[_CH_MEM_FREE] = 0xFFFF if mem_free > 0xFFFF else mem_free
+        values[_CH_OVERRUNS] = 0xFFFF if overruns > 0xFFFF else overruns
+        values[_CH_WORST_CYCLE] = 0xFFFF if worst_cycle_ms > 0xFFFF else worst_cycle_ms
+    
+    def _encode_frames(self, mask):
+        """Pack the present channels into frames, in channel order"""
+        values = self._values
+        sizes = self.SIZES
+        lengths = self._frame_lengths
+        end = _V3_FIELDS_OFFSET + self._frame_fields
+        
+        frame = 0
+        buf = self._frames[0]
+        offset = _V3_FIELDS_OFFSET
+        frame_mask = 0
+        for ch in range(len(values)):
+            bit = 1 << ch
+            if not mask & bit:
+                continue
+            size = sizes[ch]
+            if offset + size > end:
+                self._close_frame(buf, frame_mask, offset)
+                lengths[frame] = offset - _V3_FIELDS_OFFSET
+                frame += 1
+                buf = self._frames[frame]
+                offset = _V3_FIELDS_OFFSET
+                frame_mask = 0
+            
+            value = values[ch]
+            if size == 1:
+                buf[offset] = value
+            elif size == 3:
+                struct.pack_into('<HB', buf, offset, value & 0xFFFF, value >> 16)
+            elif ch == _CH_TEMPERATURE or _CH_PROBE0 <= ch < _CH_UPTIME:
+                struct.pack_into('<h', buf, offset, value)
+            else:
+                struct.pack_into('<H', buf, offset, value)
+            offset += size
+            frame_mask |= bit
+        
+        self._close_frame(buf, frame_mask, offset)
+        lengths[frame] = offset - _V3_FIELDS_OFFSET
+        
+        # Frame count is known only now: stamp seq and index/count everywhere
+        count = frame + 1
+        for i in range(count):
+            buf = self._frames[i]
+            buf[8] = self.seq
+            buf[9] = (i << 4) | count
+        self.frame_count = count
+    
+    @staticmethod
+    def _close_frame(buf, frame_mask, offset):
+        """Write a frame's channel mask and manufacturer AD length"""
+        buf[10] = frame_mask & 0xFF
+        buf[11] = (frame_mask >> 8) & 0xFF
+        buf[12] = frame_mask >> 16
+        buf[3] = offset - 4     # AD length: type byte + manufacturer data
+    
+    def _encode_history(self):
+        """Write the current window of past broadcasts into the history frame
+        
+        Returns:
+            memoryview: The frame, ready for gap_advertise
+        """
+        history = self.history
+        buf = self._hist_buf
+        per_frame = self._hist_per_frame
+        windows = (history.count - 2) // per_frame + 1      # Over entries 1..count-1
+        history.window %= windows
+        first = 1 + history.window * per_frame
+        now = time.ticks_ms()
+        values = history.values
+        offset = _HISTORY_ENTRIES_OFFSET
+        last = first + per_frame
+        if last > history.count:
+            last = history.count
+        for n in range(first, last):
+            i = history.slot(n)
+            mask = history.masks[i] & self._hist_mask
+            struct.pack_into('<BBH', buf, offset, history.seqs[i], mask,
+                             (history.age_ms(i, now) + 500) // 1000)
+            offset += _HISTORY_ENTRY_HEADER
+            base = i * _NUM_CHANNELS
+            if mask & (1 << _CH_TEMPERATURE):
+                struct.pack_into('<h', buf, offset, values[base + _CH_TEMPERATURE])
+                offset += 2
+            if mask & (1 << _CH_HUMIDITY):
+                struct.pack_into('<H', buf, offset, values[base + _CH_HUMIDITY])
+                offset += 2
+            if mask & (1 << _CH_PRESSURE):
+                pressure = values[base + _CH_PRESSURE]
+                struct.pack_into('<HB', buf, offset, pressure & 0xFFFF, pressure >> 16)
+                offset += 3
+            if mask & (1 << _CH_VOLTAGE):
+                struct.pack_into('<H', buf, offset, values[base + _CH_VOLTAGE])
+                offset += 2
+            if mask & (1 << _CH_BATTERY):
+                buf[offset] = values[base + _CH_BATTERY]
+                offset += 1
+        buf[3] = offset - 4     # AD length: type byte + manufacturer data
+        return self._hist_views[offset - _HISTORY_ENTRIES_OFFSET]
+    
+    def _show(self, frame):
+        """Put a frame on air (frame_count = the history frame)"""
+        self._frame = frame
+        self._held = 0
+        if frame == self.frame_count:
+            adv_data = self._encode_history()
+        else:
+            adv_data = self._frame_views[frame][self._frame_lengths[frame]]
+        self.ble.gap_advertise(self._interval_us, adv_data=adv_data, resp_data=self._scan_resp)
+    
+    def _readvertise(self):
+        self._show(self._frame)
+    
+    def slots(self):
+        """Rotation slots per pass: the data frames, plus the history frame
+        once there is a past broadcast to send"""
+        history = self.history
+        if history is not None and history.count > 1:
+            return self.frame_count + 1
+        return self.frame_count
+    
+    def next_frame(self):
+        """Frame the rotation policy puts in the next slot"""
+        count = self.slots()
+        slot = self._slot + 1
+        if self._policy == ROTATE_PRIMARY and count > 2:
+            if slot & 1:
+                return 1 + (slot >> 1) % (count - 1)
+            return 0
+        return slot % count
+    
+    def rotate(self):
+        """Advance the rotation by one slot (call every ADV_FRAME_ROTATE_MS)
+        
+        A frame stays on air for at least one advertising interval, so at
+        the slower adaptive intervals the rotation slows down with it. Each
+        time the history frame comes round it carries the next window of
+        past broadcasts.
+        
+        Returns:
+            bool: True if a different frame was put on air
+        """
+        if self.slots() < 2:
+            return False
+        self._held += 1
+        if self._held * self._rotate_ms < self.intervals[self._level]:
+            return False
+        frame = self.next_frame()
+        self._slot += 1
+        if frame == self._frame:
+            return False
+        if frame == self.frame_count:
+            self.history.window += 1
+        self._show(frame)
+        self.rotations += 1
+        return True
+    
+    def get_stats(self):
+        """Get change-detection and rotation counters"""
+        stats = super().get_stats()
+        stats['frames'] = self.frame_count
+        stats['rotations'] = self.rotations
+        stats['history'] = self.history.count - 1 if self.history is not None else 0
+        return stats
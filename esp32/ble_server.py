@@ -0,0 +1,387 @@
+"""
+ESP32 BLE GATT Server
+=====================
+Connectable mode (main.py): the Environmental Sensing Service (0x181A)
+with temperature, humidity and pressure characteristics (read + notify),
+plus a custom service with one packed characteristic that carries every
+reading, so a central gets a whole update in a single notification.
+
+Packed value: a v3 advertisement frame (docs/ble_protocol.md), so the
+receivers decode it with the code they already have:
+    [0x03][seq][index<<4 | count][24-bit channel mask][fields...]
+Channels are temperature, humidity, pressure, voltage, battery and the
+DS18B20 probes, in the advertisement units. When the value does not fit a
+connection's ATT MTU it is notified as several frames with the same seq.
+
+Notifications only go out for values that changed, and at most once per
+GATT_NOTIFY_MIN_INTERVAL_MS per connection; changes in between are
+coalesced into the next notification. Values are encoded in place into
+buffers built at init.
+"""
+
+import bluetooth
+import struct
+import time
+from array import array
+from micropython import const
+
+import config
+import log
+
+# BLE Event Constants
+_IRQ_CENTRAL_CONNECT = const(1)
+_IRQ_CENTRAL_DISCONNECT = const(2)
+_IRQ_MTU_EXCHANGED = const(21)
+
+# Characteristic flags
+_FLAG_READ = const(0x0002)
+_FLAG_NOTIFY = const(0x0010)
+
+# BLE Advertising Constants
+_ADV_TYPE_FLAGS = const(0x01)
+_ADV_TYPE_UUID16_COMPLETE = const(0x03)
+_ADV_TYPE_NAME = const(0x09)
+
+_DEFAULT_MTU = const(23)
+_ATT_HEADER = const(3)              # Opcode + handle in every notification
+
+# Channels, as in the v3 advertisement mask (0-4 environment, 5-12 probes)
+_CH_TEMPERATURE = const(0)
+_CH_HUMIDITY = const(1)
+_CH_PRESSURE = const(2)
+_CH_VOLTAGE = const(3)
+_CH_BATTERY = const(4)
+_CH_PROBE0 = const(5)
+_MAX_PROBES = const(8)
+_NUM_CHANNELS = const(13)
+_SIZES = (2, 2, 3, 2, 1) + (2,) * _MAX_PROBES
+
+# Packed value: v3 frame header, then the fields
+_PACKED_VERSION = const(3)
+_PACKED_HEADER = const(6)
+_PACKED_MAX_LEN = const(32)         # Header + every channel
+
+# ESS characteristics: channel, UUID, struct format (value in ESS units)
+_ESS_CHARACTERISTICS = (
+    (_CH_TEMPERATURE, config.TEMPERATURE_CHAR_UUID, '<h'),     # 0.01 °C
+    (_CH_HUMIDITY, config.HUMIDITY_CHAR_UUID, '<H'),           # 0.01 %
+    (_CH_PRESSURE, config.PRESSURE_CHAR_UUID, '<I'),           # 0.1 Pa
+)
+
+
+class Connection:
+    """Notification state of one connected central"""
+    
+    def __init__(self, handle):
+        self.handle = handle
+        self.mtu = _DEFAULT_MTU         # ATT MTU (until the exchange completes)
+        self.pending = 0                # Channels changed since the last notification
+        self.last_ms = None             # ticks_ms of the last notification
+        self.notifications = 0
+
+
+class BLEServer:
+    """GATT server for sensor readings"""
+    
+    def __init__(self):
+        self.ble = bluetooth.BLE()
+        self.ble.active(True)
+        self.ble.irq(self._irq_handler)
+        
+        # Preferred MTU, requested from each central on connect
+        self.mtu = config.BLE_MTU
+        if self.mtu > _DEFAULT_MTU:
+            self.ble.config(mtu=self.mtu)
+        
+        ess = (bluetooth.UUID(config.ENV_SENSING_SERVICE_UUID), tuple(
+            (bluetooth.UUID(uuid), _FLAG_READ | _FLAG_NOTIFY) for _, uuid, _ in _ESS_CHARACTERISTICS))
+        packed = (bluetooth.UUID(config.CUSTOM_SERVICE_UUID),
+                  ((bluetooth.UUID(config.CUSTOM_DATA_CHAR_UUID), _FLAG_READ | _FLAG_NOTIFY),))
+        ess_handles, (self._packed_handle,) = self.ble.gatts_register_services((ess, packed))
+        self.ble.gatts_set_buffer(self._packed_handle, _PACKED_MAX_LEN)
+        
+        # ESS values: (channel, value handle, buffer, format) per characteristic
+        self._ess = tuple(
+            (ch, handle, bytearray(struct.calcsize(fmt)), fmt)
+            for (ch, _, fmt), handle in zip(_ESS_CHARACTERISTICS, ess_handles))
+        
+        # Packed value, plus a frame buffer for splitting it; memoryviews
+        # per length keep gatts_write/gatts_notify allocation-free
+        self._packed = bytearray(_PACKED_MAX_LEN)
+        self._packed[0] = _PACKED_VERSION
+        self._packed_len = _PACKED_HEADER
+        self._split = bytearray(_PACKED_MAX_LEN)
+        self._split[0] = _PACKED_VERSION
+        self._packed_mv = memoryview(self._packed)
+        self._packed_views = tuple(self._packed_mv[:n] for n in range(_PACKED_MAX_LEN + 1))
+        self._split_views = tuple(memoryview(self._split)[:n] for n in range(_PACKED_MAX_LEN + 1))
+        self._frame_ends = array('B', bytes(_NUM_CHANNELS + 1))   # Field offset where each frame ends
+        
+        # Current values (encoded units) and which channels are present
+        self._values = array('l', [0] * _NUM_CHANNELS)
+        self._mask = 0
+        self.seq = 0
+        
+        self._notify_packed = config.GATT_NOTIFY_PACKED
+        self._min_interval_ms = config.GATT_NOTIFY_MIN_INTERVAL_MS
+        self._max_connections = config.GATT_MAX_CONNECTIONS
+        self._connections = {}          # conn_handle -> Connection
+        
+        # Counters
+        self.updates = 0                # Updates with a changed value
+        self.notifications = 0
+        self.notify_bytes = 0           # ATT bytes notified (header included)
+        self.deferred = 0               # Connection updates held back by the rate limit
+        
+        self._build_advertisement()
+        log.info("[BLE] GATT server initialized (MTU {}, {} notifications)", self.mtu,
+                 "packed" if self._notify_packed else "per characteristic")
+    
+    def _build_advertisement(self):
+        """Flags, complete name and the ESS UUID (built once)"""
+        name = config.DEVICE_NAME.encode('utf-8')
+        uuid = config.ENV_SENSING_SERVICE_UUID
+        self._adv_data = bytes((2, _ADV_TYPE_FLAGS, 0x06, len(name) + 1, _ADV_TYPE_NAME)) + name + \
+            bytes((3, _ADV_TYPE_UUID16_COMPLETE, uuid & 0xFF, uuid >> 8))
+    
+    def _irq_handler(self, event, data):
+        """Handle BLE events"""
+        if event == _IRQ_CENTRAL_CONNECT:
+            conn_handle, _, _ = data
+            self._connections[conn_handle] = Connection(conn_handle)
+            log.info("[BLE] Central connected (handle {})", conn_handle)
+            if self.mtu > _DEFAULT_MTU:
+                try:
+                    self.ble.gattc_exchange_mtu(conn_handle)
+                except OSError as e:
+                    log.warn("[BLE] MTU exchange failed: {}", e)
+            if len(self._connections) < self._max_connections:
+                self.start_advertising()
+        elif event == _IRQ_CENTRAL_DISCONNECT:
+            conn_handle, _, _ = data
+            self._connections.pop(conn_handle, None)
+            log.info("[BLE] Central disconnected (handle {})", conn_handle)
+            self.start_advertising()
+        elif event == _IRQ_MTU_EXCHANGED:
+            conn_handle, mtu = data
+            conn = self._connections.get(conn_handle)
+            if conn is not None:
+                conn.mtu = mtu
+            log.info("[BLE] MTU {} on handle {}", mtu, conn_handle)
+    
+    def update(self, readings):
+        """Publish a readings record (SensorHandler.latest)
+        
+        Changed values are written to their characteristics at once (so
+        reads are always current) and notified to every connected central
+        whose rate limit allows it; the others get them, coalesced, on a
+        later call. Call regularly, also when nothing changed, so deferred
+        notifications go out.
+        
+        Args:
+            readings: Fixed-point integers in the encoded units (0.01 °C,
+                      0.01 %, 0.1 Pa, mV, %), None = no value
+        
+        Returns:
+            int: Notifications sent
+        """
+        changed = self._load(readings)
+        if changed:
+            self.seq = (self.seq + 1) & 0xFF
+            self._encode(changed)
+            self.updates += 1
+        
+        now = time.ticks_ms()
+        sent = 0
+        for conn in self._connections.values():
+            conn.pending |= changed
+            if not conn.pending:
+                continue
+            if conn.last_ms is not None and \
+                    time.ticks_diff(now, conn.last_ms) < self._min_interval_ms:
+                if changed:
+                    self.deferred += 1
+                continue
+            sent += self._notify(conn)
+            conn.pending = 0
+            conn.last_ms = now
+        return sent
+    
+    def _load(self, readings):
+        """Load a readings record into self._values
+        
+        Returns:
+            int: Mask of channels whose value or presence changed
+        """
+        changed = self._set(_CH_TEMPERATURE, readings.temperature)
+        changed |= self._set(_CH_HUMIDITY, readings.humidity)
+        changed |= self._set(_CH_PRESSURE, readings.pressure)
+        changed |= self._set(_CH_VOLTAGE, readings.voltage)
+        changed |= self._set(_CH_BATTERY, readings.battery)
+        probes = readings.probes
+        count = min(len(probes), _MAX_PROBES) if probes else 0
+        for i in range(_MAX_PROBES):
+            changed |= self._set(_CH_PROBE0 + i, probes[i] if i < count else None)
+        return changed
+    
+    def _set(self, ch, value):
+        """Store one channel; returns its bit if it changed"""
+        bit = 1 << ch
+        if value is None:
+            if self._mask & bit:
+                self._mask &= ~bit
+                return bit
+            return 0
+        if self._mask & bit and self._values[ch] == value:
+            return 0
+        self._values[ch] = value
+        self._mask |= bit
+        return bit
+    
+    def _encode(self, changed):
+        """Write the changed ESS characteristics and the packed value"""
+        values = self._values
+        mask = self._mask
+        for ch, handle, buf, fmt in self._ess:
+            if changed & mask & (1 << ch):
+                value = values[ch]
+                struct.pack_into(fmt, buf, 0, value if ch == _CH_TEMPERATURE else max(0, value))
+                self.ble.gatts_write(handle, buf)
+        
+        buf = self._packed
+        buf[1] = self.seq
+        buf[2] = 0x01                       # Frame 0 of 1
+        buf[3] = mask & 0xFF
+        buf[4] = (mask >> 8) & 0xFF
+        buf[5] = mask >> 16
+        offset = _PACKED_HEADER
+        for ch in range(_NUM_CHANNELS):
+            if not mask & (1 << ch):
+                continue
+            value = values[ch]
+            size = _SIZES[ch]
+            if size == 1:
+                buf[offset] = min(100, max(0, value))
+            elif size == 3:
+                value = min(0xFFFFFF, max(0, value))
+                struct.pack_into('<HB', buf, offset, value & 0xFFFF, value >> 16)
+            elif ch == _CH_TEMPERATURE or ch >= _CH_PROBE0:
+                struct.pack_into('<h', buf, offset, value)
+            else:
+                struct.pack_into('<H', buf, offset, min(0xFFFF, max(0, value)))
+            offset += size
+        self._packed_len = offset
+        self.ble.gatts_write(self._packed_handle, self._packed_views[offset])
+    
+    def _notify(self, conn):
+        """Notify a connection of its pending changes; returns notifications sent"""
+        try:
+            if not self._notify_packed:
+                sent = 0
+                for ch, handle, buf, _ in self._ess:
+                    if conn.pending & self._mask & (1 << ch):
+                        self.ble.gatts_notify(conn.handle, handle)
+                        self.notify_bytes += _ATT_HEADER + len(buf)
+                        sent += 1
+            elif self._packed_len <= conn.mtu - _ATT_HEADER:
+                self.ble.gatts_notify(conn.handle, self._packed_handle,
+                                      self._packed_views[self._packed_len])
+                self.notify_bytes += _ATT_HEADER + self._packed_len
+                sent = 1
+            else:
+                sent = self._notify_split(conn)
+        except OSError as e:
+            log.error("[BLE] ERROR notifying handle {}: {}", conn.handle, e)
+            return 0
+        conn.notifications += sent
+        self.notifications += sent
+        return sent
+    
+    def _notify_split(self, conn):
+        """Notify the packed value as several frames that each fit the MTU"""
+        # Frame boundaries, in one pass over the present channels: the
+        # count goes in every frame header, so it is needed up front
+        room = conn.mtu - _ATT_HEADER - _PACKED_HEADER
+        ends = self._frame_ends
+        mask = self._mask
+        count = 0
+        start = offset = _PACKED_HEADER
+        for ch in range(_NUM_CHANNELS):
+            if mask & (1 << ch):
+                if offset + _SIZES[ch] - start > room:
+                    ends[count] = offset
+                    count += 1
+                    start = offset
+                offset += _SIZES[ch]
+        ends[count] = offset
+        count += 1
+        
+        packed = self._packed_mv
+        buf = self._split
+        buf[1] = self.seq
+        ch = 0
+        start = _PACKED_HEADER
+        for index in range(count):
+            end = ends[index]
+            # Channels in this frame: those whose fields lie in start..end
+            frame_mask = 0
+            offset = start
+            while offset < end:
+                if mask & (1 << ch):
+                    frame_mask |= 1 << ch
+                    offset += _SIZES[ch]
+                ch += 1
+            buf[2] = (index << 4) | count
+            buf[3] = frame_mask & 0xFF
+            buf[4] = (frame_mask >> 8) & 0xFF
+            buf[5] = frame_mask >> 16
+            length = _PACKED_HEADER + end - start
+            buf[_PACKED_HEADER:length] = packed[start:end]
+            self.ble.gatts_notify(conn.handle, self._packed_handle, self._split_views[length])
+            self.notify_bytes += _ATT_HEADER + length
+            start = end
+        return count
+    
+    def is_connected(self):
+        """True while at least one central is connected"""
+        return bool(self._connections)
+    
+    def start_advertising(self):
+        """Advertise as connectable (name and ESS UUID)"""
+        self.ble.gap_advertise(config.BLE_ADVERTISING_INTERVAL_MS * 1000, adv_data=self._adv_data,
+                               connectable=True)
+    
+    def stop_advertising(self):
+        """Stop BLE advertising"""
+        self.ble.gap_advertise(None)
+        log.info("[BLE] Advertising stopped")
+    
+    def get_stats(self):
+        """Get notification counters
+        
+        Returns:
+            dict: updates, notifications and ATT bytes sent, updates held
+                  back by the rate limit, and per connection its MTU and
+                  notification count
+        """
+        return {
+            'updates': self.updates,
+            'notifications': self.notifications,
+            'notify_bytes': self.notify_bytes,
+            'deferred': self.deferred,
+            'connections': {
+                handle: {'mtu': conn.mtu, 'notifications': conn.notifications}
+                for handle, conn in self._connections.items()
+            },
+        }
+    
+    def deinit(self):
+        """Disconnect, stop advertising and deactivate BLE"""
+        for handle in list(self._connections):
+            try:
+                self.ble.gap_disconnect(handle)
+            except OSError:
+                pass
+        self.stop_advertising()
+        self.ble.active(False)
+        log.info("[BLE] GATT server deactivated")
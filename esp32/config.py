@@ -28,15 +28,94 @@ CUSTOM_DATA_CHAR_UUID = "12345678-1234-5678-1234-56789abcdef1"
 # BLE Settings
 BLE_ADVERTISING_INTERVAL_MS = 100  # Milliseconds between advertisements
 BLE_CONNECTION_INTERVAL_MS = 50    # Preferred connection interval
-BLE_MTU = 23                        # Maximum Transmission Unit (default BLE is 23)
+BLE_MTU = 64                        # Preferred ATT MTU, requested on connect (23 = BLE default, no exchange)
+
+# GATT Server (main.py)
+# Values are notified only when they change, at most once per
+# GATT_NOTIFY_MIN_INTERVAL_MS per central (changes in between coalesce).
+# Packed: one notification of the all-readings characteristic
+# (CUSTOM_DATA_CHAR_UUID, v3 frame layout) instead of one per ESS value.
+GATT_NOTIFY_PACKED = True           # Notify the packed characteristic instead of each ESS one
+GATT_NOTIFY_MIN_INTERVAL_MS = 1000  # Per-connection minimum time between notifications
+GATT_MAX_CONNECTIONS = 2            # Keep advertising until this many centrals are connected
+
+# Advertisement Format
+# 1 = legacy 12-byte fixed layout, 2 = presence mask + sequence number,
+# 3 = rotating multi-frame (adds probes, diagnostics and history).
+# 2 and 3 are opt-in: receivers must run the updated ESP32SignalK_adv.js
+# first (older copies only decode 1), and with 3 the device name moves to
+# the scan response, which passive scanners never request.
+ADV_FORMAT_VERSION = 1
+
+# Multi-frame Advertisements (format 3)
+ADV_FRAME_ROTATE_MS = 300           # Time each frame stays on air (milliseconds)
+ADV_ROTATION_POLICY = 'round_robin' # 'round_robin' or 'primary' (frame 0 every other slot)
+ADV_FRAME_BYTES = 18                # Field bytes per frame (max 18; fewer = shorter packets)
+ADV_MAX_PROBES = 8                  # DS18B20 probes carried (max 8)
+ADV_DIAGNOSTICS = True              # Send uptime, free memory, overruns, worst cycle
+ADV_HISTORY_DEPTH = 8               # Past broadcasts re-sent for receiver backfill (0 = off)
+ADV_HISTORY_CHANNELS = ('temperature', 'humidity', 'pressure')  # Values per history entry
+
+# Advertisement Change Detection
+# The radio is only re-programmed when a value moves more than its deadband
+# away from the last broadcast value, or when the broadcast gets too old.
+ADV_DEADBANDS = {
+    'temperature': 0.05,            # Degrees Celsius
+    'humidity': 0.5,                # Percentage
+    'pressure': 10.0,               # Pascals
+    'voltage': 0.05,                # Volts
+    'battery': 1,                   # Percentage
+}
+ADV_MAX_STALE_MS = 30000            # Re-advertise at least this often (milliseconds)
+
+# Adaptive Advertising Interval
+# After a change the node advertises at the floor interval; every
+# ADV_EVENTS_PER_LEVEL quiet advertising events the interval doubles, up to
+# the ceiling. Off = fixed BLE_ADVERTISING_INTERVAL_MS.
+ADV_ADAPTIVE = True
+ADV_INTERVAL_FLOOR_MS = 100         # Fastest interval, right after a change
+ADV_INTERVAL_CEILING_MS = 2000      # Slowest interval, once readings settle
+ADV_EVENTS_PER_LEVEL = 10           # Quiet events before the interval doubles
 
 # Sensor Configuration
 SENSOR_UPDATE_INTERVAL_MS = 1000   # How often to read sensors (milliseconds)
+HOUSEKEEPING_INTERVAL_MS = 1000    # How often to refresh diagnostics (milliseconds)
+CONNECTION_CHECK_INTERVAL_MS = 100 # How often GATT mode checks connection state (milliseconds)
 SENSOR_TYPES = {
     'temperature': True,            # Enable temperature sensor
     'humidity': True,               # Enable humidity sensor
     'pressure': True,               # Enable pressure sensor
     'voltage': False,               # Enable voltage monitoring
+    'battery': True,                # Enable battery charge (needs BATTERY_ADC_PIN and a curve)
+    'probes': True,                 # Enable DS18B20 probes (needs DS18B20_PIN)
+}
+
+# Per-sensor sampling schedule: (period_ms, phase_ms)
+# Each enabled sensor is read every period_ms, offset by phase_ms so slow
+# channels don't all land on the same tick. Sensors not listed here are
+# read every SENSOR_UPDATE_INTERVAL_MS. Between reads the advertiser uses
+# the latest cached value.
+SENSOR_SCHEDULE = {
+    'temperature': (250, 0),
+    'humidity': (500, 100),
+    'pressure': (2000, 200),
+    'voltage': (1000, 300),
+    'battery': (1000, 300),         # Same tick as voltage: one ADC burst feeds both
+    'probes': (100, 50),            # Short period: collects each conversion as it completes
+}
+SENSOR_TICK_MS = 50                # Scheduler resolution (milliseconds)
+
+# Oversampling / On-device Aggregation
+# Scheduled channels keep their last OVERSAMPLE_WINDOW samples in a ring
+# buffer and publish the configured aggregate (mean, median, min, max,
+# last) instead of the single latest reading. Memory is 4 bytes per
+# sample per channel, plus one shared window for the median.
+OVERSAMPLE_WINDOW = 8              # Samples per channel (1 = no oversampling)
+SENSOR_AGGREGATE = {
+    'temperature': 'mean',
+    'humidity': 'mean',
+    'pressure': 'median',
+    'voltage': 'mean',
 }
 
 # I2C Configuration (for sensors like BME280)
@@ -44,20 +123,76 @@ I2C_SCL_PIN = 22                   # I2C Clock pin
 I2C_SDA_PIN = 21                   # I2C Data pin
 I2C_FREQ = 400000                  # I2C frequency (Hz)
 
+# I2C Sensor Discovery
+# Every device on the bus is matched against the driver registry
+# (sensor_handler.I2C_DRIVERS: BME280, SHT3x, INA219) and all matches are
+# built at boot. The outcome is cached in flash so later boots skip the
+# scan and probes (None = always scan). Deleting the file forces a rescan.
+I2C_SCAN_CACHE = 'i2c_scan.json'   # Flash file for the discovery outcome
+I2C_RESCAN_ON_POWER_ON = True      # Scan again after power-on (sensors may have changed)
+
+# Battery Voltage (ADC)
+# The 'voltage' and 'battery' channels from an ADC1 pin behind a resistor
+# divider. Each read is a burst of BATTERY_ADC_SAMPLES conversions paced at
+# BATTERY_ADC_RATE_HZ into a preallocated array; samples beyond
+# BATTERY_ADC_REJECT mean absolute deviations are dropped and the rest
+# averaged. The lowest remaining sample is kept as the burst's sag
+# (engine cranking). An INA219 on the bus, if any, provides 'voltage' instead.
+BATTERY_ADC_PIN = None             # ADC1 pin, e.g. 34 (None = no ADC channel)
+BATTERY_ADC_ATTEN = 11             # Input attenuation in dB: 0, 2, 6 or 11 (11 = up to ~2.5 V linear)
+BATTERY_ADC_EFUSE = True           # Convert with the eFuse calibration (read_uv; slower per sample)
+BATTERY_ADC_SAMPLES = 128          # Samples per burst (4 bytes each)
+BATTERY_ADC_RATE_HZ = 10000        # Target sample rate in a burst (0 = as fast as possible)
+BATTERY_ADC_REJECT = 3             # Outlier limit in mean absolute deviations (0 = keep all)
+BATTERY_DIVIDER_RATIO = 5.7        # Battery volts per ADC volt: (R1 + R2) / R2, e.g. 47k/10k
+BATTERY_CALIBRATION = None         # Two-point trim: ((reported_mv, true_mv), (reported_mv, true_mv))
+BATTERY_CURVE = (                  # Battery mV -> charge %, ascending (12 V lead-acid at rest)
+    (10500, 0), (11310, 10), (11580, 20), (11750, 30), (11900, 40), (12060, 50),
+    (12200, 60), (12320, 70), (12420, 80), (12500, 90), (12700, 100),
+)
+
+# DS18B20 One-Wire Temperature Probes
+DS18B20_PIN = None                 # One-wire data pin (None = no probes)
+DS18B20_RESOLUTION = 12            # Default resolution in bits (9-12: 94-750 ms conversion)
+DS18B20_RESOLUTIONS = {}           # Per-probe override: ROM hex string -> bits
+DS18B20_READS_PER_TICK = 2         # Probes read per scheduler tick (0 = all; ~12 ms each)
+
 # Sensor Calibration
 TEMPERATURE_OFFSET = 0.0           # Degrees Celsius to add/subtract
 PRESSURE_OFFSET = 0.0              # hPa to add/subtract
 HUMIDITY_OFFSET = 0.0              # Percentage to add/subtract
 
+# Memory Management
+# Garbage is collected in the idle slot after an advertisement once about
+# GC_TARGET_INTERVAL_MS worth of allocations (at the measured rate) has
+# built up; gc.threshold is set to twice that as a backstop.
+GC_TARGET_INTERVAL_MS = 5000       # Aim for one collection this often (milliseconds)
+GC_MAX_INTERVAL_MS = 30000         # Collect at least this often if anything was allocated
+GC_MIN_THRESHOLD = 4096            # Smallest collection budget / threshold (bytes)
+GC_PROBE_INTERVAL_MS = 60000       # Largest-free-block probe interval (milliseconds)
+
+# Profiling
+# Per-stage ticks_us timing of the sensor-to-radio pipeline (poll, validate,
+# encode, radio, rotate, LED, GC, whole cycle). The worst cycle time goes
+# into the diagnostics frame. The table is printed over serial every
+# PROFILE_REPORT_INTERVAL_MS while running (at LOG_LEVEL 'info' or above)
+# and at shutdown with DEBUG.
+PROFILE_ENABLED = True             # Time pipeline stages
+PROFILE_WINDOW = 128               # Recent samples per stage for mean/p99 (4 bytes each)
+PROFILE_REPORT_INTERVAL_MS = 60000 # Print the stage table this often (0 = only at shutdown)
+
 # Power Management
 DEEP_SLEEP_ENABLED = False         # Enable deep sleep between readings
-DEEP_SLEEP_DURATION_MS = 60000     # Deep sleep duration (if enabled)
+DEEP_SLEEP_DURATION_MS = 60000     # Deep sleep duration (if enabled; wakes with no change
+                                   # skip the radio only if below ADV_MAX_STALE_MS)
+DEEP_SLEEP_BURST_MS = 1000         # Advertise this long per wake (at least one rotation)
 LOW_POWER_MODE = False             # Reduce CPU frequency to save power
 
 # Debug Settings
-DEBUG = True                       # Enable debug output
-DEBUG_BLE = True                   # Extra verbose BLE debugging
-DEBUG_SENSORS = True               # Extra verbose sensor debugging
+DEBUG = True                       # Enable debug output (banner, config, diagnostics)
+LOG_LEVEL = 'debug'                # Printed: 'off', 'error', 'warn', 'info', 'debug'
+LOG_RING_LEVEL = 'debug'           # Kept in the in-RAM ring buffer (log.dump())
+LOG_RING_SIZE = 64                 # Events kept in the ring buffer
 
 # SignalK Mapping (for reference - handled by plugin)
 # These show where data will appear in SignalK
@@ -66,6 +201,7 @@ SIGNALK_PATHS = {
     'humidity': 'environment.inside.humidity',
     'pressure': 'environment.outside.pressure',
     'voltage': 'electrical.batteries.house.voltage',
+    'battery': 'sensors.batteryStrength',
 }
 
 # Connection Settings
@@ -75,14 +211,34 @@ RECONNECT_DELAY_MS = 5000          # Delay between reconnect attempts
 # LED Indicators (optional - if you have LEDs)
 LED_PIN = 2                        # Built-in LED pin (ESP32 usually pin 2)
 LED_ENABLED = True                 # Enable LED status indicators
-LED_BLE_CONNECTED_PATTERN = 'slow_blink'   # LED pattern when BLE connected
-LED_BLE_DISCONNECTED_PATTERN = 'fast_blink' # LED pattern when disconnected
+LED_TIMER_ID = 0                   # machine.Timer that plays the patterns
+LED_LOW_BATTERY_PERCENT = 20       # 'low_battery' below this charge (battery channel)
+
+# LED patterns (status_led.StatusLed): on/off durations in ms, starting
+# with on. States repeat their pattern while set; the first active state
+# in LED_PRIORITY plays. 'boot', 'connect' and 'activity' are played once;
+# a one-shot listed in LED_PRIORITY is dropped while a state above it is on.
+LED_PATTERNS = {
+    'boot': (200, 200, 200, 200, 200, 200),
+    'connect': (100, 100, 100, 100),
+    'activity': (50, 50),          # Advertisement updated
+    'connected': (1000, 1000),     # GATT central connected
+    'disconnected': (200, 800),    # GATT server waiting for a central
+    'low_battery': (50, 150, 50, 2750),
+}
+# Error blink codes: n blinks of 300 ms, then a 1.5 s pause
+LED_BLINK_CODES = {
+    'no_sensors': 2,               # No sensor found
+    'sensor_error': 3,             # Readings out of range
+}
+LED_PRIORITY = ('no_sensors', 'sensor_error', 'low_battery', 'activity', 'connected', 'disconnected')
 
 # Error Handling
 SENSOR_ERROR_RETRY_COUNT = 3       # Retry sensor reading on error
 HALT_ON_CRITICAL_ERROR = False     # Stop execution on critical errors
 
-# Data Formatting
+# Data Formatting (readings are carried as integers in 0.01 degC, 0.01 %,
+# 0.1 Pa and mV; precision rounds them to a coarser step)
 TEMPERATURE_PRECISION = 2          # Decimal places for temperature
 HUMIDITY_PRECISION = 1             # Decimal places for humidity
 PRESSURE_PRECISION = 1             # Decimal places for pressure
@@ -0,0 +1,241 @@
+"""
+Deep-Sleep Duty Cycle
+=====================
+Battery mode for advertisement nodes: wake, read every sensor once,
+advertise for DEEP_SLEEP_BURST_MS, deep sleep for DEEP_SLEEP_DURATION_MS.
+A wake with nothing new to send (every value within its deadband and the
+last broadcast not yet stale) never powers up the radio.
+
+State that has to outlive deep sleep lives in RTC memory, which is kept
+through deep sleep but lost on power-off or a hard reset: the sequence
+number and values of the last broadcast, the broadcast history (v3), the
+oversampling windows, and the per-phase timing of the previous wake.
+"""
+
+import gc
+import struct
+import time
+import machine
+from array import array
+from micropython import const
+
+import config
+import log
+from ble_advertiser import BLEAdvertiser, FrameAdvertiser
+from sensor_handler import SensorHandler
+
+# RTC memory layout: header, phase timings, last broadcast values, history,
+# windows
+_MAGIC = const(0x4453)
+_LAYOUT = const(3)                  # 2: integer window samples, 3: history
+# magic, layout, channels, windows, window size, history depth, seq, mask,
+# since last broadcast (ms, -1 = never), wakes, skipped wakes, total awake
+# ms, uptime ms
+_HEADER_FMT = '<HBBBBBBIiIIIQ'
+_HEADER_LEN = struct.calcsize(_HEADER_FMT)
+
+# Wake phases (index into timings)
+PHASES = ('boot', 'restore', 'sample', 'advertise', 'burst', 'save')
+PHASE_BOOT = const(0)           # Reset to run() (MicroPython start-up, imports)
+PHASE_RESTORE = const(1)        # Sensor/advertiser init and RTC state restore
+PHASE_SAMPLE = const(2)         # One read of every channel
+PHASE_ADVERTISE = const(3)      # Encode and (if needed) radio power-up
+PHASE_BURST = const(4)          # Time on air
+PHASE_SAVE = const(5)           # Radio off and state saved
+
+
+def woke_from_sleep():
+    """True if this boot is a deep-sleep wake (not power-on or reset)"""
+    return machine.reset_cause() == machine.DEEPSLEEP_RESET
+
+
+class DutyCycle:
+    """One wake of the deep-sleep duty cycle"""
+
+    def __init__(self):
+        self.rtc = machine.RTC()
+        self.timings = array('H', [0] * len(PHASES))        # This wake (ms)
+        self.last_timings = array('H', [0] * len(PHASES))   # Previous wake (ms)
+
+        # Carried across deep sleep
+        self.wakes = 0              # Wakes since power-on
+        self.skipped = 0            # Wakes that did not need to broadcast
+        self.awake_total_ms = 0     # Sum of awake time over all wakes
+        self.uptime_ms = 0          # Awake + asleep since power-on (at wake)
+
+    def run(self):
+        """Sample, advertise, save state and deep sleep (does not return on the device)"""
+        timings = self.timings
+        mark = time.ticks_ms()      # Ticks restart at every wake
+        timings[PHASE_BOOT] = mark
+
+        sensor_handler = SensorHandler()
+        if config.ADV_FORMAT_VERSION >= 3:
+            advertiser = FrameAdvertiser(activate=False)
+        else:
+            advertiser = BLEAdvertiser(activate=False)
+        self.load(advertiser, sensor_handler)
+        mark = self._phase(PHASE_RESTORE, mark)
+
+        sensor_handler.sample_once()
+        mark = self._phase(PHASE_SAMPLE, mark)
+
+        if hasattr(advertiser, 'set_diagnostics'):
+            # No scheduler here: the worst-cycle channel carries the
+            # previous wake's awake time instead
+            uptime_s = (self.uptime_ms + time.ticks_ms()) // 1000
+            advertiser.set_diagnostics(uptime_s, gc.mem_free(), 0,
+                                       self._awake_ms(self.last_timings))
+        sent = advertiser.advertise_readings(sensor_handler.latest)
+        mark = self._phase(PHASE_ADVERTISE, mark)
+
+        if sent:
+            self._burst(advertiser)
+        else:
+            self.skipped += 1
+        mark = self._phase(PHASE_BURST, mark)
+
+        advertiser.deinit()
+        self.wakes += 1
+        buf = self.pack(advertiser, sensor_handler)
+        self._phase(PHASE_SAVE, mark)
+        self._pack_timings(buf)
+        self.rtc.memory(buf)
+
+        if log.enabled(log.INFO):
+            log.info("[SLEEP] Wake {}: {}, phases {}, sleeping {}ms", self.wakes,
+                     'sent' if sent else 'skipped', self.get_timings(),
+                     config.DEEP_SLEEP_DURATION_MS)
+
+        machine.deepsleep(config.DEEP_SLEEP_DURATION_MS)
+
+    def _phase(self, phase, mark):
+        """Record the time since `mark` for `phase`; returns the new mark"""
+        now = time.ticks_ms()
+        self.timings[phase] = min(0xFFFF, time.ticks_diff(now, mark))
+        return now
+
+    @staticmethod
+    def _awake_ms(timings):
+        total = 0
+        for ms in timings:
+            total += ms
+        return total
+
+    def _burst(self, advertiser):
+        """Keep advertising for the burst window, rotating frames if any"""
+        rotate_ms = config.ADV_FRAME_ROTATE_MS
+        frames = advertiser.slots() if hasattr(advertiser, 'slots') else 1
+        burst_ms = max(config.DEEP_SLEEP_BURST_MS, frames * rotate_ms)
+        end = time.ticks_add(time.ticks_ms(), burst_ms)
+        while True:
+            left = time.ticks_diff(end, time.ticks_ms())
+            if left <= 0:
+                break
+            time.sleep_ms(min(left, rotate_ms))
+            if frames > 1:
+                advertiser.rotate()
+
+    def _windows(self, sensor_handler):
+        return [sensor.ring for sensor in sensor_handler.schedule if sensor.ring is not None]
+
+    @staticmethod
+    def _history(advertiser):
+        return getattr(advertiser, 'history', None)
+
+    def load(self, advertiser, sensor_handler):
+        """Restore state saved before the last deep sleep
+
+        Returns:
+            bool: True if valid state was found (False after power-on, or
+                  when the channel/window layout no longer matches)
+        """
+        data = self.rtc.memory()
+        windows = self._windows(sensor_handler)
+        history = self._history(advertiser)
+        depth = history.depth if history is not None else 0
+        channels = len(advertiser.CHANNELS)
+        if len(data) < _HEADER_LEN:
+            return False
+        (magic, layout, saved_channels, saved_windows, window, saved_depth, seq, mask, since_ms,
+         self.wakes, self.skipped, self.awake_total_ms, self.uptime_ms) = struct.unpack_from(
+            _HEADER_FMT, data, 0)
+        if (magic != _MAGIC or layout != _LAYOUT or saved_channels != channels
+                or saved_windows != len(windows) or window != config.OVERSAMPLE_WINDOW
+                or saved_depth != depth):
+            self.wakes = self.skipped = self.awake_total_ms = self.uptime_ms = 0
+            return False
+
+        offset = _HEADER_LEN
+        for i in range(len(PHASES)):
+            self.last_timings[i] = struct.unpack_from('<H', data, offset)[0]
+            offset += 2
+        values = array('l', struct.unpack_from('<%dl' % channels, data, offset))
+        offset += 4 * channels
+        if history is not None:
+            offset = history.unpack_from(data, offset)
+        for ring in windows:
+            offset = ring.unpack_from(data, offset)
+
+        advertiser.restore_state(seq, mask, values, since_ms)
+        return True
+
+    def pack(self, advertiser, sensor_handler):
+        """Serialize the state to carry across deep sleep
+
+        Timings are left for _pack_timings(), so the save phase can be
+        measured after everything else has been packed.
+
+        Returns:
+            bytearray: RTC memory image
+        """
+        windows = self._windows(sensor_handler)
+        history = self._history(advertiser)
+        depth = history.depth if history is not None else 0
+        seq, mask, values, since_ms = advertiser.save_state()
+        channels = len(values)
+
+        awake_ms = time.ticks_ms()
+        sleep_ms = config.DEEP_SLEEP_DURATION_MS
+        if since_ms >= 0:
+            # Anything past the stale limit counts the same
+            since_ms = min(since_ms + sleep_ms, config.ADV_MAX_STALE_MS)
+        self.awake_total_ms += awake_ms
+        self.uptime_ms += awake_ms + sleep_ms
+
+        size = _HEADER_LEN + 2 * len(PHASES) + 4 * channels
+        if history is not None:
+            size += history.packed_size()
+        for ring in windows:
+            size += ring.packed_size()
+        buf = bytearray(size)
+
+        struct.pack_into(_HEADER_FMT, buf, 0, _MAGIC, _LAYOUT, channels, len(windows),
+                         config.OVERSAMPLE_WINDOW, depth, seq, mask, since_ms, self.wakes,
+                         self.skipped, self.awake_total_ms, self.uptime_ms)
+        offset = _HEADER_LEN + 2 * len(PHASES)
+        struct.pack_into('<%dl' % channels, buf, offset, *values)
+        offset += 4 * channels
+        if history is not None:
+            offset = history.pack_into(buf, offset, sleep_ms)
+        for ring in windows:
+            offset = ring.pack_into(buf, offset)
+        return buf
+
+    def _pack_timings(self, buf):
+        offset = _HEADER_LEN
+        for ms in self.timings:
+            struct.pack_into('<H', buf, offset, ms)
+            offset += 2
+
+    def get_timings(self):
+        """Per-phase timing of this wake
+
+        Returns:
+            dict: phase -> ms, plus 'awake' (this wake) and 'awake_mean'
+                  (over all wakes since power-on)
+        """
+        timings = {name: self.timings[i] for i, name in enumerate(PHASES)}
+        timings['awake'] = self._awake_ms(self.timings)
+        timings['awake_mean'] = self.awake_total_ms // self.wakes if self.wakes else 0
+        return timings
@@ -0,0 +1,119 @@
+"""
+Broadcast History
+=================
+The most recent broadcasts (sequence number, presence mask, time and the
+environment channel values in encoded units), kept in preallocated arrays
+so FrameAdvertiser can re-send them in history frames. A receiver that
+missed an update backfills it from a later frame, at its original time.
+
+Entry 0 is the broadcast on air now; entries 1.. are the ones before it.
+Recording a broadcast allocates nothing.
+"""
+
+import struct
+import time
+from array import array
+from micropython import const
+
+_MAX_AGE_MS = const(65535000)       # Ages beyond the 16-bit seconds field count the same
+
+
+class History:
+    """Ring of the last `depth` broadcasts"""
+
+    def __init__(self, depth, channels):
+        """
+        Args:
+            depth: Broadcasts kept (including the one on air)
+            channels: Values kept per broadcast (the first `channels`
+                      channels of the advertiser)
+        """
+        self.depth = depth
+        self.channels = channels
+        self.seqs = bytearray(depth)
+        self.masks = bytearray(depth)
+        self.times = array('I', bytes(4 * depth))          # ticks_ms of each broadcast
+        self.values = array('l', [0] * (depth * channels))
+        self._head = 0              # Next slot to write
+        self.count = 0              # Valid entries (<= depth)
+        self.window = 0             # Rotating window of past entries sent next
+
+    def push(self, seq, mask, values, now_ms):
+        """Record a broadcast, overwriting the oldest when full
+
+        Args:
+            seq: Sequence number of the broadcast
+            mask: Presence mask (only the low `channels` bits are kept)
+            values: Encoded values (array, at least `channels` long)
+            now_ms: time.ticks_ms() of the broadcast
+        """
+        i = self._head
+        channels = self.channels
+        self.seqs[i] = seq
+        self.masks[i] = mask & ((1 << channels) - 1)
+        self.times[i] = now_ms
+        base = i * channels
+        dest = self.values
+        for ch in range(channels):
+            dest[base + ch] = values[ch]
+        self._head = i + 1 if i + 1 < self.depth else 0
+        if self.count < self.depth:
+            self.count += 1
+
+    def slot(self, n):
+        """Array slot of the n-th newest entry (0 = the broadcast on air)"""
+        i = self._head - 1 - n
+        return i + self.depth if i < 0 else i
+
+    def age_ms(self, slot, now_ms):
+        """Milliseconds since the broadcast in `slot` (capped)"""
+        return min(_MAX_AGE_MS, max(0, time.ticks_diff(now_ms, self.times[slot])))
+
+    def clear(self):
+        self._head = 0
+        self.count = 0
+        self.window = 0
+
+    def packed_size(self):
+        """Bytes used by pack_into()"""
+        return 3 + (6 + 4 * self.channels) * self.depth
+
+    def pack_into(self, buf, offset, elapsed_ms=0):
+        """Serialize the history (e.g. into RTC memory); returns the end offset
+
+        Times are stored as ages, since ticks restart after deep sleep.
+
+        Args:
+            elapsed_ms: Added to every age (the sleep about to start)
+        """
+        struct.pack_into('<BBB', buf, offset, self._head, self.count, self.window & 0xFF)
+        offset += 3
+        now = time.ticks_ms()
+        values = self.values
+        channels = self.channels
+        for i in range(self.depth):
+            struct.pack_into('<BBI', buf, offset, self.seqs[i], self.masks[i],
+                             min(_MAX_AGE_MS, self.age_ms(i, now) + elapsed_ms))
+            offset += 6
+            base = i * channels
+            for ch in range(channels):
+                struct.pack_into('<l', buf, offset, values[base + ch])
+                offset += 4
+        return offset
+
+    def unpack_from(self, buf, offset):
+        """Restore a history written by pack_into(); returns the end offset"""
+        self._head, self.count, self.window = struct.unpack_from('<BBB', buf, offset)
+        offset += 3
+        now = time.ticks_ms()
+        values = self.values
+        channels = self.channels
+        for i in range(self.depth):
+            self.seqs[i], self.masks[i], age = struct.unpack_from('<BBI', buf, offset)
+            self.times[i] = time.ticks_add(now, -age)
+            offset += 6
+            base = i * channels
+            for ch in range(channels):
+                values[base + ch] = struct.unpack_from('<l', buf, offset)[0]
+                offset += 4
+        return offset
@@ -0,0 +1,197 @@
+"""
+Logging
+=======
+Leveled logging with lazy formatting and a ring buffer of recent events.
+
+    log.debug("[BLE] Advertising: T={} H={} P={}", temperature, humidity, pressure)
+
+The message is a str.format() template taking up to four arguments, and
+is only formatted when it is printed. A call below the enabled levels
+returns after one comparison and allocates nothing - pass values you
+already have rather than computing arguments at the call site.
+
+Two levels are configured:
+- config.LOG_LEVEL: messages printed to the console (blocking UART)
+- config.LOG_RING_LEVEL: messages recorded in the ring buffer, without
+  formatting or allocation; dump() prints the buffer on demand
+
+Debug call sites on the hot path are wrapped in ``if __debug__:``, which
+MicroPython resolves at compile time: building with ``mpy-cross -O1`` (or
+``micropython.opt_level(1)`` in boot.py) removes them from the bytecode.
+"""
+
+import time
+from array import array
+from micropython import const
+
+import config
+
+OFF = const(0)
+ERROR = const(1)
+WARN = const(2)
+INFO = const(3)
+DEBUG = const(4)
+
+LEVELS = {'off': OFF, 'error': ERROR, 'warn': WARN, 'info': INFO, 'debug': DEBUG}
+_LEVEL_NAMES = 'XEWID'
+
+_MAX_ARGS = const(4)
+
+# Argument slot markers: numbers are copied into _values (so the ring does
+# not keep float objects alive), anything else is kept by reference
+_INT = object()
+_FLOAT = object()
+
+# Ring buffer: one record per event, preallocated
+_size = config.LOG_RING_SIZE
+_ticks = array('I', bytes(4 * _size))
+_levels = bytearray(_size)
+_messages = [None] * _size
+_values = array('f', bytes(4 * _size * _MAX_ARGS))
+_refs = [None] * (_size * _MAX_ARGS)
+_head = 0
+_count = 0
+_recorded = 0
+
+_print_level = OFF
+_ring_level = OFF
+_level = OFF
+
+
+def set_level(print_level=None, ring_level=None):
+    """Change the console and/or ring buffer level at runtime
+
+    Args:
+        print_level: 'off', 'error', 'warn', 'info' or 'debug' (None = keep)
+        ring_level: As print_level, for the ring buffer
+    """
+    global _print_level, _ring_level, _level
+    if print_level is not None:
+        _print_level = LEVELS[print_level]
+    if ring_level is not None:
+        _ring_level = LEVELS[ring_level]
+    _level = max(_print_level, _ring_level)
+
+
+set_level(config.LOG_LEVEL, config.LOG_RING_LEVEL)
+
+
+def enabled(level):
+    """True if messages at level go anywhere (guard for costly arguments)"""
+    return level <= _level
+
+
+def error(msg, a=None, b=None, c=None, d=None):
+    if ERROR <= _level:
+        _log(ERROR, msg, a, b, c, d)
+
+
+def warn(msg, a=None, b=None, c=None, d=None):
+    if WARN <= _level:
+        _log(WARN, msg, a, b, c, d)
+
+
+def info(msg, a=None, b=None, c=None, d=None):
+    if INFO <= _level:
+        _log(INFO, msg, a, b, c, d)
+
+
+def debug(msg, a=None, b=None, c=None, d=None):
+    if DEBUG <= _level:
+        _log(DEBUG, msg, a, b, c, d)
+
+
+def _log(level, msg, a, b, c, d):
+    if level <= _ring_level:
+        _record(level, msg, a, b, c, d)
+    if level <= _print_level:
+        print(msg.format(a, b, c, d))
+
+
+def _record(level, msg, a, b, c, d):
+    global _head, _count, _recorded
+    i = _head
+    _ticks[i] = time.ticks_ms()
+    _levels[i] = level
+    _messages[i] = msg
+    slot = i * _MAX_ARGS
+    _store(slot, a)
+    _store(slot + 1, b)
+    _store(slot + 2, c)
+    _store(slot + 3, d)
+
+    _head = i + 1 if i + 1 < _size else 0
+    if _count < _size:
+        _count += 1
+    _recorded += 1
+
+
+def _store(slot, value):
+    kind = type(value)
+    if kind is float:
+        _values[slot] = value
+        _refs[slot] = _FLOAT
+    elif kind is int:
+        _values[slot] = value
+        _refs[slot] = _INT
+    else:
+        _refs[slot] = value
+
+
+def _arg(slot):
+    ref = _refs[slot]
+    if ref is _FLOAT:
+        return float('%.7g' % _values[slot])
+    if ref is _INT:
+        return int(_values[slot])
+    return ref
+
+
+def dump(clear=False):
+    """Print the ring buffer, oldest event first
+
+    Numbers are stored as 32-bit floats, so they print to 7 significant
+    digits (large integers too). Other arguments (strings, exceptions,
+    lists) are kept by reference and print as they are now.
+
+    Args:
+        clear: Empty the buffer afterwards
+    """
+    print(f"[LOG] {_count} of {_recorded} events (ticks_ms level message):")
+    start = _head - _count
+    for n in range(_count):
+        i = (start + n) % _size
+        slot = i * _MAX_ARGS
+        msg = _messages[i]
+        try:
+            text = msg.format(_arg(slot), _arg(slot + 1), _arg(slot + 2), _arg(slot + 3))
+        except (ValueError, TypeError):
+            text = msg
+        print(f"{_ticks[i]:>10} {_LEVEL_NAMES[_levels[i]]} {text}")
+    if clear:
+        reset()
+
+
+def reset():
+    """Empty the ring buffer"""
+    global _head, _count
+    _head = 0
+    _count = 0
+    for i in range(_size):
+        _messages[i] = None
+    for i in range(_size * _MAX_ARGS):
+        _refs[i] = None
+
+
+def get_stats():
+    """Get ring buffer statistics
+
+    Returns:
+        dict: Levels, buffered events and events recorded since boot
+    """
+    return {
+        'print_level': _print_level,
+        'ring_level': _ring_level,
+        'buffered': _count,
+        'recorded': _recorded,
+    }
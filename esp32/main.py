@@ -4,54 +4,127 @@ ESP32 to SignalK BLE Bridge - Main Entry Point
 Orchestrates BLE server and sensor data transmission.
 """
 
-import time
-from machine import Pin
-import gc
-
 # Import project modules
 import config
+import log
 from ble_server import BLEServer
 from sensor_handler import SensorHandler
+from runtime import asyncio, Ticker
+from memory_manager import MemoryManager
+import status_led
 
-# LED for status indication (if available)
-led = None
-if config.LED_ENABLED:
-    try:
-        led = Pin(config.LED_PIN, Pin.OUT)
-    except:
-        print("[MAIN] LED not available")
-        led = None
-
-def blink_led(times=1, delay_ms=100):
-    """Blink LED for status indication"""
-    if led is None:
-        return
-    for _ in range(times):
-        led.on()
-        time.sleep_ms(delay_ms)
-        led.off()
-        time.sleep_ms(delay_ms)
-
-def led_pattern(pattern):
-    """Display LED pattern based on connection state"""
-    if led is None:
-        return
-    
-    if pattern == 'slow_blink':
-        led.on()
-        time.sleep_ms(1000)
-        led.off()
-    elif pattern == 'fast_blink':
-        led.on()
-        time.sleep_ms(200)
-        led.off()
-    elif pattern == 'on':
-        led.on()
-    elif pattern == 'off':
-        led.off()
+class ServerApp:
+    """GATT-mode runtime
+    
+    Each job runs as its own asyncio task so none can block another:
+    - connection_task: tracks connect/disconnect events
+    - sensor_task: reads whichever sensors are due (per-sensor schedule)
+    - update_task: pushes the latest readings to the characteristics (one
+      packed notification per change, rate-limited per central), then
+      gives the memory manager the idle slot that follows
+    
+    The status LED plays from its own timer (status_led.StatusLed); the
+    tasks only switch its states.
+    
+    Statistics are collected by get_diagnostics() instead of being printed.
+    """
+    
+    def __init__(self, ble_server, sensor_handler, leds=None):
+        self.ble_server = ble_server
+        self.sensor_handler = sensor_handler
+        self.leds = leds
+        self.connected = False
+        self.memory = MemoryManager()
+        if leds:
+            leds.set('disconnected')
+            leds.set('no_sensors', not sensor_handler.schedule)
+        
+        self.connection_ticker = Ticker(config.CONNECTION_CHECK_INTERVAL_MS)
+        self.sensor_ticker = Ticker(config.SENSOR_TICK_MS)
+        self.update_ticker = Ticker(config.SENSOR_UPDATE_INTERVAL_MS)
+    
+    async def connection_task(self):
+        """Report connection state changes"""
+        while True:
+            await self.connection_ticker.wait()
+            
+            if self.ble_server.is_connected():
+                if not self.connected:
+                    log.info("[MAIN] BLE client connected!")
+                    self.connected = True
+                    self.show_connection()
+            else:
+                if self.connected:
+                    log.info("[MAIN] BLE client disconnected")
+                    self.connected = False
+                    self.show_connection()
+    
+    def show_connection(self):
+        """Switch the LED to the connection state pattern"""
+        leds = self.leds
+        if leds:
+            leds.set('connected', self.connected)
+            leds.set('disconnected', not self.connected)
+            if self.connected:
+                leds.flash('connect')
+    
+    async def sensor_task(self):
+        """Read due sensors every SENSOR_TICK_MS"""
+        while True:
+            await self.sensor_ticker.wait()
+            
+            # Read the sensors that are due; the rest keep cached values
+            if not self.sensor_handler.poll():
+                continue
+            
+            # Validate readings
+            valid = self.sensor_handler.validate_all_readings()
+            if not valid:
+                log.warn("[MAIN] WARNING: Some sensor readings are out of range")
+            if self.leds:
+                self.leds.show_sensors(valid, self.sensor_handler.latest)
+    
+    async def update_task(self):
+        """Update BLE characteristics every SENSOR_UPDATE_INTERVAL_MS"""
+        while True:
+            await self.update_ticker.wait()
+            
+            # Update BLE characteristics and notify what changed (readings
+            # are already in the ESS units: 0.01 degC, 0.01 %, 0.1 Pa)
+            self.ble_server.update(self.sensor_handler.latest)
+            
+            # Quiet until the next sensor tick: collect here if due
+            self.memory.idle()
+    
+    def get_diagnostics(self):
+        """Collect runtime statistics (notifications, sensors, memory, tasks)
+        
+        Returns:
+            dict: Statistics by component
+        """
+        return {
+            'gatt': self.ble_server.get_stats(),
+            'sensors': self.sensor_handler.get_schedule_stats(),
+            'battery_adc': self.sensor_handler.sensors['adc'].get_stats()
+                           if 'adc' in self.sensor_handler.sensors else None,
+            'memory': self.memory.get_stats(),
+            'led': self.leds.get_stats() if self.leds else None,
+            'tasks': {
+                'sensor': self.sensor_ticker.get_stats(),
+                'update': self.update_ticker.get_stats(),
+            },
+        }
+    
+    async def run(self):
+        """Run all tasks until cancelled"""
+        await asyncio.gather(
+            self.connection_task(),
+            self.sensor_task(),
+            self.update_task(),
+        )
 
 def main():
-    """Main application loop"""
+    """Main application entry point"""
     
     # Print configuration
     print("\n" + "="*50)
@@ -59,8 +132,10 @@ def main():
     print("="*50)
     config.print_config()
     
-    # Startup blink
-    blink_led(3, 200)
+    # Startup blink (timer-driven: start-up carries on meanwhile)
+    leds = status_led.from_config()
+    if leds:
+        leds.flash('boot')
     
     # Initialize components
     print("[MAIN] Initializing BLE server...")
@@ -76,63 +151,11 @@ def main():
     print("[MAIN] System ready! Waiting for connection...")
     print("="*50 + "\n")
     
-    # Main loop
-    last_update = time.ticks_ms()
-    connection_reported = False
+    app = ServerApp(ble_server, sensor_handler, leds)
     
     try:
-        while True:
-            current_time = time.ticks_ms()
-            
-            # Check connection status
-            if ble_server.is_connected():
-                if not connection_reported:
-                    print("[MAIN] BLE client connected!")
-                    connection_reported = True
-                    blink_led(2, 100)
-                
-                # LED pattern for connected state
-                if config.LED_ENABLED:
-                    led_pattern(config.LED_BLE_CONNECTED_PATTERN)
-            else:
-                if connection_reported:
-                    print("[MAIN] BLE client disconnected")
-                    connection_reported = False
-                
-                # LED pattern for disconnected state
-                if config.LED_ENABLED:
-                    led_pattern(config.LED_BLE_DISCONNECTED_PATTERN)
-            
-            # Update sensor data at configured interval
-            if time.ticks_diff(current_time, last_update) >= config.SENSOR_UPDATE_INTERVAL_MS:
-                last_update = current_time
-                
-                # Read all sensors
-                readings = sensor_handler.read_all()
-                
-                # Validate readings
-                if not sensor_handler.validate_all_readings(readings):
-                    print("[MAIN] WARNING: Some sensor readings are out of range")
-                
-                # Update BLE characteristics
-                if 'temperature' in readings and readings['temperature'] is not None:
-                    ble_server.update_temperature(readings['temperature'])
-                
-                if 'humidity' in readings and readings['humidity'] is not None:
-                    ble_server.update_humidity(readings['humidity'])
-                
-                if 'pressure' in readings and readings['pressure'] is not None:
-                    ble_server.update_pressure(readings['pressure'])
-                
-                # Garbage collection to prevent memory issues
-                gc.collect()
-                
-                if config.DEBUG:
-                    print(f"[MAIN] Free memory: {gc.mem_free()} bytes")
-            
-            # Small delay to prevent busy waiting
-            time.sleep_ms(10)
-            
+        asyncio.run(app.run())
+        
     except KeyboardInterrupt:
         print("\n[MAIN] Keyboard interrupt - shutting down...")
     except Exception as e:
@@ -142,9 +165,12 @@ def main():
     finally:
         # Cleanup
         print("[MAIN] Cleaning up...")
+        if config.DEBUG:
+            print(f"[MAIN] Diagnostics: {app.get_diagnostics()}")
+            log.dump()
         ble_server.deinit()
-        if led:
-            led.off()
+        if leds:
+            leds.stop()
         print("[MAIN] Shutdown complete")
 
 # Run main program
@@ -5,35 +5,195 @@ Broadcasts sensor data via BLE advertisements instead of GATT.
 """
 
 import time
-from machine import Pin
-import gc
 
 # Import project modules
 import config
-from ble_advertiser import BLEAdvertiser
+import log
+from ble_advertiser import BLEAdvertiser, FrameAdvertiser
 from sensor_handler import SensorHandler
+from runtime import asyncio, Ticker
+from memory_manager import MemoryManager
+from profiler import (Profiler, STAGE_POLL, STAGE_VALIDATE, STAGE_ROTATE,
+                      STAGE_LED, STAGE_GC, STAGE_CYCLE)
+import duty_cycle
+import status_led
 
-# LED for status indication (if available)
-led = None
-if config.LED_ENABLED:
-    try:
-        led = Pin(config.LED_PIN, Pin.OUT)
-    except:
-        print("[MAIN] LED not available")
-        led = None
-
-def blink_led(times=1, delay_ms=100):
-    """Blink LED for status indication"""
-    if led is None:
-        return
-    for _ in range(times):
-        led.on()
-        time.sleep_ms(delay_ms)
-        led.off()
-        time.sleep_ms(delay_ms)
+class AdvertiserApp:
+    """Advertisement-mode runtime
+    
+    Each job runs as its own asyncio task so none can block another:
+    - sensor_task: reads whichever sensors are due (per-sensor schedule)
+    - advertise_task: broadcasts the latest readings on a fixed-rate schedule,
+      then gives the memory manager the idle slot that follows
+    - rotate_task: rotates multi-frame (v3) advertisements
+    - housekeeping_task: refreshes the diagnostics
+    - profile_task: prints the stage table every PROFILE_REPORT_INTERVAL_MS
+      (profiling only)
+    
+    The status LED plays from its own timer (status_led.StatusLed): an
+    advertisement update only queues a flash, and the sensor task switches
+    the error and low-battery states.
+    
+    Statistics are collected by get_diagnostics() instead of being printed;
+    with config.PROFILE_ENABLED each pipeline stage is timed as well, and
+    the table (profiler.report()) goes out over serial while the node runs,
+    every config.PROFILE_REPORT_INTERVAL_MS, as well as at shutdown.
+    """
+    
+    def __init__(self, ble_advertiser, sensor_handler, leds=None):
+        self.ble_advertiser = ble_advertiser
+        self.sensor_handler = sensor_handler
+        self.leds = leds
+        self.memory = MemoryManager()
+        self.profiler = Profiler() if config.PROFILE_ENABLED else None
+        ble_advertiser.profiler = self.profiler
+        
+        self.sensor_ticker = Ticker(config.SENSOR_TICK_MS)
+        self.advertise_ticker = Ticker(config.SENSOR_UPDATE_INTERVAL_MS)
+        self.housekeeping_ticker = Ticker(config.HOUSEKEEPING_INTERVAL_MS)
+        self.rotate_ticker = Ticker(config.ADV_FRAME_ROTATE_MS)
+        self.start_ms = time.ticks_ms()
+        if leds:
+            leds.set('no_sensors', not sensor_handler.schedule)
+    
+    async def sensor_task(self):
+        """Read due sensors every SENSOR_TICK_MS"""
+        profiler = self.profiler
+        while True:
+            await self.sensor_ticker.wait()
+            if profiler:
+                mark = time.ticks_us()
+            
+            # Read the sensors that are due; the rest keep cached values
+            count = self.sensor_handler.poll()
+            if profiler:
+                mark = profiler.record(STAGE_POLL, mark)
+            if not count:
+                continue
+            
+            # Validate readings
+            valid = self.sensor_handler.validate_all_readings()
+            if profiler:
+                profiler.record(STAGE_VALIDATE, mark)
+            if not valid:
+                log.warn("[MAIN] WARNING: Some sensor readings are out of range")
+            if self.leds:
+                self.leds.show_sensors(valid, self.sensor_handler.latest)
+    
+    async def advertise_task(self):
+        """Broadcast the latest readings every SENSOR_UPDATE_INTERVAL_MS"""
+        profiler = self.profiler
+        ticker = self.advertise_ticker
+        while True:
+            await ticker.wait()
+            if profiler:
+                start = time.ticks_us()
+            
+            if self.ble_advertiser.advertise_readings(self.sensor_handler.latest) and self.leds:
+                if profiler:
+                    mark = time.ticks_us()
+                self.leds.flash('activity')
+                if profiler:
+                    profiler.record(STAGE_LED, mark)
+            
+            # Quiet until the next sensor tick: collect here if due
+            if profiler:
+                mark = time.ticks_us()
+            self.memory.idle()
+            if profiler:
+                profiler.record(STAGE_GC, mark)
+                # Cycle time counts from the deadline, so includes the wake-up latency
+                profiler.add(STAGE_CYCLE, ticker.late_us + time.ticks_diff(time.ticks_us(), start))
+    
+    async def rotate_task(self):
+        """Put the next frame on air every ADV_FRAME_ROTATE_MS"""
+        profiler = self.profiler
+        while True:
+            await self.rotate_ticker.wait()
+            if profiler:
+                mark = time.ticks_us()
+            self.ble_advertiser.rotate()
+            if profiler:
+                profiler.record(STAGE_ROTATE, mark)
+    
+    async def housekeeping_task(self):
+        """Refresh the diagnostics carried in the advertisement"""
+        while True:
+            await self.housekeeping_ticker.wait()
+            
+            if hasattr(self.ble_advertiser, 'set_diagnostics'):
+                self.update_diagnostics()
+    
+    async def profile_task(self):
+        """Print the stage table over serial every PROFILE_REPORT_INTERVAL_MS"""
+        ticker = Ticker(config.PROFILE_REPORT_INTERVAL_MS)
+        while True:
+            await ticker.wait()
+            if log.enabled(log.INFO):
+                log.info("[PROF] Stage timing after {} s",
+                         time.ticks_diff(time.ticks_ms(), self.start_ms) // 1000)
+                self.profiler.report()
+    
+    def update_diagnostics(self):
+        """Hand uptime, free memory and scheduling health to the advertiser
+        
+        The worst cycle is the longest advertise cycle (deadline to done)
+        when profiling, else the worst task wake-up latency.
+        """
+        tickers = (self.sensor_ticker, self.advertise_ticker, self.rotate_ticker)
+        overruns = 0
+        worst_us = 0
+        for ticker in tickers:
+            overruns += ticker.overruns
+            worst_us = max(worst_us, ticker.late_max_us)
+        for sensor in self.sensor_handler.schedule:
+            overruns += sensor.overruns
+        if self.profiler:
+            worst_us = max(worst_us, self.profiler.worst_us(STAGE_CYCLE))
+        uptime_s = time.ticks_diff(time.ticks_ms(), self.start_ms) // 1000
+        self.ble_advertiser.set_diagnostics(uptime_s, self.memory.free, overruns, worst_us // 1000)
+    
+    def get_diagnostics(self):
+        """Collect runtime statistics (advertising, sensors, memory, tasks, stages)
+        
+        Returns:
+            dict: Statistics by component
+        """
+        return {
+            'advertising': self.ble_advertiser.get_stats(),
+            'sensors': self.sensor_handler.get_schedule_stats(),
+            'battery_adc': self.sensor_handler.sensors['adc'].get_stats()
+                           if 'adc' in self.sensor_handler.sensors else None,
+            'memory': self.memory.get_stats(),
+            'led': self.leds.get_stats() if self.leds else None,
+            'tasks': {
+                'sensor': self.sensor_ticker.get_stats(),
+                'advertise': self.advertise_ticker.get_stats(),
+                'rotate': self.rotate_ticker.get_stats(),
+            },
+            'stages': self.profiler.get_stats() if self.profiler else {},
+        }
+    
+    async def run(self):
+        """Run all tasks until cancelled"""
+        tasks = [
+            self.sensor_task(),
+            self.advertise_task(),
+            self.housekeeping_task(),
+        ]
+        if hasattr(self.ble_advertiser, 'rotate'):
+            tasks.append(self.rotate_task())
+        if self.profiler and config.PROFILE_REPORT_INTERVAL_MS:
+            tasks.append(self.profile_task())
+        await asyncio.gather(*tasks)
 
 def main():
-    """Main application loop"""
+    """Main application entry point"""
+    
+    # Deep-sleep wake: straight back to work, no start-up banner or blink
+    if config.DEEP_SLEEP_ENABLED and duty_cycle.woke_from_sleep():
+        duty_cycle.DutyCycle().run()
+        return
     
     # Print configuration
     print("\n" + "="*50)
@@ -41,12 +201,23 @@ def main():
     print("="*50)
     config.print_config()
     
-    # Startup blink
-    blink_led(3, 200)
+    # Startup blink (timer-driven: start-up carries on meanwhile)
+    leds = status_led.from_config()
+    if leds:
+        leds.flash('boot')
+    
+    if config.DEEP_SLEEP_ENABLED:
+        print(f"[MAIN] Duty cycle: {config.DEEP_SLEEP_BURST_MS}ms burst, "
+              f"{config.DEEP_SLEEP_DURATION_MS}ms deep sleep")
+        duty_cycle.DutyCycle().run()
+        return
     
     # Initialize components
     print("[MAIN] Initializing BLE advertiser...")
-    ble_advertiser = BLEAdvertiser()
+    if config.ADV_FORMAT_VERSION >= 3:
+        ble_advertiser = FrameAdvertiser()
+    else:
+        ble_advertiser = BLEAdvertiser()
     
     print("[MAIN] Initializing sensor handler...")
     sensor_handler = SensorHandler()
@@ -54,46 +225,11 @@ def main():
     print("[MAIN] System ready! Broadcasting sensor data...")
     print("="*50 + "\n")
     
-    # Main loop
-    last_update = time.ticks_ms()
+    app = AdvertiserApp(ble_advertiser, sensor_handler, leds)
     
     try:
-        while True:
-            current_time = time.ticks_ms()
-            
-            # Update sensor data and advertisement at configured interval
-            if time.ticks_diff(current_time, last_update) >= config.SENSOR_UPDATE_INTERVAL_MS:
-                last_update = current_time
-                
-                # Read all sensors
-                readings = sensor_handler.read_all()
-                
-                # Validate readings
-                if not sensor_handler.validate_all_readings(readings):
-                    print("[MAIN] WARNING: Some sensor readings are out of range")
-                
-                # Broadcast via BLE advertisements
-                ble_advertiser.advertise_sensor_data(
-                    temperature=readings.get('temperature'),
-                    humidity=readings.get('humidity'),
-                    pressure=readings.get('pressure')
-                )
-                
-                # LED blink to show activity
-                if led:
-                    led.on()
-                    time.sleep_ms(50)
-                    led.off()
-                
-                # Garbage collection to prevent memory issues
-                gc.collect()
-                
-                if config.DEBUG:
-                    print(f"[MAIN] Free memory: {gc.mem_free()} bytes")
-            
-            # Small delay to prevent busy waiting
-            time.sleep_ms(100)
-            
+        asyncio.run(app.run())
+        
     except KeyboardInterrupt:
         print("\n[MAIN] Keyboard interrupt - shutting down...")
     except Exception as e:
@@ -103,9 +239,14 @@ def main():
     finally:
         # Cleanup
         print("[MAIN] Cleaning up...")
+        if config.DEBUG:
+            print(f"[MAIN] Diagnostics: {app.get_diagnostics()}")
+            if app.profiler:
+                app.profiler.report()
+            log.dump()
         ble_advertiser.deinit()
-        if led:
-            led.off()
+        if leds:
+            leds.stop()
         print("[MAIN] Shutdown complete")
 
 # Run main program
@@ -0,0 +1,171 @@
+"""
+Memory Manager
+==============
+Keeps garbage collection pauses predictable instead of collecting the
+whole heap every cycle:
+
+- The allocation rate is measured between calls to idle().
+- idle() is called in the quiet slot right after an advertisement and
+  collects only once GC_TARGET_INTERVAL_MS worth of allocations has built
+  up (or GC_MAX_INTERVAL_MS has passed), so collections land there.
+- gc.threshold is set to twice that budget as a backstop; automatic
+  collections (which can land anywhere) are counted, they mean the
+  budget is too small for a burst of allocations.
+
+Telemetry (peak heap use, free memory, largest free block, collection
+times) is kept for get_stats() rather than printed.
+"""
+
+import gc
+import time
+
+import config
+
+# Largest-block probe stops when the search window is this small (bytes)
+_PROBE_GRANULE = 64
+
+
+class MemoryManager:
+    """Allocation-rate driven garbage collection with heap telemetry"""
+
+    def __init__(self):
+        now = time.ticks_ms()
+        self.heap_size = gc.mem_free() + gc.mem_alloc()
+        self._target_ms = config.GC_TARGET_INTERVAL_MS
+        self._max_interval_ms = config.GC_MAX_INTERVAL_MS
+        self._probe_interval_ms = config.GC_PROBE_INTERVAL_MS
+
+        # Allocation rate (bytes per second, smoothed over idle() calls)
+        self.alloc_rate = 0
+        self._last_alloc = gc.mem_alloc()
+        self._last_sample_ms = now
+
+        # Collection state
+        self.budget = config.GC_MIN_THRESHOLD  # Bytes allocated before an idle collection
+        self.threshold = 0                      # Current gc.threshold
+        self._last_collect_ms = now
+        self._alloc_after_collect = self._last_alloc
+        self._last_probe_ms = None
+
+        # Telemetry
+        self.collections = 0        # Idle collections
+        self.auto_collections = 0   # Collections triggered elsewhere (threshold, MemoryError)
+        self.collect_us_last = 0
+        self.collect_us_max = 0
+        self.collect_us_total = 0
+        self.peak_alloc = self._last_alloc
+        self.free = gc.mem_free()   # Free heap after the last collection
+        self.largest_free = 0       # Largest free block at the last probe
+
+        self._set_threshold()
+
+    def idle(self):
+        """Call in an idle slot; collects if enough garbage has built up
+
+        Returns:
+            bool: True if a collection was run
+        """
+        now = time.ticks_ms()
+        alloc = gc.mem_alloc()
+        elapsed = time.ticks_diff(now, self._last_sample_ms)
+
+        if alloc < self._last_alloc:
+            # The heap shrank without us: a collection ran somewhere else
+            self.auto_collections += 1
+            self._alloc_after_collect = alloc
+        elif elapsed > 0:
+            rate = (alloc - self._last_alloc) * 1000 // elapsed
+            self.alloc_rate = (3 * self.alloc_rate + rate) >> 2
+        if alloc > self.peak_alloc:
+            self.peak_alloc = alloc
+        self._last_alloc = alloc
+        self._last_sample_ms = now
+
+        pending = alloc - self._alloc_after_collect
+        if pending >= self.budget or (
+                pending > 0 and time.ticks_diff(now, self._last_collect_ms) >= self._max_interval_ms):
+            self.collect(now)
+            return True
+        return False
+
+    def collect(self, now=None):
+        """Collect now, timing the pause and updating budget and threshold"""
+        start = time.ticks_us()
+        gc.collect()
+        pause = time.ticks_diff(time.ticks_us(), start)
+
+        self.collections += 1
+        self.collect_us_last = pause
+        self.collect_us_total += pause
+        if pause > self.collect_us_max:
+            self.collect_us_max = pause
+
+        if now is None:
+            now = time.ticks_ms()
+        self.free = gc.mem_free()
+        self._last_alloc = self._alloc_after_collect = gc.mem_alloc()
+        self._last_collect_ms = now
+        self._set_threshold()
+
+        if self._last_probe_ms is None or (
+                time.ticks_diff(now, self._last_probe_ms) >= self._probe_interval_ms):
+            self.probe_largest_block()
+            self._last_probe_ms = now
+            # Probe buffers are garbage now; keep them out of the rate
+            self._last_alloc = self._alloc_after_collect = gc.mem_alloc()
+
+    def _set_threshold(self):
+        """Size the idle budget and the gc.threshold backstop from the rate"""
+        budget = self.alloc_rate * self._target_ms // 1000
+        self.budget = max(config.GC_MIN_THRESHOLD, min(budget, self.free // 4))
+        self.threshold = max(config.GC_MIN_THRESHOLD, min(2 * self.budget, self.free // 2))
+        gc.threshold(self.threshold)
+
+    def probe_largest_block(self):
+        """Find the largest allocatable block by binary search
+
+        Allocates a few short-lived buffers; a failed attempt makes the
+        allocator collect (freeing the earlier probes) before it gives up.
+
+        Returns:
+            int: Largest block size in bytes (to within _PROBE_GRANULE)
+        """
+        low = 0
+        high = gc.mem_free()
+        while high - low > _PROBE_GRANULE:
+            size = (low + high) // 2
+            try:
+                block = bytearray(size)
+                block = None
+                low = size
+            except MemoryError:
+                high = size
+        self.largest_free = low
+        return low
+
+    def get_stats(self):
+        """Get heap and collection telemetry
+
+        Returns:
+            dict: heap size, free/peak use, largest free block and
+                  fragmentation (%), allocation rate, idle/automatic
+                  collection counts and pause times (us)
+        """
+        fragmentation = 0
+        if self.free and self.largest_free:
+            fragmentation = 100 - self.largest_free * 100 // self.free
+        return {
+            'heap': self.heap_size,
+            'free': self.free,
+            'peak_alloc': self.peak_alloc,
+            'largest_free': self.largest_free,
+            'fragmentation_pct': max(0, fragmentation),
+            'alloc_rate': self.alloc_rate,
+            'budget': self.budget,
+            'threshold': self.threshold,
+            'collections': self.collections,
+            'auto_collections': self.auto_collections,
+            'collect_us_last': self.collect_us_last,
+            'collect_us_max': self.collect_us_max,
+            'collect_us_mean': self.collect_us_total // self.collections if self.collections else 0,
+        }
@@ -0,0 +1,114 @@
+"""
+Stage Profiler
+==============
+Per-stage timing of the sensor-to-radio pipeline, built on ticks_us.
+
+Each stage keeps a sample count, min and max since boot, and its last
+config.PROFILE_WINDOW durations in a preallocated array; mean and p99 are
+computed over that window when a report is asked for. Recording a sample
+is a few array stores and allocates nothing.
+
+Usage:
+    mark = time.ticks_us()
+    sensor_handler.poll()
+    mark = profiler.record(STAGE_POLL, mark)
+    sensor_handler.validate_all_readings()
+    profiler.record(STAGE_VALIDATE, mark)
+"""
+
+import time
+from array import array
+from micropython import const
+
+import config
+
+# Stages
+STAGE_POLL = const(0)           # SensorHandler.poll (sensor reads)
+STAGE_VALIDATE = const(1)       # validate_all_readings
+STAGE_ENCODE = const(2)         # Change detection + payload encoding
+STAGE_RADIO = const(3)          # gap_advertise after an update
+STAGE_ROTATE = const(4)         # Frame rotation (v3, includes gap_advertise)
+STAGE_LED = const(5)            # Queue the LED activity flash
+STAGE_GC = const(6)             # MemoryManager.idle (collection when due)
+STAGE_CYCLE = const(7)          # Advertise cycle, from its deadline to done
+STAGES = ('poll', 'validate', 'encode', 'radio', 'rotate', 'led', 'gc', 'cycle')
+
+_NO_SAMPLE = const(0x3FFFFFFF)
+
+
+class Profiler:
+    """Min/mean/max/p99 timing per pipeline stage"""
+
+    def __init__(self, window=None):
+        stages = len(STAGES)
+        self.window = window or config.PROFILE_WINDOW
+        self.counts = array('I', bytes(4 * stages))
+        self.min_us = array('I', [_NO_SAMPLE] * stages)
+        self.max_us = array('I', bytes(4 * stages))
+        self._samples = array('I', bytes(4 * stages * self.window))
+
+    def record(self, stage, start_us):
+        """Record the time since start_us for a stage
+
+        Args:
+            stage: STAGE_* index
+            start_us: time.ticks_us() when the stage began
+
+        Returns:
+            int: time.ticks_us() now (the start of the next stage)
+        """
+        now = time.ticks_us()
+        self.add(stage, time.ticks_diff(now, start_us))
+        return now
+
+    def add(self, stage, us):
+        """Record a duration measured elsewhere (microseconds)"""
+        n = self.counts[stage]
+        self.counts[stage] = n + 1
+        if us < self.min_us[stage]:
+            self.min_us[stage] = us
+        if us > self.max_us[stage]:
+            self.max_us[stage] = us
+        self._samples[stage * self.window + n % self.window] = us
+
+    def worst_us(self, stage):
+        """Largest duration recorded for a stage since boot (0 if none)"""
+        return self.max_us[stage]
+
+    def get_stats(self):
+        """Get per-stage timing
+
+        Returns:
+            dict: Stage name -> count, min/max since boot and mean/p99
+                  over the recent window (us); stages never hit are left out
+        """
+        stats = {}
+        for stage, name in enumerate(STAGES):
+            count = self.counts[stage]
+            if not count:
+                continue
+            n = min(count, self.window)
+            start = stage * self.window
+            recent = sorted(self._samples[start:start + n])
+            stats[name] = {
+                'count': count,
+                'min_us': self.min_us[stage],
+                'mean_us': sum(recent) // n,
+                'p99_us': recent[min(n - 1, n * 99 // 100)],
+                'max_us': self.max_us[stage],
+            }
+        return stats
+
+    def report(self):
+        """Print the per-stage timing table"""
+        print(f"[PROF] {'stage':<9}{'count':>8}{'min':>8}{'mean':>8}{'p99':>8}{'max':>8}  (us)")
+        for name, s in self.get_stats().items():
+            print(f"[PROF] {name:<9}{s['count']:>8}{s['min_us']:>8}{s['mean_us']:>8}"
+                  f"{s['p99_us']:>8}{s['max_us']:>8}")
+
+    def reset(self):
+        """Clear all statistics"""
+        for stage in range(len(STAGES)):
+            self.counts[stage] = 0
+            self.min_us[stage] = _NO_SAMPLE
+            self.max_us[stage] = 0
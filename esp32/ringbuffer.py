@@ -0,0 +1,150 @@
+"""
+Ring Buffer
+===========
+Fixed-size, array-backed sample window with mean/min/max/median
+aggregates over integer samples (sensor readings in fixed-point units,
+e.g. 0.01 °C). Pushing a sample never allocates; memory is fixed at
+construction (4 bytes per slot, plus an optional shared scratch array
+used for the median). Mean and median round to the nearest unit.
+"""
+
+import struct
+from array import array
+from micropython import const
+
+# Aggregate modes
+AGG_MEAN = const(0)
+AGG_MIN = const(1)
+AGG_MAX = const(2)
+AGG_MEDIAN = const(3)
+AGG_LAST = const(4)
+
+AGG_MODES = {
+    'mean': AGG_MEAN,
+    'min': AGG_MIN,
+    'max': AGG_MAX,
+    'median': AGG_MEDIAN,
+    'last': AGG_LAST,
+}
+
+
+class RingBuffer:
+    """Sample window for one sensor channel"""
+
+    def __init__(self, size, scratch=None):
+        """
+        Args:
+            size: Number of samples kept
+            scratch: array('i') of at least `size` slots for median
+                     sorting (shared between buffers to bound memory)
+        """
+        self.size = size
+        self._data = array('i', bytes(4 * size))
+        self._scratch = scratch if scratch is not None else array('i', bytes(4 * size))
+        self._head = 0              # Next slot to write
+        self.count = 0              # Valid samples (<= size)
+
+    def push(self, value):
+        """Add a sample, overwriting the oldest when full"""
+        self._data[self._head] = value
+        self._head += 1
+        if self._head == self.size:
+            self._head = 0
+        if self.count < self.size:
+            self.count += 1
+
+    def clear(self):
+        self._head = 0
+        self.count = 0
+
+    def packed_size(self):
+        """Bytes used by pack_into()"""
+        return 2 + 4 * self.size
+
+    def pack_into(self, buf, offset):
+        """Serialize the window (e.g. into RTC memory); returns the end offset"""
+        struct.pack_into('<BB', buf, offset, self._head, self.count)
+        offset += 2
+        data = self._data
+        for i in range(self.size):
+            struct.pack_into('<i', buf, offset, data[i])
+            offset += 4
+        return offset
+
+    def unpack_from(self, buf, offset):
+        """Restore a window written by pack_into(); returns the end offset"""
+        self._head, self.count = struct.unpack_from('<BB', buf, offset)
+        offset += 2
+        data = self._data
+        for i in range(self.size):
+            data[i] = struct.unpack_from('<i', buf, offset)[0]
+            offset += 4
+        return offset
+
+    def last(self):
+        if not self.count:
+            return None
+        return self._data[self._head - 1]
+
+    def mean(self):
+        if not self.count:
+            return None
+        data = self._data
+        n = self.count
+        total = 0
+        for i in range(n):
+            total += data[i]
+        return (2 * total + n) // (2 * n)
+
+    def min(self):
+        if not self.count:
+            return None
+        data = self._data
+        low = data[0]
+        for i in range(1, self.count):
+            if data[i] < low:
+                low = data[i]
+        return low
+
+    def max(self):
+        if not self.count:
+            return None
+        data = self._data
+        high = data[0]
+        for i in range(1, self.count):
+            if data[i] > high:
+                high = data[i]
+        return high
+
+    def median(self):
+        if not self.count:
+            return None
+        n = self.count
+        data = self._data
+        tmp = self._scratch
+
+        # Insertion sort into the scratch array (windows are small)
+        for i in range(n):
+            value = data[i]
+            j = i - 1
+            while j >= 0 and tmp[j] > value:
+                tmp[j + 1] = tmp[j]
+                j -= 1
+            tmp[j + 1] = value
+
+        mid = n >> 1
+        if n & 1:
+            return tmp[mid]
+        return (tmp[mid - 1] + tmp[mid] + 1) >> 1
+
+    def aggregate(self, mode):
+        """Aggregate over the window (one of the AGG_* modes)"""
+        if mode == AGG_MEAN:
+            return self.mean()
+        if mode == AGG_MEDIAN:
+            return self.median()
+        if mode == AGG_MIN:
+            return self.min()
+        if mode == AGG_MAX:
+            return self.max()
+        return self.last()
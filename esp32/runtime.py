@@ -0,0 +1,92 @@
+"""
+Async Runtime Helpers
+=====================
+Shared pieces of the asyncio runtime used by main_adv.py and main.py.
+Works with MicroPython's (u)asyncio and with CPython's asyncio, so the
+task layout can be exercised on a PC with the stubs in tools/host.
+"""
+
+import time
+
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+_HAS_SLEEP_MS = hasattr(asyncio, 'sleep_ms')
+
+
+def sleep_ms(ms):
+    """Awaitable sleep in milliseconds (asyncio.sleep_ms where available)"""
+    if _HAS_SLEEP_MS:
+        return asyncio.sleep_ms(ms)
+    return asyncio.sleep(ms / 1000)
+
+
+class Ticker:
+    """Fixed-rate scheduler for a periodic task
+
+    Deadlines advance by exactly one period from the previous deadline
+    (not from when the task woke up), so timing does not drift. Each
+    wake-up records how late it was, which is the loop jitter.
+
+    Usage:
+        ticker = Ticker(1000)
+        while True:
+            await ticker.wait()
+            do_work()
+    """
+
+    def __init__(self, period_ms):
+        self.period_us = period_ms * 1000
+        self.deadline = None
+
+        # Statistics
+        self.ticks = 0              # Number of wake-ups
+        self.overruns = 0           # Deadlines missed by a whole period
+        self.late_us = 0            # Latency of the latest wake-up
+        self.late_max_us = 0        # Worst wake-up latency
+        self.late_total_us = 0      # Sum of wake-up latencies
+
+    def reset(self):
+        """Start the schedule one period from now"""
+        self.deadline = time.ticks_add(time.ticks_us(), self.period_us)
+
+    async def wait(self):
+        """Sleep until the next deadline"""
+        if self.deadline is None:
+            self.reset()
+
+        delay_us = time.ticks_diff(self.deadline, time.ticks_us())
+        if delay_us > 0:
+            # Round up so we never wake before the deadline
+            await sleep_ms((delay_us + 999) // 1000)
+
+        now = time.ticks_us()
+        late_us = time.ticks_diff(now, self.deadline)
+        if late_us < 0:
+            late_us = 0
+        self.ticks += 1
+        self.late_us = late_us
+        self.late_total_us += late_us
+        if late_us > self.late_max_us:
+            self.late_max_us = late_us
+
+        self.deadline = time.ticks_add(self.deadline, self.period_us)
+        if time.ticks_diff(now, self.deadline) >= 0:
+            # Fell a whole period behind - resynchronise instead of bursting
+            self.overruns += 1
+            self.deadline = time.ticks_add(now, self.period_us)
+
+    def get_stats(self):
+        """Get timing statistics
+
+        Returns:
+            dict: ticks, overruns, mean and max wake-up latency (us)
+        """
+        return {
+            'ticks': self.ticks,
+            'overruns': self.overruns,
+            'late_mean_us': self.late_total_us // self.ticks if self.ticks else 0,
+            'late_max_us': self.late_max_us,
+        }
@@ -2,13 +2,111 @@
 Sensor Handler
 ==============
 Manages sensor reading, data validation, and mock data generation.
+
+Readings are integers in fixed-point units from the driver to the
+advertisement payload: 0.01 °C, 0.01 %RH, 0.1 Pa (the units the BLE
+formats carry). Calibration offsets, clamps and validation ranges are
+converted to those units once, at init.
+
+I2C sensors are found through a driver registry (I2C_DRIVERS): every
+device on the bus is matched against the drivers' addresses and
+identification probes, and all of them are built in one pass. The outcome
+is cached in flash (config.I2C_SCAN_CACHE), so later boots build the
+drivers straight away, without scanning or probing.
 """
 
+import json
+import os
 import time
 import random
-from machine import Pin, I2C
+import struct
+import machine
+import onewire
+from machine import Pin, I2C, ADC
+from micropython import const
+from array import array
 
 import config
+import log
+from ringbuffer import RingBuffer, AGG_MODES
+
+# Fixed-point units per natural unit, per channel
+SCALES = {
+    'temperature': 100,             # 0.01 °C
+    'humidity': 100,                # 0.01 %RH
+    'pressure': 10,                 # 0.1 Pa
+    'voltage': 1000,                # mV
+}
+
+# Calibration clamp and validation ranges per channel (fixed-point units)
+_CLAMP = {
+    'humidity': (0, 10000),
+    'battery': (0, 100),
+}
+_VALID = {
+    'temperature': (-4000, 8500),   # -40..85 °C (typical sensor range)
+    'humidity': (0, 10000),         # 0..100 %
+    'pressure': (300000, 1100000),  # 300-1100 hPa
+}
+_NO_LIMIT = const(0x3FFFFFFF)
+
+
+class ScheduledSensor:
+    """One step of the read plan: schedule, calibration and statistics
+    
+    Built once at init, with everything a read needs held as attributes
+    (reader, offset, clamp, precision, valid range), so a cycle does no
+    config or dict lookups.
+    """
+    
+    def __init__(self, name, reader, period_ms, phase_ms, now, ring=None, mode=0, step=1,
+                 offset=0, clamp=None, valid=None, scalar=True):
+        self.name = name
+        self.reader = reader            # Returns the uncalibrated reading (fixed-point int)
+        self.period_ms = period_ms
+        self.next_due = time.ticks_add(now, phase_ms)
+        self.value = None               # Latest published value
+        
+        # Calibration (scalar channels only; probes publish a list as read)
+        self.scalar = scalar
+        self.offset = offset            # Fixed-point units
+        self.step = step                # Quantum for the configured precision
+        self.lo, self.hi = clamp if clamp else (-_NO_LIMIT, _NO_LIMIT)
+        self.valid_min, self.valid_max = valid if valid else (-_NO_LIMIT, _NO_LIMIT)
+        
+        # Oversampling window (None = publish raw readings)
+        self.ring = ring
+        self.mode = mode
+        
+        # Statistics
+        self.reads = 0              # Completed reads
+        self.overruns = 0           # Whole periods missed (read came too late)
+        self.first_read = 0         # ticks_ms of first read
+        self.last_read = 0          # ticks_ms of latest read
+    
+    def rate_hz(self):
+        """Achieved sampling rate since the first read"""
+        elapsed = time.ticks_diff(self.last_read, self.first_read)
+        if self.reads < 2 or elapsed <= 0:
+            return 0.0
+        return (self.reads - 1) * 1000 / elapsed
+
+
+class Readings:
+    """Latest value of every channel (fixed layout, updated in place)
+    
+    Integers in fixed-point units; None = channel disabled or not read
+    yet. probes is the DS18B20 list (None per unread probe).
+    """
+    
+    def __init__(self):
+        self.temperature = None     # 0.01 °C
+        self.humidity = None        # 0.01 %RH
+        self.pressure = None        # 0.1 Pa
+        self.voltage = None         # mV
+        self.battery = None         # Percent
+        self.probes = None          # List of 0.01 °C
+
 
 class SensorHandler:
     """Handles sensor data acquisition and processing"""
@@ -16,151 +114,391 @@ class SensorHandler:
     def __init__(self):
         self.use_mock = config.USE_MOCK_SENSORS
         self.i2c = None
-        self.sensors = {}
+        self.sensors = {}           # Key -> driver, in discovery order
+        self.scan_cached = False    # I2C drivers were built from the flash cache
         
         if not self.use_mock:
             self._init_real_sensors()
+            self._init_onewire()
+            self._init_adc()
+        
+        # Latest value of every scheduled channel (updated in place by poll)
+        self.latest = Readings()
+        self.schedule = self._build_schedule()
         
-        if config.DEBUG_SENSORS:
-            mode = "MOCK" if self.use_mock else "REAL"
-            print(f"[SENSOR] Handler initialized ({mode} mode)")
+        log.info("[SENSOR] Handler initialized ({} mode)", "MOCK" if self.use_mock else "REAL")
     
     def _init_real_sensors(self):
-        """Initialize real hardware sensors"""
+        """Initialize the I2C bus and build a driver for every known sensor on it
+        
+        Uses the flash cache when it matches this bus (not after power-on
+        if config.I2C_RESCAN_ON_POWER_ON); otherwise, or if a cached driver
+        fails to start, scans and probes, then updates the cache. Channels
+        no sensor provides are left out of the read plan.
+        """
         try:
-            # Initialize I2C bus
             self.i2c = I2C(0, 
                           scl=Pin(config.I2C_SCL_PIN), 
                           sda=Pin(config.I2C_SDA_PIN),
                           freq=config.I2C_FREQ)
-            
-            # Scan for devices
-            devices = self.i2c.scan()
-            if config.DEBUG_SENSORS:
-                print(f"[SENSOR] I2C devices found: {[hex(d) for d in devices]}")
-            
-            # Initialize specific sensors
-            # TODO: Add actual sensor initialization here
-            # Example: self.sensors['bme280'] = BME280(self.i2c)
-            
-            if not devices:
-                print("[SENSOR] WARNING: No I2C devices found, falling back to mock mode")
-                self.use_mock = True
-                
         except Exception as e:
-            print(f"[SENSOR] ERROR initializing sensors: {e}")
-            print("[SENSOR] Falling back to mock mode")
-            self.use_mock = True
+            log.error("[SENSOR] ERROR initializing I2C bus: {}", e)
+            return
+        
+        # A power-on boot rescans (sensors may have been swapped while off),
+        # but the stored outcome is still read so an unchanged one is not
+        # rewritten to flash
+        stored = self._load_scan_cache()
+        cache = stored
+        if config.I2C_RESCAN_ON_POWER_ON and machine.reset_cause() == machine.PWRON_RESET:
+            cache = None
+        if cache is not None:
+            try:
+                for name, addr in cache['drivers']:
+                    self._add_driver(_DRIVERS_BY_NAME[name], addr)
+                self.scan_cached = True
+            except Exception as e:
+                log.warn("[SENSOR] Cached I2C sensors not all found ({}), rescanning", e)
+                self.sensors = {}
+        
+        if not self.scan_cached:
+            devices = self.i2c.scan()
+            if log.enabled(log.INFO):
+                log.info("[SENSOR] I2C devices found: {}", [hex(d) for d in devices])
+            # Registry order, then address: earlier drivers provide shared channels
+            found = []
+            for addr in devices:
+                driver = identify(self.i2c, addr)
+                if driver is not None:
+                    found.append((I2C_DRIVERS.index(driver), addr, driver))
+            found.sort()
+            for _, addr, driver in found:
+                try:
+                    self._add_driver(driver, addr)
+                except Exception as e:
+                    log.error("[SENSOR] ERROR initializing {} at {:#x}: {}", driver.NAME, addr, e)
+            self._save_scan_cache(devices, stored)
+        
+        if log.enabled(log.INFO):
+            log.info("[SENSOR] I2C sensors{}: {}", " (cached)" if self.scan_cached else "",
+                     ["{}@{:#x}".format(d.NAME, d.addr) for d in self.sensors.values()])
+        if not self.sensors:
+            log.warn("[SENSOR] WARNING: No I2C sensors found")
     
-    def read_temperature(self):
-        """Read temperature from sensor or generate mock data
+    def _add_driver(self, driver, addr):
+        """Start a driver; the first of each kind is keyed by its name"""
+        sensor = driver(self.i2c, addr)
+        key = driver.NAME
+        if key in self.sensors:
+            key = "{}_{:02x}".format(key, addr)
+        self.sensors[key] = sensor
+    
+    def _scan_key(self):
+        """What the cached outcome depends on: the bus and the registry"""
+        return [config.I2C_SCL_PIN, config.I2C_SDA_PIN, [d.NAME for d in I2C_DRIVERS]]
+    
+    def _load_scan_cache(self):
+        """Read the cached discovery outcome
         
         Returns:
-            float: Temperature in Celsius
+            dict: 'key', 'devices' (scan result) and 'drivers' ([name, addr]
+                  pairs), or None if there is none for this bus and registry
         """
+        path = config.I2C_SCAN_CACHE
+        if not path:
+            return None
         try:
-            if self.use_mock:
-                # Generate mock temperature
-                min_temp, max_temp = config.MOCK_TEMPERATURE_RANGE
-                temp = random.uniform(min_temp, max_temp)
-            else:
-                # TODO: Read from actual sensor
-                # Example: temp = self.sensors['bme280'].temperature
-                temp = 22.0  # Placeholder
-            
-            # Apply calibration offset
-            temp += config.TEMPERATURE_OFFSET
-            
-            # Apply precision formatting
-            temp = round(temp, config.TEMPERATURE_PRECISION)
-            
-            return temp
-            
-        except Exception as e:
-            print(f"[SENSOR] ERROR reading temperature: {e}")
+            with open(path) as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
             return None
+        if cache.get('key') != self._scan_key():
+            return None
+        return cache
     
-    def read_humidity(self):
-        """Read humidity from sensor or generate mock data
+    def _save_scan_cache(self, devices, old):
+        """Write the discovery outcome to flash (only if it changed)
         
-        Returns:
-            float: Relative humidity (0-100%)
+        An empty outcome is not cached, so a bus with nothing on it is
+        scanned again at the next boot.
         """
+        path = config.I2C_SCAN_CACHE
+        if not path:
+            return
+        drivers = [[sensor.NAME, sensor.addr] for sensor in self.sensors.values()]
+        if not drivers:
+            return
+        cache = {'key': self._scan_key(), 'devices': list(devices), 'drivers': drivers}
+        if cache == old:
+            return
         try:
-            if self.use_mock:
-                # Generate mock humidity
-                min_hum, max_hum = config.MOCK_HUMIDITY_RANGE
-                humidity = random.uniform(min_hum, max_hum)
-            else:
-                # TODO: Read from actual sensor
-                # Example: humidity = self.sensors['bme280'].humidity
-                humidity = 50.0  # Placeholder
-            
-            # Apply calibration offset
-            humidity += config.HUMIDITY_OFFSET
-            
-            # Clamp to valid range
-            humidity = max(0.0, min(100.0, humidity))
-            
-            # Apply precision formatting
-            humidity = round(humidity, config.HUMIDITY_PRECISION)
-            
-            return humidity
-            
+            with open(path, 'w') as f:
+                json.dump(cache, f)
+        except OSError as e:
+            log.error("[SENSOR] ERROR writing I2C scan cache: {}", e)
+    
+    def forget_scan(self):
+        """Delete the I2C scan cache (the next boot scans and probes again)"""
+        try:
+            os.remove(config.I2C_SCAN_CACHE)
+        except (OSError, TypeError):
+            pass
+    
+    def _init_onewire(self):
+        """Initialize DS18B20 probes on the one-wire bus (if configured)"""
+        if config.DS18B20_PIN is None:
+            return
+        try:
+            probes = DS18B20(Pin(config.DS18B20_PIN),
+                             config.DS18B20_RESOLUTION, config.DS18B20_RESOLUTIONS,
+                             config.DS18B20_READS_PER_TICK)
+            if log.enabled(log.INFO):
+                log.info("[SENSOR] DS18B20 probes found: {}", [rom_id(r) for r in probes.roms])
+            if probes.roms:
+                self.sensors['ds18b20'] = probes
         except Exception as e:
-            print(f"[SENSOR] ERROR reading humidity: {e}")
-            return None
+            log.error("[SENSOR] ERROR initializing DS18B20 probes: {}", e)
     
-    def read_pressure(self):
-        """Read pressure from sensor or generate mock data
+    def _init_adc(self):
+        """Initialize the ADC battery voltage channel (if configured)"""
+        if config.BATTERY_ADC_PIN is None:
+            return
+        try:
+            adc = BatteryADC(Pin(config.BATTERY_ADC_PIN), config.BATTERY_ADC_SAMPLES,
+                             config.BATTERY_ADC_RATE_HZ, config.BATTERY_ADC_ATTEN,
+                             config.BATTERY_ADC_EFUSE, config.BATTERY_ADC_REJECT,
+                             config.BATTERY_DIVIDER_RATIO, config.BATTERY_CALIBRATION,
+                             config.BATTERY_CURVE)
+            self.sensors['adc'] = adc
+            log.info("[SENSOR] Battery ADC on pin {} ({} samples at {} Hz)",
+                     config.BATTERY_ADC_PIN, adc.samples, adc.rate_hz)
+        except Exception as e:
+            log.error("[SENSOR] ERROR initializing battery ADC: {}", e)
+    
+    def read_probes(self):
+        """Advance the DS18B20 conversion pipeline
         
         Returns:
-            float: Pressure in Pascals
+            list: Latest temperature (0.01 °C) per probe, None if unread
         """
-        try:
-            if self.use_mock:
-                # Generate mock pressure (in hPa, then convert to Pa)
-                min_press, max_press = config.MOCK_PRESSURE_RANGE
-                pressure_hpa = random.uniform(min_press, max_press)
-                pressure_pa = pressure_hpa * 100  # Convert hPa to Pa
-            else:
-                # TODO: Read from actual sensor
-                # Example: pressure_pa = self.sensors['bme280'].pressure
-                pressure_pa = 101325.0  # Placeholder (standard atmosphere)
-            
-            # Apply calibration offset (in Pa)
-            pressure_pa += (config.PRESSURE_OFFSET * 100)
-            
-            # Apply precision formatting
-            pressure_pa = round(pressure_pa, config.PRESSURE_PRECISION)
+        probes = self.sensors['ds18b20']
+        probes.tick()
+        return probes.temps
+    
+    def _raw_readers(self):
+        """Pick each channel's raw reader once (mock or driver)
+        
+        Each channel is read from the first discovered sensor that
+        provides it (its read_<channel> method); sensors are kept in
+        registry order, so e.g. a BME280 wins over an SHT3x.
+        
+        Returns:
+            dict: name -> callable returning the uncalibrated reading in
+                  fixed-point units
+        """
+        if self.use_mock:
+            randint = random.randint
+            t_lo, t_hi = (round(v * 100) for v in config.MOCK_TEMPERATURE_RANGE)
+            h_lo, h_hi = (round(v * 100) for v in config.MOCK_HUMIDITY_RANGE)
+            p_lo, p_hi = (round(v * 1000) for v in config.MOCK_PRESSURE_RANGE)    # hPa
+            readers = {
+                'temperature': lambda: randint(t_lo, t_hi),
+                'humidity': lambda: randint(h_lo, h_hi),
+                'pressure': lambda: randint(p_lo, p_hi),
+            }
+        else:
+            readers = {}
+            for sensor in self.sensors.values():
+                for name in getattr(sensor, 'CHANNELS', ()):
+                    if name not in readers:
+                        readers[name] = getattr(sensor, 'read_' + name)
+        if 'ds18b20' in self.sensors:
+            readers['probes'] = self.read_probes
+        return readers
+    
+    def _build_schedule(self):
+        """Compile the read plan from config (once, at init)
+        
+        Returns:
+            tuple: ScheduledSensor for every enabled sensor with a reader
+        """
+        calibration = {
+            # name: (offset in natural units, decimal places)
+            'temperature': (config.TEMPERATURE_OFFSET, config.TEMPERATURE_PRECISION),
+            'humidity': (config.HUMIDITY_OFFSET, config.HUMIDITY_PRECISION),
+            'pressure': (config.PRESSURE_OFFSET * 100, config.PRESSURE_PRECISION),  # hPa -> Pa
+            'voltage': (0, config.VOLTAGE_PRECISION),
+        }
+        now = time.ticks_ms()
+        schedule = []
+        
+        # One median scratch array shared by all windows
+        window = config.OVERSAMPLE_WINDOW
+        self._scratch = array('i', bytes(4 * window)) if window > 1 else None
+        
+        for name, reader in self._raw_readers().items():
+            if not config.SENSOR_TYPES.get(name, False):
+                continue
+            period_ms, phase_ms = config.SENSOR_SCHEDULE.get(
+                name, (config.SENSOR_UPDATE_INTERVAL_MS, 0))
             
-            return pressure_pa
+            ring = None
+            mode = AGG_MODES.get(config.SENSOR_AGGREGATE.get(name), None)
+            if mode is not None and window > 1:
+                ring = RingBuffer(window, self._scratch)
             
+            # Offset and precision in fixed-point units
+            scale = SCALES.get(name, 1)
+            offset, precision = calibration.get(name, (0, 0))
+            step = max(1, scale // 10 ** precision)
+            schedule.append(ScheduledSensor(
+                name, reader, period_ms, phase_ms, now, ring, mode, step,
+                round(offset * scale), _CLAMP.get(name), _VALID.get(name),
+                scalar=name != 'probes'))
+        
+        # Channels validate_all_readings() checks, and the probe step
+        self._checked = tuple(sensor for sensor in schedule if sensor.name in _VALID)
+        self._probe_step = None
+        for sensor in schedule:
+            if not sensor.scalar:
+                self._probe_step = sensor
+        return tuple(schedule)
+    
+    def _read(self, sensor):
+        """Run one plan step: read, calibrate, aggregate, publish"""
+        try:
+            value = sensor.reader()
         except Exception as e:
-            print(f"[SENSOR] ERROR reading pressure: {e}")
-            return None
+            log.error("[SENSOR] ERROR reading {}: {}", sensor.name, e)
+            value = None
+        if value is not None and sensor.scalar:
+            # Calibrate (inline: this runs for every read)
+            value += sensor.offset
+            if value < sensor.lo:
+                value = sensor.lo
+            elif value > sensor.hi:
+                value = sensor.hi
+            ring = sensor.ring
+            if ring is not None:
+                ring.push(value)
+                value = ring.aggregate(sensor.mode)
+            # Round to the configured precision (half up)
+            step = sensor.step
+            if step > 1:
+                value = (value + (step >> 1)) // step * step
+        sensor.value = value
+        setattr(self.latest, sensor.name, value)
     
     def read_all(self):
-        """Read all enabled sensors
+        """Read every enabled sensor now, regardless of schedule
+        
+        Returns:
+            Readings: self.latest (the same record every call)
+        """
+        read = self._read
+        for sensor in self.schedule:
+            read(sensor)
+        return self.latest
+    
+    def poll(self):
+        """Read only the sensors that are due
+        
+        Call at least every config.SENSOR_TICK_MS. Channels that are not
+        due keep their cached value in self.latest. The first poll reads
+        every channel so the cache starts out complete.
         
         Returns:
-            dict: Dictionary with sensor readings
+            int: Number of sensors read
         """
-        readings = {}
+        now = time.ticks_ms()
+        count = 0
         
-        if config.SENSOR_TYPES.get('temperature', False):
-            readings['temperature'] = self.read_temperature()
+        for sensor in self.schedule:
+            if sensor.reads and time.ticks_diff(now, sensor.next_due) < 0:
+                continue
+            
+            self._read(sensor)
+            if not sensor.reads:
+                sensor.first_read = now
+            sensor.last_read = now
+            sensor.reads += 1
+            count += 1
+            
+            # Next slot on the fixed grid; skip (and count) any missed slots
+            sensor.next_due = time.ticks_add(sensor.next_due, sensor.period_ms)
+            late = time.ticks_diff(now, sensor.next_due)
+            if late >= 0:
+                missed = late // sensor.period_ms + 1
+                sensor.overruns += missed
+                sensor.next_due = time.ticks_add(sensor.next_due, missed * sensor.period_ms)
         
-        if config.SENSOR_TYPES.get('humidity', False):
-            readings['humidity'] = self.read_humidity()
+        if __debug__:
+            if count:
+                latest = self.latest
+                log.debug("[SENSOR] Read {}: T={} H={} P={} (0.01°C, 0.01%, 0.1Pa)", count,
+                          latest.temperature, latest.humidity, latest.pressure)
         
-        if config.SENSOR_TYPES.get('pressure', False):
-            readings['pressure'] = self.read_pressure()
+        return count
+    
+    def sample_once(self):
+        """Read every channel once, blocking for the probe conversion
         
-        if config.DEBUG_SENSORS:
-            print(f"[SENSOR] Readings: {readings}")
+        For deep-sleep duty cycling, where there is no scheduler loop to
+        pipeline DS18B20 conversions: the conversion is started first so
+        it runs while the I2C sensors are read, then collected.
         
-        return readings
+        Returns:
+            int: Number of sensors read
+        """
+        step = self._probe_step
+        if step is not None:
+            probes = self.sensors['ds18b20']
+            probes.start()
+        count = self.poll()
+        if step is not None:
+            time.sleep_ms(probes.remaining_ms())
+            probes.collect()
+            step.value = self.latest.probes = probes.temps
+        return count
+    
+    def get_aggregates(self, name):
+        """Get window statistics for one oversampled channel
+        
+        Args:
+            name: Channel name (e.g. 'temperature')
+            
+        Returns:
+            dict: samples, mean, min, max and median over the window
+                  (fixed-point units), or None if the channel is not
+                  oversampled
+        """
+        for sensor in self.schedule:
+            if sensor.name == name and sensor.ring is not None:
+                ring = sensor.ring
+                return {
+                    'samples': ring.count,
+                    'mean': ring.mean(),
+                    'min': ring.min(),
+                    'max': ring.max(),
+                    'median': ring.median(),
+                }
+        return None
+    
+    def get_schedule_stats(self):
+        """Get per-sensor scheduling statistics
+        
+        Returns:
+            dict: name -> period, reads, achieved rate (Hz) and overruns
+        """
+        return {
+            sensor.name: {
+                'period_ms': sensor.period_ms,
+                'reads': sensor.reads,
+                'rate_hz': round(sensor.rate_hz(), 3),
+                'overruns': sensor.overruns,
+            }
+            for sensor in self.schedule
+        }
     
     def validate_reading(self, value, min_val, max_val):
         """Validate sensor reading is within expected range
@@ -177,73 +515,664 @@ class SensorHandler:
             return False
         return min_val <= value <= max_val
     
-    def validate_all_readings(self, readings):
-        """Validate all sensor readings
+    def validate_all_readings(self):
+        """Validate the latest readings against each channel's valid range
         
-        Args:
-            readings: Dictionary of sensor readings
-            
         Returns:
             bool: True if all readings valid
         """
         valid = True
-        
-        if 'temperature' in readings:
-            # Valid temperature range: -40°C to 85°C (typical sensor range)
-            if not self.validate_reading(readings['temperature'], -40, 85):
-                print(f"[SENSOR] WARNING: Invalid temperature: {readings['temperature']}")
-                valid = False
-        
-        if 'humidity' in readings:
-            # Valid humidity range: 0-100%
-            if not self.validate_reading(readings['humidity'], 0, 100):
-                print(f"[SENSOR] WARNING: Invalid humidity: {readings['humidity']}")
+        for sensor in self._checked:
+            value = sensor.value
+            if value is None or not sensor.valid_min <= value <= sensor.valid_max:
+                log.warn("[SENSOR] WARNING: Invalid {}: {}", sensor.name, value)
                 valid = False
-        
-        if 'pressure' in readings:
-            # Valid pressure range: 30000-110000 Pa (300-1100 hPa)
-            if not self.validate_reading(readings['pressure'], 30000, 110000):
-                print(f"[SENSOR] WARNING: Invalid pressure: {readings['pressure']}")
-                valid = False
-        
         return valid
 
 
-# Sensor driver examples (to be implemented when real sensors are added)
+# Sensor drivers: BME280, SHT3x and INA219 on I2C, DS18B20 on one-wire, battery on the ADC
+
+# BME280 registers (Bosch BST-BME280-DS002)
+_BME280_CHIP_ID = const(0x60)
+_BME280_REG_CALIB_TP = const(0x88)  # 26 bytes: dig_T1..dig_P9, -, dig_H1
+_BME280_REG_CHIP_ID = const(0xD0)
+_BME280_REG_CALIB_H = const(0xE1)   # 7 bytes: dig_H2..dig_H6
+_BME280_REG_CTRL_HUM = const(0xF2)
+_BME280_REG_CTRL_MEAS = const(0xF4)
+_BME280_REG_CONFIG = const(0xF5)
+_BME280_REG_DATA = const(0xF7)      # 8 bytes: press[3], temp[3], hum[2]
+_BME280_MODE_FORCED = const(0x01)
+
+# Oversampling factor -> register code
+_BME280_OSRS = {1: 1, 2: 2, 4: 3, 8: 4, 16: 5}
+
 
 class BME280:
     """BME280 Temperature, Humidity, Pressure sensor driver
-    TODO: Implement actual BME280 driver or import library
+    
+    Runs the sensor in forced mode: each conversion is triggered with one
+    register write, then all raw data registers (0xF7-0xFE) are fetched
+    with a single burst read into a preallocated buffer. Calibration is
+    read once at init and compensation uses Bosch's integer formulas
+    (32-bit for temperature/humidity, 64-bit for pressure), no floats.
+    
+    One conversion feeds all three readings: the read_* methods (and the
+    float properties) reuse the last conversion while it is younger than
+    max_age_ms.
     """
-    def __init__(self, i2c, addr=0x76):
+    NAME = 'bme280'
+    ADDRESSES = (0x76, 0x77)
+    CHANNELS = ('temperature', 'humidity', 'pressure')
+    
+    @staticmethod
+    def probe(i2c, addr):
+        """True if the device at addr reports the BME280 chip ID"""
+        return i2c.readfrom_mem(addr, _BME280_REG_CHIP_ID, 1)[0] == _BME280_CHIP_ID
+    
+    def __init__(self, i2c, addr=0x76, oversampling=1, max_age_ms=100):
         self.i2c = i2c
         self.addr = addr
-        # TODO: Initialize sensor
+        self.max_age_ms = max_age_ms
+        
+        chip_id = i2c.readfrom_mem(addr, _BME280_REG_CHIP_ID, 1)[0]
+        if chip_id != _BME280_CHIP_ID:
+            raise OSError(f"BME280 not found at {hex(addr)} (chip id {hex(chip_id)})")
+        
+        self._read_calibration()
+        
+        # Same oversampling for all channels, filter off
+        osrs = _BME280_OSRS[oversampling]
+        i2c.writeto_mem(addr, _BME280_REG_CTRL_HUM, bytes((osrs,)))
+        i2c.writeto_mem(addr, _BME280_REG_CONFIG, b'\x00')
+        self._trigger = bytes(((osrs << 5) | (osrs << 2) | _BME280_MODE_FORCED,))
+        
+        # Maximum measurement time (datasheet 9.1), rounded up to whole ms
+        self._meas_ms = (1250 + 2300 * oversampling * 3 + 575 * 2 + 999) // 1000
+        
+        self._buf = bytearray(8)
+        self._stamp = None
+        self.conversions = 0
+        
+        # Last compensated values (integers)
+        self.t_fine = 0
+        self.temperature_centi = 0  # 0.01 degC
+        self.pressure_q8 = 0        # Pa in Q24.8
+        self.humidity_q10 = 0       # %RH in Q22.10
+    
+    def _read_calibration(self):
+        """Read the factory calibration coefficients (once, at init)"""
+        tp = self.i2c.readfrom_mem(self.addr, _BME280_REG_CALIB_TP, 26)
+        (self.dig_T1, self.dig_T2, self.dig_T3,
+         self.dig_P1, self.dig_P2, self.dig_P3, self.dig_P4, self.dig_P5,
+         self.dig_P6, self.dig_P7, self.dig_P8, self.dig_P9) = struct.unpack_from('<HhhHhhhhhhhh', tp)
+        self.dig_H1 = tp[25]
+        
+        h = self.i2c.readfrom_mem(self.addr, _BME280_REG_CALIB_H, 7)
+        self.dig_H2 = struct.unpack_from('<h', h)[0]
+        self.dig_H3 = h[2]
+        e4 = h[3] - 256 if h[3] > 127 else h[3]
+        e6 = h[5] - 256 if h[5] > 127 else h[5]
+        self.dig_H4 = (e4 << 4) | (h[4] & 0x0F)
+        self.dig_H5 = (e6 << 4) | (h[4] >> 4)
+        self.dig_H6 = h[6] - 256 if h[6] > 127 else h[6]
+    
+    def measure(self):
+        """Run one forced-mode conversion and compensate all channels"""
+        self.i2c.writeto_mem(self.addr, _BME280_REG_CTRL_MEAS, self._trigger)
+        time.sleep_ms(self._meas_ms)
+        self.i2c.readfrom_mem_into(self.addr, _BME280_REG_DATA, self._buf)
+        
+        b = self._buf
+        adc_p = (b[0] << 12) | (b[1] << 4) | (b[2] >> 4)
+        adc_t = (b[3] << 12) | (b[4] << 4) | (b[5] >> 4)
+        adc_h = (b[6] << 8) | b[7]
+        
+        self._compensate_temperature(adc_t)
+        self._compensate_pressure(adc_p)
+        self._compensate_humidity(adc_h)
+        
+        self._stamp = time.ticks_ms()
+        self.conversions += 1
+    
+    def _refresh(self):
+        """Measure if the last conversion is missing or too old"""
+        if self._stamp is None or time.ticks_diff(time.ticks_ms(), self._stamp) >= self.max_age_ms:
+            self.measure()
+    
+    def _compensate_temperature(self, adc_t):
+        t1 = self.dig_T1
+        var1 = (((adc_t >> 3) - (t1 << 1)) * self.dig_T2) >> 11
+        var2 = (((((adc_t >> 4) - t1) * ((adc_t >> 4) - t1)) >> 12) * self.dig_T3) >> 14
+        self.t_fine = var1 + var2
+        self.temperature_centi = (self.t_fine * 5 + 128) >> 8
+    
+    def _compensate_pressure(self, adc_p):
+        var1 = self.t_fine - 128000
+        var2 = var1 * var1 * self.dig_P6
+        var2 = var2 + ((var1 * self.dig_P5) << 17)
+        var2 = var2 + (self.dig_P4 << 35)
+        var1 = ((var1 * var1 * self.dig_P3) >> 8) + ((var1 * self.dig_P2) << 12)
+        var1 = (((1 << 47) + var1) * self.dig_P1) >> 33
+        if var1 == 0:
+            # Avoid division by zero (uncalibrated / disconnected sensor)
+            self.pressure_q8 = 0
+            return
+        p = 1048576 - adc_p
+        p = (((p << 31) - var2) * 3125) // var1
+        var1 = (self.dig_P9 * (p >> 13) * (p >> 13)) >> 25
+        var2 = (self.dig_P8 * p) >> 19
+        self.pressure_q8 = ((p + var1 + var2) >> 8) + (self.dig_P7 << 4)
+    
+    def _compensate_humidity(self, adc_h):
+        v = self.t_fine - 76800
+        v = ((((adc_h << 14) - (self.dig_H4 << 20) - (self.dig_H5 * v)) + 16384) >> 15) * \
+            (((((((v * self.dig_H6) >> 10) * (((v * self.dig_H3) >> 11) + 32768)) >> 10)
+               + 2097152) * self.dig_H2 + 8192) >> 14)
+        v = v - (((((v >> 15) * (v >> 15)) >> 7) * self.dig_H1) >> 4)
+        v = 0 if v < 0 else v
+        v = 419430400 if v > 419430400 else v
+        self.humidity_q10 = v >> 12
+    
+    def read_temperature(self):
+        """Temperature in 0.01 °C (int)"""
+        self._refresh()
+        return self.temperature_centi
+    
+    def read_humidity(self):
+        """Relative humidity in 0.01 % (int, rounded)"""
+        self._refresh()
+        return (self.humidity_q10 * 100 + 512) >> 10
+    
+    def read_pressure(self):
+        """Pressure in 0.1 Pa (int, rounded)"""
+        self._refresh()
+        return (self.pressure_q8 * 10 + 128) >> 8
     
     @property
     def temperature(self):
-        # TODO: Read temperature
-        return 22.0
+        """Temperature in degrees Celsius"""
+        self._refresh()
+        return self.temperature_centi / 100
     
     @property
     def humidity(self):
-        # TODO: Read humidity
-        return 50.0
+        """Relative humidity in percent"""
+        self._refresh()
+        return self.humidity_q10 / 1024
     
     @property
     def pressure(self):
-        # TODO: Read pressure (in Pa)
-        return 101325.0
+        """Pressure in Pascals"""
+        self._refresh()
+        return self.pressure_q8 / 256
+
+
+# SHT3x commands (Sensirion SHT3x-DIS datasheet), sent MSB first
+_SHT3X_MEASURE = b'\x24\x00'        # Single shot, high repeatability, no clock stretching
+_SHT3X_STATUS = b'\xf3\x2d'         # Read status register
+_SHT3X_MEASURE_MS = const(16)       # Max high-repeatability measurement time (15 ms)
+_SHT3X_STATUS_RESERVED = const(0x53EC)  # Status bits 14, 12, 9-5, 3-2: reserved, read as 0
+
+
+def _sht3x_crc(buf, start):
+    """Sensirion CRC-8 (poly 0x31, init 0xFF) of buf[start:start + 2]"""
+    crc = 0xFF
+    for i in range(start, start + 2):
+        crc ^= buf[i]
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x31) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+    return crc
+
+
+class SHT3X:
+    """SHT30/31/35 temperature and humidity sensor driver
+    
+    Single-shot measurements without clock stretching: one command write,
+    a wait, then one 6-byte read (temperature and humidity words, each with
+    its CRC) into a preallocated buffer. Conversion to fixed-point units is
+    integer only. Like BME280, one measurement feeds both readings while it
+    is younger than max_age_ms.
+    """
+    NAME = 'sht3x'
+    ADDRESSES = (0x44, 0x45)
+    CHANNELS = ('temperature', 'humidity')
+    
+    @staticmethod
+    def probe(i2c, addr):
+        """True if the device at addr returns a plausible status word
+        
+        The CRC alone passes for 1 in 256 other devices (an INA219 shares
+        0x44/0x45), so the reserved status bits must read as zero too.
+        """
+        i2c.writeto(addr, _SHT3X_STATUS)
+        buf = i2c.readfrom(addr, 3)
+        return _sht3x_crc(buf, 0) == buf[2] and not ((buf[0] << 8) | buf[1]) & _SHT3X_STATUS_RESERVED
+    
+    def __init__(self, i2c, addr=0x44, max_age_ms=100):
+        self.i2c = i2c
+        self.addr = addr
+        self.max_age_ms = max_age_ms
+        self._buf = bytearray(6)
+        self._stamp = None
+        self.conversions = 0
+        self.crc_errors = 0
+        self.temperature_centi = 0  # 0.01 degC
+        self.humidity_centi = 0     # 0.01 %RH
+        if not self.probe(i2c, addr):
+            raise OSError(f"SHT3x not found at {hex(addr)}")
+    
+    def measure(self):
+        """Run one single-shot measurement"""
+        self.i2c.writeto(self.addr, _SHT3X_MEASURE)
+        time.sleep_ms(_SHT3X_MEASURE_MS)
+        b = self._buf
+        self.i2c.readfrom_into(self.addr, b)
+        if _sht3x_crc(b, 0) != b[2] or _sht3x_crc(b, 3) != b[5]:
+            self.crc_errors += 1
+            raise OSError("SHT3x CRC error")
+        # T = -45 + 175 * raw / 65535, RH = 100 * raw / 65535 (rounded)
+        self.temperature_centi = (17500 * ((b[0] << 8) | b[1]) + 32767) // 65535 - 4500
+        self.humidity_centi = (10000 * ((b[3] << 8) | b[4]) + 32767) // 65535
+        self._stamp = time.ticks_ms()
+        self.conversions += 1
+    
+    def _refresh(self):
+        """Measure if the last measurement is missing or too old"""
+        if self._stamp is None or time.ticks_diff(time.ticks_ms(), self._stamp) >= self.max_age_ms:
+            self.measure()
+    
+    def read_temperature(self):
+        """Temperature in 0.01 °C (int)"""
+        self._refresh()
+        return self.temperature_centi
+    
+    def read_humidity(self):
+        """Relative humidity in 0.01 % (int)"""
+        self._refresh()
+        return self.humidity_centi
+
+
+# INA219 registers (TI SBOS448)
+_INA219_REG_CONFIG = const(0x00)
+_INA219_REG_SHUNT = const(0x01)     # Shunt voltage, 10 uV LSB (signed)
+_INA219_REG_BUS = const(0x02)       # Bus voltage in bits 15-3, 4 mV LSB
+_INA219_RESET = b'\x80\x00'
+_INA219_CONFIG_DEFAULT = const(0x399F)  # Power-on config: 32 V, 320 mV, 12 bit, continuous
+
+
+class INA219:
+    """INA219 bus voltage and shunt monitor driver
+    
+    Left in its power-on configuration (continuous 12-bit conversions of
+    both voltages), so a reading is one 2-byte register read into a
+    preallocated buffer, with no trigger or wait.
+    """
+    NAME = 'ina219'
+    ADDRESSES = tuple(range(0x40, 0x50))
+    CHANNELS = ('voltage',)
+    
+    @staticmethod
+    def probe(i2c, addr):
+        """True if the device at addr resets to the INA219 default config
+        
+        Writes the reset bit, so only probe addresses no other driver
+        has claimed.
+        """
+        i2c.writeto_mem(addr, _INA219_REG_CONFIG, _INA219_RESET)
+        return struct.unpack('>H', i2c.readfrom_mem(addr, _INA219_REG_CONFIG, 2))[0] == _INA219_CONFIG_DEFAULT
+    
+    def __init__(self, i2c, addr=0x40):
+        self.i2c = i2c
+        self.addr = addr
+        self._buf = bytearray(2)
+        i2c.writeto_mem(addr, _INA219_REG_CONFIG, _INA219_RESET)
+    
+    def read_voltage(self):
+        """Bus voltage in mV (int)"""
+        b = self._buf
+        self.i2c.readfrom_mem_into(self.addr, _INA219_REG_BUS, b)
+        return (((b[0] << 8) | b[1]) >> 3) * 4
+    
+    def read_shunt_voltage(self):
+        """Shunt voltage in 10 uV steps (int, signed)"""
+        b = self._buf
+        self.i2c.readfrom_mem_into(self.addr, _INA219_REG_SHUNT, b)
+        raw = (b[0] << 8) | b[1]
+        return raw - 0x10000 if raw & 0x8000 else raw
+
+
+# I2C driver registry, in probe order: a device is given to the first
+# driver that lists its address and whose probe() accepts it (drivers
+# with a read-only probe go before ones whose probe writes)
+I2C_DRIVERS = (BME280, SHT3X, INA219)
+_DRIVERS_BY_NAME = {driver.NAME: driver for driver in I2C_DRIVERS}
+
+
+def identify(i2c, addr):
+    """Driver class for the device at addr, or None if no driver claims it"""
+    for driver in I2C_DRIVERS:
+        if addr in driver.ADDRESSES:
+            try:
+                if driver.probe(i2c, addr):
+                    return driver
+            except OSError:
+                pass
+    return None
+
+
+# DS18B20 one-wire commands and timing
+_DS18B20_FAMILY = const(0x28)
+_DS18B20_CONVERT = const(0x44)
+_DS18B20_READ_SCRATCH = const(0xBE)
+_DS18B20_WRITE_SCRATCH = const(0x4E)
+_DS18B20_CONV_MS = (94, 188, 375, 750)  # Max conversion time for 9-12 bits
 
 
 class DS18B20:
-    """DS18B20 Temperature sensor driver
-    TODO: Implement actual DS18B20 driver or import library
+    """DS18B20 one-wire temperature probes (any number on one bus)
+    
+    Conversions are pipelined instead of blocking: one broadcast Convert T
+    (Skip ROM) starts every probe at once, and the results are collected
+    on a later tick once the conversion time has passed - then the next
+    conversion is started straight away. tick() never sleeps.
+    
+    ROM IDs are found once at init (call rescan() after changing probes).
+    Resolution can be set per probe to trade accuracy for conversion time;
+    the bus waits for the slowest probe.
+    """
+    
+    def __init__(self, pin, resolution=12, resolutions=None, reads_per_tick=0):
+        self.ow = onewire.OneWire(pin)
+        self.default_resolution = resolution
+        self.resolutions = resolutions or {}
+        self.reads_per_tick = reads_per_tick
+        self._buf = bytearray(9)
+        self._ready_at = None
+        self._next = 0                  # Next probe to collect
+        
+        # Statistics
+        self.conversions = 0
+        self.crc_errors = 0
+        
+        self.rescan()
+    
+    def rescan(self):
+        """Search the bus for probes and configure their resolution"""
+        self.roms = [rom for rom in self.ow.scan() if rom[0] == _DS18B20_FAMILY]
+        self.temps = [None] * len(self.roms)    # 0.01 °C, per probe
+        
+        conv_ms = 0
+        for rom in self.roms:
+            bits = self.resolutions.get(rom_id(rom), self.default_resolution)
+            self._set_resolution(rom, bits)
+            conv_ms = max(conv_ms, _DS18B20_CONV_MS[bits - 9])
+        self.conversion_ms = conv_ms
+        self._ready_at = None
+        self._next = 0
+    
+    def _set_resolution(self, rom, bits):
+        """Write the configuration register (TH/TL alarms left at defaults)"""
+        self.ow.select_rom(rom)
+        self.ow.writebyte(_DS18B20_WRITE_SCRATCH)
+        self.ow.write(bytes((0x4B, 0x46, ((bits - 9) << 5) | 0x1F)))
+    
+    def start(self):
+        """Start a conversion on every probe at once (broadcast Convert T)"""
+        self.ow.reset()
+        self.ow.writebyte(self.ow.SKIP_ROM)
+        self.ow.writebyte(_DS18B20_CONVERT)
+        self._ready_at = time.ticks_add(time.ticks_ms(), self.conversion_ms)
+    
+    def ready(self):
+        """True once the running conversion has had time to finish"""
+        return self._ready_at is not None and time.ticks_diff(time.ticks_ms(), self._ready_at) >= 0
+    
+    def remaining_ms(self):
+        """Milliseconds until the running conversion is done (0 if none)"""
+        if self._ready_at is None:
+            return 0
+        return max(0, time.ticks_diff(self._ready_at, time.ticks_ms()))
+    
+    def collect(self, count=0):
+        """Read probe scratchpads into self.temps
+        
+        Args:
+            count: Probes to read this call (0 = all remaining)
+            
+        Returns:
+            bool: True once every probe of this conversion has been read
+        """
+        buf = self._buf
+        temps = self.temps
+        roms = self.roms
+        end = len(roms) if not count else min(len(roms), self._next + count)
+        
+        for i in range(self._next, end):
+            self.ow.select_rom(roms[i])
+            self.ow.writebyte(_DS18B20_READ_SCRATCH)
+            self.ow.readinto(buf)
+            if self.ow.crc8(buf):
+                self.crc_errors += 1
+                temps[i] = None
+                continue
+            raw = buf[0] | (buf[1] << 8)
+            if raw & 0x8000:
+                raw -= 0x10000
+            temps[i] = (raw * 100 + 8) >> 4     # 1/16 °C -> 0.01 °C, rounded
+        
+        self._next = end
+        if end < len(roms):
+            return False
+        self._next = 0
+        self.conversions += 1
+        return True
+    
+    def tick(self):
+        """Advance the conversion pipeline (call every scheduler tick)
+        
+        Once a conversion is done, up to reads_per_tick probes are read per
+        call (0 = all at once) to bound the time spent on the bus; when the
+        last probe is read the next conversion starts immediately.
+        
+        Returns:
+            bool: True if a full set of new temperatures was collected
+        """
+        if not self.roms:
+            return False
+        if self._ready_at is None:
+            self.start()
+            return False
+        if not self.ready():
+            return False
+        if not self.collect(self.reads_per_tick):
+            return False
+        self.start()
+        return True
+
+
+def rom_id(rom):
+    """ROM code as a hex string (key for config.DS18B20_RESOLUTIONS)"""
+    return ''.join('%02x' % b for b in rom)
+
+
+# ESP32 ADC: nominal input range per attenuation (dB -> mV at full scale),
+# used to scale read_u16() when the eFuse calibration is not used
+_ADC_ATTEN = {0: 'ATTN_0DB', 2: 'ATTN_2_5DB', 6: 'ATTN_6DB', 11: 'ATTN_11DB'}
+_ADC_FULL_SCALE_MV = {0: 1100, 2: 1500, 6: 2200, 11: 3900}
+
+
+class BatteryADC:
+    """Battery voltage and charge from an ADC pin behind a resistor divider
+    
+    Each measurement is a burst of conversions paced at rate_hz into a
+    preallocated array (read_uv() with the eFuse calibration, or raw
+    read_u16() scaled by the nominal range, which is faster). Samples
+    further than `reject` mean absolute deviations from the burst mean are
+    dropped and the rest averaged; the lowest remaining sample is kept as
+    the burst's sag, so an engine start shows up even between reports.
+    
+    The average is scaled by the divider ratio, trimmed by an optional
+    two-point calibration and mapped to a charge percent with a piecewise
+    linear curve. Everything after the samples is integer arithmetic. Like
+    BME280, one burst feeds both readings while younger than max_age_ms.
+    
+    Rates above what the ADC and interpreter sustain are not an error: the
+    burst runs flat out and sample_rate_hz reports what was achieved.
     """
-    def __init__(self, pin):
-        self.pin = pin
-        # TODO: Initialize sensor
+    NAME = 'adc'
+    CHANNELS = ('voltage', 'battery')
+    
+    def __init__(self, pin, samples=128, rate_hz=10000, atten=11, efuse=True, reject=3,
+                 divider=1.0, calibration=None, curve=None, max_age_ms=100):
+        """
+        Args:
+            pin: machine.Pin of an ADC1 channel
+            samples: Conversions per burst
+            rate_hz: Target sample rate within a burst (0 = as fast as possible)
+            atten: Input attenuation in dB (0, 2, 6 or 11)
+            efuse: Convert with the eFuse calibration (read_uv)
+            reject: Outlier limit in mean absolute deviations (0 = keep all)
+            divider: Battery volts per ADC volt
+            calibration: ((reported_mv, true_mv), (reported_mv, true_mv))
+                         at the battery, or None
+            curve: ((mv, percent), ...) ascending, or None for no charge
+        """
+        self.adc = ADC(pin, atten=getattr(ADC, _ADC_ATTEN[atten]))
+        self._read = self.adc.read_uv if efuse else self.adc.read_u16
+        self._full_scale_uv = None if efuse else _ADC_FULL_SCALE_MV[atten] * 1000
+        self.samples = samples
+        self.rate_hz = rate_hz
+        self._period_us = 1000000 // rate_hz if rate_hz else 0
+        self.reject = reject
+        self._gain = round(divider * 1000000)       # Divider ratio in millionths
+        self._calibration = calibration
+        self._curve = curve
+        self.max_age_ms = max_age_ms
+        self._buf = array('I', bytes(4 * samples))
+        self._stamp = None
+        
+        # Last burst (battery mV, percent) and statistics
+        self.voltage_mv = 0
+        self.percent = None
+        self.sag_mv = 0             # Lowest accepted sample of the last burst
+        self.min_mv = None          # Lowest sag since init (or reset_min)
+        self.sample_rate_hz = 0     # Achieved rate of the last burst
+        self.rejected = 0           # Samples dropped from the last burst
+        self.bursts = 0
+    
+    def burst(self):
+        """Sample one burst into the buffer
+        
+        Samples are scheduled on absolute times (no drift from the loop
+        overhead); if a conversion overruns its slot the next one starts
+        straight away.
+        """
+        buf = self._buf
+        read = self._read
+        period = self._period_us
+        ticks_us = time.ticks_us
+        ticks_diff = time.ticks_diff
+        ticks_add = time.ticks_add
+        start = ticks_us()
+        due = start
+        for i in range(self.samples):
+            if period:
+                while ticks_diff(ticks_us(), due) < 0:
+                    pass
+                due = ticks_add(due, period)
+            buf[i] = read()
+        elapsed = ticks_diff(ticks_us(), start)
+        self.sample_rate_hz = self.samples * 1000000 // elapsed if elapsed > 0 else 0
+    
+    def measure(self):
+        """Run a burst, reject outliers and update the readings"""
+        self.burst()
+        buf = self._buf
+        n = self.samples
+        total = 0
+        for i in range(n):
+            total += buf[i]
+        mean = total // n
+        low = mean
+        kept = n
+        if self.reject:
+            dev = 0
+            for i in range(n):
+                d = buf[i] - mean
+                dev += d if d >= 0 else -d
+            limit = (self.reject * dev + n - 1) // n
+            total = kept = 0
+            low = 0xFFFFFFFF
+            for i in range(n):
+                v = buf[i]
+                if mean - limit <= v <= mean + limit:
+                    total += v
+                    kept += 1
+                    if v < low:
+                        low = v
+            if not kept:
+                # Nothing within the limit (bimodal burst): average all
+                total, kept, low = mean * n, n, mean
+        self.rejected = n - kept
+        self.voltage_mv = self._to_mv((2 * total + kept) // (2 * kept))
+        self.sag_mv = self._to_mv(low)
+        if self.min_mv is None or self.sag_mv < self.min_mv:
+            self.min_mv = self.sag_mv
+        self.percent = self._charge(self.voltage_mv)
+        self._stamp = time.ticks_ms()
+        self.bursts += 1
+    
+    def _to_mv(self, counts):
+        """Sample units (uV or raw) -> calibrated battery mV"""
+        uv = counts if self._full_scale_uv is None else counts * self._full_scale_uv // 65535
+        mv = (uv * self._gain + 500000000) // 1000000000
+        cal = self._calibration
+        if cal is not None:
+            (m1, t1), (m2, t2) = cal
+            mv = t1 + ((mv - m1) * (t2 - t1) * 2 + (m2 - m1)) // ((m2 - m1) * 2)
+        return mv
+    
+    def _charge(self, mv):
+        """Charge percent for a battery voltage (curve interpolation)"""
+        curve = self._curve
+        if not curve:
+            return None
+        if mv <= curve[0][0]:
+            return curve[0][1]
+        for i in range(1, len(curve)):
+            v1, p1 = curve[i]
+            if mv < v1:
+                v0, p0 = curve[i - 1]
+                return p0 + ((mv - v0) * (p1 - p0) * 2 + (v1 - v0)) // ((v1 - v0) * 2)
+        return curve[-1][1]
+    
+    def _refresh(self):
+        """Measure if the last burst is missing or too old"""
+        if self._stamp is None or time.ticks_diff(time.ticks_ms(), self._stamp) >= self.max_age_ms:
+            self.measure()
+    
+    def reset_min(self):
+        """Start a new lowest-sag window"""
+        self.min_mv = None
+    
+    def read_voltage(self):
+        """Battery voltage in mV (int)"""
+        self._refresh()
+        return self.voltage_mv
+    
+    def read_battery(self):
+        """Charge in percent (int), None without a curve"""
+        self._refresh()
+        return self.percent
     
-    def read_temp(self):
-        # TODO: Read temperature
-        return 22.0
+    def get_stats(self):
+        """Burst statistics: sample rates, rejected samples, sag"""
+        return {
+            'samples': self.samples,
+            'rate_hz': self.rate_hz,
+            'achieved_hz': self.sample_rate_hz,
+            'rejected': self.rejected,
+            'sag_mv': self.sag_mv,
+            'min_mv': self.min_mv,
+            'bursts': self.bursts,
+        }
@@ -0,0 +1,173 @@
+"""
+Status LED
+==========
+Plays LED patterns from a machine.Timer callback, so blinking never
+sleeps or wakes a task in the main loop.
+
+Patterns are declarative (config.LED_PATTERNS): a tuple of durations in
+ms, alternating on and off, starting with on. States (connection, low
+battery, errors) are switched on and off with set(); the highest-priority
+active state (config.LED_PRIORITY) repeats its pattern. Errors are blink
+codes (config.LED_BLINK_CODES): n blinks, then a pause. flash() plays a
+pattern once (e.g. on each advertisement update), then the state pattern
+resumes; a flash of a pattern that is itself listed in the priority is
+dropped while a state above it is active, so activity blips never break
+up an error code.
+
+A pattern always plays to its end before the next one starts, so blink
+codes stay countable; an idle LED starts at once. Each timer callback
+sets the pin and re-arms a one-shot timer for the next step.
+"""
+
+import time
+from machine import Pin, Timer
+from micropython import const
+
+import config
+import log
+
+_CODE_BLINK_MS = const(300)         # On and off time of one blink in a code
+_CODE_PAUSE_MS = const(1500)        # Off time after the last blink
+
+
+class StatusLed:
+    """Timer-driven LED pattern player"""
+
+    def __init__(self, pin, patterns, priority, blink_codes=None, timer_id=0):
+        """
+        Args:
+            pin: machine.Pin (output) driving the LED
+            patterns: name -> tuple of on/off durations (ms)
+            priority: State names, highest priority first
+            blink_codes: name -> blink count (error states)
+            timer_id: machine.Timer to use
+        """
+        self.pin = pin
+        self.patterns = dict(patterns)
+        for name, count in (blink_codes or {}).items():
+            self.patterns[name] = (_CODE_BLINK_MS, _CODE_BLINK_MS) * (count - 1) + (
+                _CODE_BLINK_MS, _CODE_PAUSE_MS)
+        self.priority = tuple(name for name in priority if name in self.patterns)
+        self._active = 0                # Bit i set = state priority[i] is on
+        self._flash = None              # Pattern to play once next
+        self._flash_rank = -1           # Its priority index (-1 = always plays)
+        self._pattern = None            # Pattern playing
+        self._index = 0                 # Next step of the pattern
+        self._idle = True               # No timer armed
+        self.playing = None             # Name of the pattern playing
+        self._timer = Timer(timer_id)
+        self._step_cb = self._step      # Bound once: re-arming allocates nothing
+
+        # Statistics
+        self.steps = 0                  # Timer callbacks
+        self.step_max_us = 0            # Longest callback
+        pin.value(0)
+
+    def set(self, state, on=True):
+        """Switch a state on or off (unknown states are ignored)
+
+        Returns:
+            bool: True if the state changed
+        """
+        try:
+            bit = 1 << self.priority.index(state)
+        except ValueError:
+            return False
+        active = self._active | bit if on else self._active & ~bit
+        if active == self._active:
+            return False
+        self._active = active
+        if self._idle:
+            self._step(None)
+        return True
+
+    def is_set(self, state):
+        """True if the state is on"""
+        return state in self.priority and bool(self._active & (1 << self.priority.index(state)))
+
+    def flash(self, name):
+        """Play a pattern once, after the pattern playing now"""
+        self._flash = self.patterns[name]
+        self._flash_rank = self.priority.index(name) if name in self.priority else -1
+        if self._idle:
+            self._step(None)
+
+    def show_sensors(self, valid, readings):
+        """Set 'sensor_error' and 'low_battery' from the latest readings
+
+        Args:
+            valid: Result of SensorHandler.validate_all_readings()
+            readings: SensorHandler.latest
+        """
+        self.set('sensor_error', not valid)
+        battery = readings.battery
+        self.set('low_battery', battery is not None and battery < config.LED_LOW_BATTERY_PERCENT)
+
+    def _select(self):
+        """Next pattern: a pending flash, else the top active state"""
+        active = self._active
+        top = 0
+        while active and not active & (1 << top):
+            top += 1
+        flash = self._flash
+        if flash is not None:
+            self._flash = None
+            if not active or self._flash_rank < top:
+                self.playing = 'flash'
+                return flash
+        if not active:
+            self.playing = None
+            return None
+        name = self.priority[top]
+        self.playing = name
+        return self.patterns[name]
+
+    def _step(self, _timer):
+        """Timer callback: drive the pin for the next step and re-arm"""
+        start = time.ticks_us()
+        pattern = self._pattern
+        i = self._index
+        if pattern is None or i >= len(pattern):
+            pattern = self._pattern = self._select()
+            i = 0
+        if pattern is None:
+            self.pin.value(0)
+            self._idle = True
+        else:
+            self.pin.value(not i & 1)
+            self._index = i + 1
+            self._idle = False
+            self._timer.init(mode=Timer.ONE_SHOT, period=pattern[i], callback=self._step_cb)
+        self.steps += 1
+        elapsed = time.ticks_diff(time.ticks_us(), start)
+        if elapsed > self.step_max_us:
+            self.step_max_us = elapsed
+
+    def stop(self):
+        """Stop the timer and turn the LED off"""
+        self._timer.deinit()
+        self._pattern = None
+        self._idle = True
+        self.playing = None
+        self.pin.value(0)
+
+    def get_stats(self):
+        """Get the pattern playing, active states and callback timing"""
+        return {
+            'playing': self.playing,
+            'states': [name for i, name in enumerate(self.priority) if self._active & (1 << i)],
+            'steps': self.steps,
+            'step_max_us': self.step_max_us,
+        }
+
+
+def from_config():
+    """StatusLed on config.LED_PIN, or None if disabled or unavailable"""
+    if not config.LED_ENABLED:
+        return None
+    try:
+        return StatusLed(Pin(config.LED_PIN, Pin.OUT), config.LED_PATTERNS, config.LED_PRIORITY,
+                         config.LED_BLINK_CODES, config.LED_TIMER_ID)
+    except Exception as e:
+        log.warn("[LED] LED not available: {}", e)
+        return None
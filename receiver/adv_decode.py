@@ -0,0 +1,383 @@
+"""
+Advertisement Decoder - Reference Implementation
+================================================
+Python mirror of ESP32SignalK.decode() in ESP32SignalK_adv.js, for host
+tools and receiver-side scripts. Keep the two in step.
+
+Input is the manufacturer data with the company ID stripped (as BlueZ /
+bleak report it). Returns engineering units (°C, %, Pa, V, %); missing
+fields are None.
+
+v3 payloads are single frames of a multi-frame update; SnapshotAssembler
+merges them and reports when an update has been seen in full.
+
+History frames (version 4) rotate with the v3 frames and repeat past
+broadcasts; HistoryBackfill turns them into the updates a receiver missed,
+with their original timestamps.
+
+DedupCache sits in front of decode(): it drops the byte-for-byte repeats
+a node advertises between updates.
+"""
+
+import struct
+from collections import OrderedDict
+
+V2_TEMPERATURE = 0x01   # sint16, 0.01°C
+V2_HUMIDITY = 0x02      # uint16, 0.01%
+V2_PRESSURE = 0x04      # uint24, 0.1 Pa
+V2_VOLTAGE = 0x08       # uint16, mV
+V2_BATTERY = 0x10       # uint8, %
+
+FIELDS = ('temperature', 'humidity', 'pressure', 'voltage', 'battery')
+
+# v3 channels, in mask bit order: (name, struct format, divisor, multiplier)
+# Format 'u24' is a 3-byte little-endian unsigned integer.
+V3_CHANNELS = (
+    ('temperature', '<h', 100.0, 1),
+    ('humidity', '<H', 100.0, 1),
+    ('pressure', 'u24', 10.0, 1),
+    ('voltage', '<H', 1000.0, 1),
+    ('battery', 'B', 1, 1),
+) + tuple(('probe%d' % i, '<h', 100.0, 1) for i in range(8)) + (
+    ('uptime', '<H', 1, 60),        # Sent in minutes, reported in seconds
+    ('mem_free', '<H', 1, 16),      # Sent in 16-byte units, reported in bytes
+    ('overruns', '<H', 1, 1),
+    ('worst_cycle', '<H', 1, 1),    # Milliseconds
+)
+V3_FIELDS = tuple(channel[0] for channel in V3_CHANNELS)
+
+HISTORY_VERSION = 0x04
+# History entries and live receipts of the same sequence number this close
+# together are the same update (seq wraps after 256 updates, at least 256 s)
+SAME_UPDATE_MS = 60000
+
+# Engineering units to SignalK units (K, ratio, Pa, V, ratio), as TO_SIGNALK
+# in ESP32SignalK_adv.js
+TO_SIGNALK = {
+    'temperature': lambda t: round(273.15 + t, 2),
+    'humidity': lambda h: round(h / 100.0, 4),
+    'pressure': lambda p: round(p, 1),
+    'voltage': lambda v: v,
+    'battery': lambda b: b / 100.0,
+}
+
+# Repeat suppression (DedupCache)
+DEDUP_MAX_DEVICES = 1024        # Least recently heard devices evicted beyond this
+DEDUP_MAX_AGE_MS = 30000        # Entries expire; unchanged frames re-forwarded this often
+
+COMPANY_ID = 0xFFFF
+AD_TYPE_MANUFACTURER = 0xFF
+
+
+def manufacturer_data(adv, company_id=COMPANY_ID):
+    """Extract manufacturer data from a raw advertisement payload
+
+    Args:
+        adv: Advertisement bytes (sequence of length/type/data structures)
+        company_id: Company ID to match
+
+    Returns:
+        bytes: Manufacturer data after the company ID, or None
+    """
+    i = 0
+    while i < len(adv):
+        length = adv[i]
+        if length == 0 or i + 1 + length > len(adv):
+            break
+        if adv[i + 1] == AD_TYPE_MANUFACTURER and length >= 3:
+            if adv[i + 2] | (adv[i + 3] << 8) == company_id:
+                return bytes(adv[i + 4:i + 1 + length])
+        i += 1 + length
+    return None
+
+
+def decode(data):
+    """Decode a v1 or v2 payload
+
+    Args:
+        data: Manufacturer data bytes (company ID stripped)
+
+    Returns:
+        dict: version, seq and field values, or None if invalid
+    """
+    if not data:
+        return None
+    values = dict.fromkeys(FIELDS)
+    values['version'] = data[0]
+    values['seq'] = None
+
+    if data[0] == 0x01:
+        if len(data) < 10:
+            return None
+        t, h, p, b = struct.unpack_from('<hHIB', data, 1)
+        values.update(temperature=t / 100.0, humidity=h / 100.0, pressure=p / 10.0, battery=b)
+        return values
+
+    if data[0] == 0x02:
+        if len(data) < 3:
+            return None
+        values['seq'] = data[1]
+        if _decode_fields(data, 3, data[2], values) is None:
+            return None
+        return values
+
+    if data[0] == 0x03:
+        return _decode_v3(data)
+
+    if data[0] == HISTORY_VERSION:
+        return _decode_history(data)
+
+    return None
+
+
+def _decode_fields(data, offset, mask, values):
+    """Decode the v2 fields for the set mask bits into values
+
+    Returns:
+        int: Offset after the fields, or None if the data is too short
+    """
+    try:
+        if mask & V2_TEMPERATURE:
+            values['temperature'] = struct.unpack_from('<h', data, offset)[0] / 100.0
+            offset += 2
+        if mask & V2_HUMIDITY:
+            values['humidity'] = struct.unpack_from('<H', data, offset)[0] / 100.0
+            offset += 2
+        if mask & V2_PRESSURE:
+            if offset + 3 > len(data):
+                return None
+            values['pressure'] = int.from_bytes(data[offset:offset + 3], 'little') / 10.0
+            offset += 3
+        if mask & V2_VOLTAGE:
+            values['voltage'] = struct.unpack_from('<H', data, offset)[0] / 1000.0
+            offset += 2
+        if mask & V2_BATTERY:
+            if offset + 1 > len(data):
+                return None
+            values['battery'] = data[offset]
+            offset += 1
+    except struct.error:
+        return None
+    return offset
+
+
+def _decode_history(data):
+    """Decode a history frame: [4][entries...]
+
+    Each entry is [seq][mask][age: uint16 s][v2 fields for the mask bits].
+
+    Returns:
+        dict: version and entries (seq, age in seconds and field values),
+              or None if invalid
+    """
+    entries = []
+    offset = 1
+    while offset < len(data):
+        if offset + 4 > len(data):
+            return None
+        seq, mask, age = struct.unpack_from('<BBH', data, offset)
+        entry = dict.fromkeys(FIELDS)
+        entry['seq'] = seq
+        entry['age'] = age
+        offset = _decode_fields(data, offset + 4, mask, entry)
+        if offset is None:
+            return None
+        entries.append(entry)
+    return {'version': HISTORY_VERSION, 'entries': entries}
+
+
+def _decode_v3(data):
+    """Decode one v3 frame: [3][seq][index<<4 | count][mask:3][fields...]"""
+    if len(data) < 6:
+        return None
+    values = dict.fromkeys(V3_FIELDS)
+    values['version'] = 3
+    values['seq'] = data[1]
+    values['frame'] = data[2] >> 4
+    values['frames'] = data[2] & 0x0F
+    mask = data[3] | (data[4] << 8) | (data[5] << 16)
+    offset = 6
+    for bit, (name, fmt, divisor, multiplier) in enumerate(V3_CHANNELS):
+        if not mask & (1 << bit):
+            continue
+        if fmt == 'u24':
+            if offset + 3 > len(data):
+                return None
+            raw = int.from_bytes(data[offset:offset + 3], 'little')
+            offset += 3
+        else:
+            size = struct.calcsize(fmt)
+            if offset + size > len(data):
+                return None
+            raw = struct.unpack_from(fmt, data, offset)[0]
+            offset += size
+        values[name] = raw / divisor if divisor != 1 else raw * multiplier
+    return values
+
+
+class SnapshotAssembler:
+    """Rebuilds complete v3 updates from individually received frames
+
+    Frames of one update share a sequence number; the update is complete
+    once all `frames` indexes have been seen. Values of channels carry over
+    between updates, so current() always holds the latest known value of
+    each channel.
+    """
+
+    def __init__(self):
+        self.values = dict.fromkeys(V3_FIELDS)
+        self.seq = None
+        self.seen = 0               # Bitmask of frame indexes seen for seq
+        self.done = False           # All frames of seq seen
+        self.complete = 0           # Updates seen in full
+        self.incomplete = 0         # Updates superseded before completion
+
+    def add(self, decoded):
+        """Merge a decoded frame
+
+        Returns:
+            bool: True if this frame completed its update
+        """
+        if decoded is None or decoded['version'] == HISTORY_VERSION:
+            return False
+        if decoded['version'] < 3:
+            for name in FIELDS:
+                self.values[name] = decoded[name]
+            self.complete += 1
+            return True
+
+        if decoded['seq'] != self.seq:
+            if self.seen and not self.done:
+                self.incomplete += 1
+            self.seq = decoded['seq']
+            self.seen = 0
+            self.done = False
+        bit = 1 << decoded['frame']
+        if self.seen & bit:
+            return False
+        for name in V3_FIELDS:
+            if decoded[name] is not None:
+                self.values[name] = decoded[name]
+        self.seen |= bit
+        if self.seen == (1 << decoded['frames']) - 1:
+            self.done = True
+            self.complete += 1
+            return True
+        return False
+
+    def current(self):
+        return self.values
+
+
+class HistoryBackfill:
+    """Recovers missed updates from history frames
+
+    Every live update (v2/v3 frame carrying environment fields) and every
+    history entry is noted by sequence number and time. A history entry
+    whose sequence number has not been noted within SAME_UPDATE_MS of its
+    time is an update the receiver missed: it is returned for backfill,
+    timestamped when it was broadcast (receipt time minus its age).
+    """
+
+    def __init__(self):
+        self.seen_ms = [None] * 256     # Time each seq was last received or backfilled
+        self.recovered = 0
+
+    def add(self, decoded, now_ms):
+        """Note a decoded frame received at now_ms
+
+        Returns:
+            list: (timestamp_ms, values) for each update recovered
+        """
+        if decoded is None:
+            return []
+        seen = self.seen_ms
+        if decoded['version'] != HISTORY_VERSION:
+            seq = decoded['seq']
+            if seq is not None and any(decoded[name] is not None for name in FIELDS):
+                if seen[seq] is None or abs(now_ms - seen[seq]) > SAME_UPDATE_MS:
+                    seen[seq] = now_ms
+            return []
+
+        recovered = []
+        for entry in decoded['entries']:
+            seq = entry['seq']
+            timestamp = now_ms - entry['age'] * 1000
+            if seen[seq] is not None and abs(timestamp - seen[seq]) <= SAME_UPDATE_MS:
+                continue
+            seen[seq] = timestamp
+            recovered.append((timestamp, {name: entry[name] for name in FIELDS}))
+        self.recovered += len(recovered)
+        return recovered
+
+
+class DedupCache:
+    """Suppresses repeated advertisements before they are decoded
+
+    A node re-advertises each update until the next one (every 100 ms for
+    a 1 s update), so most frames a receiver sees are exact repeats. Per
+    device the cache keeps the sequence number of the current update and
+    the raw bytes last forwarded for each frame slot (the frame index for
+    v3, one slot per version otherwise); a frame matching its slot under
+    the same sequence number is a repeat. A new sequence number clears the
+    slots.
+
+    Devices are kept in least recently heard order: those not heard for
+    max_age_ms are evicted, as is the oldest one beyond max_devices. A
+    slot forwarded more than max_age_ms ago is forwarded again, so values
+    of a node without sequence numbers (v1) are still refreshed.
+    """
+
+    def __init__(self, max_devices=DEDUP_MAX_DEVICES, max_age_ms=DEDUP_MAX_AGE_MS):
+        self.max_devices = max_devices
+        self.max_age_ms = max_age_ms
+        self.devices = OrderedDict()    # address -> [seq, last heard ms, {slot: (bytes, forwarded ms)}]
+        self.forwarded = 0
+        self.suppressed = 0
+        self.evicted = 0
+
+    def check(self, address, data, now_ms):
+        """Note a frame (company ID stripped) received at now_ms
+
+        Returns:
+            bool: True if it is new and should be decoded, False if a repeat
+        """
+        devices = self.devices
+        entry = devices.get(address)
+        if entry is None:
+            entry = devices[address] = [None, now_ms, {}]
+            self._evict(now_ms)
+        else:
+            devices.move_to_end(address)
+            entry[1] = now_ms
+
+        version = data[0] if data else None
+        seq = data[1] if version in (2, 3) and len(data) > 1 else None
+        slot = 0x30 | data[2] >> 4 if version == 3 and len(data) > 2 else version
+        if seq is not None and seq != entry[0]:
+            entry[0] = seq
+            entry[2].clear()
+        last = entry[2].get(slot)
+        if last is not None and last[0] == data and now_ms - last[1] < self.max_age_ms:
+            self.suppressed += 1
+            return False
+        entry[2][slot] = (bytes(data), now_ms)
+        self.forwarded += 1
+        return True
+
+    def _evict(self, now_ms):
+        devices = self.devices
+        while devices:
+            address, entry = next(iter(devices.items()))
+            if len(devices) <= self.max_devices and now_ms - entry[1] < self.max_age_ms:
+                break
+            del devices[address]
+            self.evicted += 1
+
+    def get_stats(self):
+        return {
+            'devices': len(self.devices),
+            'forwarded': self.forwarded,
+            'suppressed': self.suppressed,
+            'evicted': self.evicted,
+        }
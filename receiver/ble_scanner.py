@@ -0,0 +1,383 @@
+"""
+BLE Advertisement Collector
+===========================
+Long-running asyncio collector for a fleet of ESP32 SignalK nodes in
+advertisement mode. Every advertisement carrying manufacturer data for
+company 0xFFFF is decoded the way ESP32SignalK_adv.js decodes it (through
+the reference decoder, adv_decode.py): repeats of a frame already seen
+are dropped before decoding, v3 frames are assembled into complete
+updates and history frames backfill the updates that were missed.
+Per-device state lives in small __slots__ records, so hundreds of nodes
+can be tracked.
+
+Advertisements come from a pluggable source:
+  BleakSource      - the radio, through a bleak detection callback
+  SyntheticSource  - generated nodes (no radio), in real or virtual time
+  ReplaySource     - a recording made with --record
+
+Each complete or backfilled update is handed to on_update(device, values,
+timestamp_ms); values are in the decoder's units (degC, %, Pa, V, %).
+
+Requirements (radio only):
+    pip install bleak
+
+Usage:
+    python receiver/ble_scanner.py                       # Scan until Ctrl-C
+    python receiver/ble_scanner.py --record scan.jsonl   # ... and record
+    python receiver/ble_scanner.py --replay scan.jsonl   # Replay a recording
+    python receiver/ble_scanner.py --synthetic 200       # 200 generated nodes
+    python receiver/ble_scanner.py --inspect ADDRESS     # GATT mode: list services
+"""
+
+import argparse
+import asyncio
+import heapq
+import json
+import random
+import struct
+import time
+from collections import OrderedDict
+
+from adv_decode import (COMPANY_ID, FIELDS, HISTORY_VERSION, decode, DedupCache, SnapshotAssembler,
+                        HistoryBackfill)
+
+REPORT_INTERVAL_S = 10              # Device table period (0 = only at the end)
+MAX_DEVICES = 1024                  # Least recently heard devices evicted beyond this
+DEVICE_MAX_AGE_MS = 600000          # Devices not heard for this long are evicted
+
+
+def now_ms():
+    return int(time.monotonic() * 1000)
+
+
+class Device:
+    """State kept per advertising node"""
+    __slots__ = ('address', 'name', 'rssi', 'first_ms', 'last_ms', 'packets', 'invalid',
+                 'updates', 'backfilled', 'assembler', 'backfill')
+
+    def __init__(self, address, now, history=True):
+        self.address = address
+        self.name = None
+        self.rssi = None
+        self.first_ms = now
+        self.last_ms = now
+        self.packets = 0            # Advertisements received
+        self.invalid = 0            # ... that did not decode
+        self.updates = 0            # Complete updates
+        self.backfilled = 0         # Updates recovered from history frames
+        self.assembler = SnapshotAssembler()
+        self.backfill = HistoryBackfill() if history else None
+
+    @property
+    def values(self):
+        """Latest known value of every channel"""
+        return self.assembler.current()
+
+
+class Collector:
+    """Decodes advertisements into per-device state and updates"""
+
+    def __init__(self, on_update=None, history=True, record=None, dedup=True,
+                 max_devices=MAX_DEVICES, max_age_ms=DEVICE_MAX_AGE_MS):
+        """
+        Args:
+            on_update: Called with (device, values, timestamp_ms) per update
+            history: Recover missed updates from history frames
+            record: Open text file to append every advertisement to
+            dedup: Drop repeated frames before decoding
+            max_devices: Devices kept; the least recently heard go beyond this
+            max_age_ms: Devices not heard for this long are dropped
+        """
+        self.devices = OrderedDict()    # address -> Device, least recently heard first
+        self.on_update = on_update
+        self.history = history
+        self.record = record
+        self.dedup = DedupCache() if dedup else None
+        self.packets = 0
+        self.invalid = 0
+        self.updates = 0
+        self.backfilled = 0
+        self.max_devices = max_devices
+        self.max_age_ms = max_age_ms
+        self.evicted = 0
+
+    def handle(self, address, name, rssi, data, now):
+        """Take one advertisement's manufacturer data (company ID stripped)"""
+        self.packets += 1
+        if self.record:
+            self.record.write(json.dumps({'t': now, 'address': address, 'name': name,
+                                          'rssi': rssi, 'data': data.hex()}) + '\n')
+        device = self.devices.get(address)
+        if device is None:
+            device = self.devices[address] = Device(address, now, self.history)
+            self._evict(now)
+        else:
+            self.devices.move_to_end(address)
+        device.packets += 1
+        device.last_ms = now
+        device.rssi = rssi
+        if name:
+            device.name = name
+        if self.dedup is not None and not self.dedup.check(address, data, now):
+            return
+
+        decoded = decode(data)
+        if decoded is None:
+            device.invalid += 1
+            self.invalid += 1
+            return
+
+        # Note the sequence number (live) or recover missed updates (history),
+        # then assemble; as ESP32SignalK.decoded() and propertiesChanged() do
+        if device.backfill is not None:
+            for timestamp, values in device.backfill.add(decoded, now):
+                device.backfilled += 1
+                self.backfilled += 1
+                if self.on_update:
+                    self.on_update(device, values, timestamp)
+        if decoded['version'] == HISTORY_VERSION:
+            return
+        if device.assembler.add(decoded):
+            device.updates += 1
+            self.updates += 1
+            if self.on_update:
+                self.on_update(device, device.values, now)
+
+    def _evict(self, now):
+        """Drop devices beyond max_devices or not heard for max_age_ms, oldest first"""
+        devices = self.devices
+        while devices:
+            address, device = next(iter(devices.items()))
+            if len(devices) <= self.max_devices and now - device.last_ms < self.max_age_ms:
+                break
+            del devices[address]
+            if self.dedup is not None:
+                self.dedup.devices.pop(address, None)
+            self.evicted += 1
+
+    async def run(self, source, report_s=REPORT_INTERVAL_S):
+        """Collect from a source until it ends or the task is cancelled"""
+        reporter = asyncio.create_task(self._report_loop(report_s)) if report_s else None
+        try:
+            await source.run(self.handle)
+        finally:
+            if reporter:
+                reporter.cancel()
+
+    async def _report_loop(self, report_s):
+        while True:
+            await asyncio.sleep(report_s)
+            self.report()
+
+    def report(self, limit=20):
+        """Print the totals and the most recently heard devices"""
+        print("{} devices ({} evicted), {} packets ({} repeats dropped, {} invalid), {} updates, "
+              "{} backfilled".format(len(self.devices), self.evicted, self.packets,
+                                     self.dedup.suppressed if self.dedup else 0, self.invalid,
+                                     self.updates, self.backfilled))
+        devices = sorted(self.devices.values(), key=lambda d: d.last_ms, reverse=True)
+        for device in devices[:limit]:
+            values = device.values
+            print("  {:<17} {:<10} {:>4} dBm {:>7} pkts {:>6} upd  {}".format(
+                device.address, (device.name or '?')[:10], device.rssi if device.rssi is not None else '?',
+                device.packets, device.updates,
+                ' '.join("{}={}".format(name[:4], values[name]) for name in FIELDS
+                         if values[name] is not None)))
+        if len(devices) > limit:
+            print("  ... {} more".format(len(devices) - limit))
+
+
+class BleakSource:
+    """Advertisements from the radio, through a bleak detection callback"""
+
+    def __init__(self, adapter=None):
+        self.adapter = adapter
+
+    async def run(self, callback):
+        from bleak import BleakScanner
+
+        def detected(device, adv):
+            data = adv.manufacturer_data.get(COMPANY_ID)
+            if data is not None:
+                callback(device.address, adv.local_name or device.name, adv.rssi, bytes(data), now_ms())
+
+        kwargs = {'adapter': self.adapter} if self.adapter else {}
+        async with BleakScanner(detection_callback=detected, **kwargs):
+            await asyncio.Event().wait()
+
+
+class SyntheticNode:
+    """A generated node: one single-frame v3 update every update_ms,
+    re-advertised every interval_ms (as the firmware does between updates)"""
+    __slots__ = ('address', 'name', 'rng', 'seq', 'values', 'payload', 'next_update_ms')
+
+    def __init__(self, index, rng, start_ms):
+        self.address = 'EE:00:00:{:02X}:{:02X}:{:02X}'.format(index >> 16 & 0xFF, index >> 8 & 0xFF, index & 0xFF)
+        self.name = 'ESP32-SK'
+        self.rng = rng
+        self.seq = rng.randrange(256)
+        # Fixed-point as on the node: 0.01 degC, 0.01 %, 0.1 Pa, mV, %
+        self.values = [rng.randint(1500, 2500), rng.randint(4000, 6000),
+                       rng.randint(1000000, 1020000), rng.randint(12000, 13000), rng.randint(50, 100)]
+        self.payload = None
+        self.next_update_ms = start_ms
+        self.update()
+
+    def update(self):
+        """Drift the readings and encode the next v3 frame"""
+        rng, v = self.rng, self.values
+        v[0] += rng.randint(-3, 3)
+        v[1] += rng.randint(-10, 10)
+        v[2] += rng.randint(-20, 20)
+        v[3] += rng.randint(-5, 5)
+        self.seq = (self.seq + 1) & 0xFF
+        self.payload = struct.pack('<BBB3BhHHBHB', 3, self.seq, 0x01, 0x1F, 0, 0, v[0], v[1],
+                                   v[2] & 0xFFFF, v[2] >> 16, v[3], v[4])
+
+    def expected(self):
+        """The values a receiver should hold, in the decoder's units"""
+        v = self.values
+        return {'temperature': v[0] / 100.0, 'humidity': v[1] / 100.0, 'pressure': v[2] / 10.0,
+                'voltage': v[3] / 1000.0, 'battery': v[4]}
+
+
+class SyntheticSource:
+    """Advertisements from generated nodes
+
+    Every node advertises every interval_ms (random phase) and changes its
+    payload every update_ms; loss drops that fraction of advertisements.
+    In real time the source paces itself with asyncio.sleep; otherwise the
+    timestamps are virtual and advertisements are delivered as fast as the
+    collector takes them (yielding to the loop every batch).
+    """
+
+    def __init__(self, nodes, interval_ms=100, update_ms=1000, loss=0.0, duration_s=None,
+                 realtime=True, seed=1):
+        self.rng = random.Random(seed)
+        self.interval_ms = interval_ms
+        self.update_ms = update_ms
+        self.loss = loss
+        self.duration_s = duration_s
+        self.realtime = realtime
+        self.start_ms = now_ms() if realtime else 0
+        self.nodes = [SyntheticNode(i, random.Random(seed * 100003 + i), self.start_ms)
+                      for i in range(nodes)]
+        self.sent = 0
+
+    async def run(self, callback, batch=256):
+        rng = self.rng
+        events = [(self.start_ms + rng.randrange(self.interval_ms), i) for i in range(len(self.nodes))]
+        heapq.heapify(events)
+        end_ms = self.start_ms + self.duration_s * 1000 if self.duration_s else None
+        count = 0
+        while events:
+            t, i = events[0]
+            if end_ms is not None and t >= end_ms:
+                break
+            if self.realtime:
+                wait = t - now_ms()
+                if wait > 0:
+                    await asyncio.sleep(wait / 1000)
+            else:
+                count += 1
+                if count % batch == 0:
+                    await asyncio.sleep(0)
+            heapq.heapreplace(events, (t + self.interval_ms, i))
+            node = self.nodes[i]
+            if t >= node.next_update_ms:
+                node.update()
+                node.next_update_ms += self.update_ms
+            if self.loss and rng.random() < self.loss:
+                continue
+            self.sent += 1
+            callback(node.address, node.name, -60 - (i % 30), node.payload, t)
+
+
+class ReplaySource:
+    """Advertisements from a recording (JSON lines from --record)"""
+
+    def __init__(self, path, speed=0.0):
+        """
+        Args:
+            path: Recording file
+            speed: 1.0 = original pace, 0 = as fast as possible
+        """
+        self.path = path
+        self.speed = speed
+
+    async def run(self, callback):
+        start = now_ms()
+        first = None
+        with open(self.path) as f:
+            for line in f:
+                r = json.loads(line)
+                if first is None:
+                    first = r['t']
+                if self.speed:
+                    wait = (r['t'] - first) / self.speed - (now_ms() - start)
+                    if wait > 0:
+                        await asyncio.sleep(wait / 1000)
+                callback(r['address'], r['name'], r['rssi'], bytes.fromhex(r['data']), r['t'])
+
+
+async def inspect_device(address):
+    """Connect to a GATT-mode node and list its services and characteristics"""
+    from bleak import BleakClient
+
+    print(f"Connecting to {address}...")
+    async with BleakClient(address) as client:
+        print(f"Connected: {client.is_connected}")
+        for service in client.services:
+            print(f"  Service: {service.uuid} ({service.description})")
+            for char in service.characteristics:
+                print(f"    Characteristic: {char.uuid} {char.properties}")
+                if "read" in char.properties:
+                    try:
+                        value = await client.read_gatt_char(char.uuid)
+                        print(f"      Value: {value.hex()}")
+                    except Exception as e:
+                        print(f"      Could not read: {e}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--synthetic', type=int, metavar='NODES', help='generated nodes instead of the radio')
+    parser.add_argument('--replay', metavar='FILE', help='replay a recording instead of the radio')
+    parser.add_argument('--record', metavar='FILE', help='append every advertisement to FILE')
+    parser.add_argument('--adapter', help='bluetooth adapter (e.g. hci1)')
+    parser.add_argument('--duration', type=float, help='stop after this many seconds')
+    parser.add_argument('--report', type=float, default=REPORT_INTERVAL_S, help='device table period (s)')
+    parser.add_argument('--no-history', action='store_true', help='ignore history frames')
+    parser.add_argument('--no-dedup', action='store_true', help='decode repeated frames too')
+    parser.add_argument('--max-devices', type=int, default=MAX_DEVICES, help='devices kept (least recently heard dropped)')
+    parser.add_argument('--inspect', metavar='ADDRESS', help='list the GATT services of a node')
+    args = parser.parse_args()
+
+    if args.inspect:
+        await inspect_device(args.inspect)
+        return
+
+    if args.synthetic:
+        source = SyntheticSource(args.synthetic)
+    elif args.replay:
+        source = ReplaySource(args.replay, speed=1.0)
+    else:
+        source = BleakSource(args.adapter)
+    record = open(args.record, 'a') if args.record else None
+    collector = Collector(history=not args.no_history, record=record, dedup=not args.no_dedup,
+                          max_devices=args.max_devices)
+    try:
+        await asyncio.wait_for(collector.run(source, args.report), args.duration)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        if record:
+            record.close()
+        collector.report()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
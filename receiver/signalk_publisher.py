@@ -0,0 +1,265 @@
+"""
+SignalK Delta Publisher
+=======================
+Publishing stage behind the advertisement collector (ble_scanner.py):
+turns decoded updates into SignalK deltas on one persistent WebSocket to
+the server's stream endpoint, without flooding it.
+
+- Change suppression: a live value is queued only when it differs from
+  the last one queued for that device and path (or is older than
+  REFRESH_MS, so the server never sees it go stale).
+- Coalescing: pending live values are keyed by (device, path); a newer
+  value replaces a queued one in place. Backfilled values (history
+  frames) carry their own timestamp and are queued separately.
+- Batching: every BATCH_INTERVAL_MS (sooner with MAX_BATCH_VALUES
+  pending) everything queued goes out as one delta, one `updates` entry
+  per device and timestamp, each with the device's own $source.
+- Backpressure: the queue is bounded (MAX_PENDING values); when full,
+  the oldest entry is dropped and counted.
+- Connection: one WebSocket is reused for every batch; if it fails, the
+  publisher reconnects with exponential backoff (with jitter, capped at
+  config.RECONNECT_DELAY_MS) and the batch waits in the queue.
+
+Paths come from config.SIGNALK_PATHS and values are converted as the
+plugin does (TO_SIGNALK in adv_decode.py and ESP32SignalK_adv.js).
+
+Requirements:
+    pip install websockets bleak        # bleak for the radio only
+
+Usage:
+    python receiver/signalk_publisher.py [--url URL] [--token TOKEN] [--synthetic NODES]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import OrderedDict
+
+from websockets.asyncio.client import connect
+from websockets.exceptions import WebSocketException
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'esp32'))
+
+import config
+from adv_decode import TO_SIGNALK
+from ble_scanner import now_ms
+
+DEFAULT_URL = 'ws://localhost:3000/signalk/v1/stream?subscribe=none'
+BATCH_INTERVAL_MS = 250             # Longest a queued value waits
+MAX_BATCH_VALUES = 500              # Send early once this many values are queued
+MAX_PENDING = 5000                  # Queue bound (oldest dropped beyond it)
+REFRESH_MS = 60000                  # Re-send unchanged values this often
+BACKOFF_START_MS = 100              # First reconnect delay (doubles up to config.RECONNECT_DELAY_MS)
+CONNECT_TIMEOUT_S = 5               # WebSocket open (TCP + upgrade) timeout
+
+
+class DeltaPublisher:
+    """Change-suppressed, coalesced, batched SignalK delta publisher"""
+
+    def __init__(self, url=DEFAULT_URL, token=None, paths=None, batch_ms=BATCH_INTERVAL_MS,
+                 max_batch=MAX_BATCH_VALUES, max_pending=MAX_PENDING, refresh_ms=REFRESH_MS):
+        self.url = url
+        self.token = token
+        self.paths = paths or config.SIGNALK_PATHS
+        self.batch_ms = batch_ms
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.refresh_ms = refresh_ms
+        self.pending = OrderedDict()    # (source, path, backfill ts or None) -> (value, ts, queued_ms)
+        self.last = {}                  # (source, path) -> (value, queued_ms)
+        self.waiter = None              # Future the sender sleeps on between batches
+        self.ws = None
+        self.inflight = 0               # Values taken but not yet sent
+
+        # Statistics
+        self.submitted = 0              # Values offered
+        self.suppressed = 0             # ... unchanged, not queued
+        self.coalesced = 0              # ... replaced a queued value
+        self.dropped = 0                # Queue full: oldest dropped
+        self.deltas = 0                 # Messages sent
+        self.values_sent = 0
+        self.bytes_sent = 0
+        self.connects = 0
+        self.failures = 0
+
+    def submit(self, device, values, timestamp_ms):
+        """Collector on_update callback: queue the changed values of one update"""
+        now = now_ms()
+        source = 'esp32-sk.' + device.address.replace(':', '')
+        # Live updates carry the receipt time of the advertisement, backfilled
+        # ones the (earlier) time they were measured
+        live = timestamp_ms >= device.last_ms
+        wall_ms = time.time() * 1000 - (device.last_ms - timestamp_ms)
+        for name, path in self.paths.items():
+            value = values.get(name)
+            if value is None or name not in TO_SIGNALK:
+                continue
+            value = TO_SIGNALK[name](value)
+            self.submitted += 1
+            if live:
+                last = self.last.get((source, path))
+                if last is not None and last[0] == value and now - last[1] < self.refresh_ms:
+                    self.suppressed += 1
+                    continue
+                self.last[(source, path)] = (value, now)
+                key = (source, path, None)
+            else:
+                key = (source, path, int(wall_ms))
+            if key in self.pending:
+                self.coalesced += 1
+                self.pending[key] = (value, wall_ms, self.pending[key][2])
+                continue
+            if len(self.pending) >= self.max_pending:
+                self.pending.popitem(last=False)
+                self.dropped += 1
+            self.pending[key] = (value, wall_ms, now)
+        if len(self.pending) >= self.max_batch:
+            self.wake()
+
+    def wake(self):
+        """End the sender's wait for the batch interval"""
+        if self.waiter is not None and not self.waiter.done():
+            self.waiter.set_result(None)
+
+    def take_batch(self):
+        """Remove up to max_batch queued values, oldest first"""
+        batch = []
+        pending = self.pending
+        while pending and len(batch) < self.max_batch:
+            batch.append(pending.popitem(last=False))
+        return batch
+
+    def requeue(self, batch):
+        """Put back an unsent batch at the front (newer queued values win)"""
+        for key, item in reversed(batch):
+            if key not in self.pending and len(self.pending) < self.max_pending:
+                self.pending[key] = item
+                self.pending.move_to_end(key, last=False)
+
+    @staticmethod
+    def build_delta(batch):
+        """One delta: an `updates` entry per source and timestamp"""
+        groups = OrderedDict()
+        for (source, path, _), (value, wall_ms, _) in batch:
+            groups.setdefault((source, int(wall_ms)), []).append({'path': path, 'value': value})
+        updates = []
+        for (source, wall_ms), values in groups.items():
+            stamp = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(wall_ms / 1000))
+            updates.append({'$source': source, 'timestamp': '{}.{:03d}Z'.format(stamp, wall_ms % 1000),
+                            'values': values})
+        return json.dumps({'context': 'vessels.self', 'updates': updates}, separators=(',', ':'))
+
+    async def _connect(self):
+        """Connect, retrying with exponential backoff until it works"""
+        headers = {'Authorization': 'Bearer ' + self.token} if self.token else None
+        delay = BACKOFF_START_MS
+        while True:
+            try:
+                self.ws = await connect(self.url, additional_headers=headers,
+                                        open_timeout=CONNECT_TIMEOUT_S)
+                self.connects += 1
+                asyncio.ensure_future(self._drain(self.ws))
+                return
+            except (OSError, asyncio.TimeoutError, WebSocketException):
+                self.failures += 1
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0) / 1000)
+                delay = min(delay * 2, config.RECONNECT_DELAY_MS)
+
+    async def _drain(self, ws):
+        """Consume server messages (hello, deltas) until the connection ends"""
+        try:
+            async for _ in ws:
+                pass
+        except (OSError, WebSocketException):
+            pass
+        if self.ws is ws:
+            self.ws = None
+
+    async def run(self):
+        """Send batches until cancelled"""
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                self.waiter = loop.create_future()
+                timer = loop.call_later(self.batch_ms / 1000, self.wake)
+                try:
+                    await self.waiter
+                finally:
+                    timer.cancel()
+                while self.pending:
+                    if self.ws is None:
+                        await self._connect()
+                    batch = self.take_batch()
+                    message = self.build_delta(batch)
+                    self.inflight = len(batch)
+                    try:
+                        await self.ws.send(message)
+                    except (OSError, WebSocketException, AttributeError):
+                        self.failures += 1
+                        self.requeue(batch)
+                        if self.ws:
+                            await self.ws.close()
+                        self.ws = None
+                        continue
+                    finally:
+                        self.inflight = 0
+                    self.deltas += 1
+                    self.values_sent += len(batch)
+                    self.bytes_sent += len(message)
+        finally:
+            if self.ws:
+                await self.ws.close()
+
+    async def flush(self, timeout_s=5.0):
+        """Wait (up to timeout_s) until everything queued has been sent"""
+        self.wake()
+        end = now_ms() + timeout_s * 1000
+        while (self.pending or self.inflight) and now_ms() < end:
+            await asyncio.sleep(0.01)
+        return not (self.pending or self.inflight)
+
+    def get_stats(self):
+        return {
+            'submitted': self.submitted,
+            'suppressed': self.suppressed,
+            'coalesced': self.coalesced,
+            'dropped': self.dropped,
+            'pending': len(self.pending),
+            'deltas': self.deltas,
+            'values_sent': self.values_sent,
+            'bytes_sent': self.bytes_sent,
+            'connects': self.connects,
+            'failures': self.failures,
+        }
+
+
+async def main():
+    from ble_scanner import Collector, BleakSource, SyntheticSource
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--url', default=DEFAULT_URL, help='SignalK stream endpoint')
+    parser.add_argument('--token', help='SignalK access token')
+    parser.add_argument('--synthetic', type=int, metavar='NODES', help='generated nodes instead of the radio')
+    parser.add_argument('--adapter', help='bluetooth adapter (e.g. hci1)')
+    args = parser.parse_args()
+
+    publisher = DeltaPublisher(args.url, args.token)
+    collector = Collector(on_update=publisher.submit)
+    source = SyntheticSource(args.synthetic) if args.synthetic else BleakSource(args.adapter)
+    sender = asyncio.create_task(publisher.run())
+    try:
+        await collector.run(source)
+    finally:
+        sender.cancel()
+        print("[PUB] {}".format(publisher.get_stats()))
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,95 @@
+"""
+BME280 Driver Benchmark
+=======================
+Drives sensor_handler.BME280 against a simulated register map
+(simdevices.BME280Sim) and reports I2C transactions and time per
+temperature/humidity/pressure reading set. The integer compensation is
+checked against Bosch's floating-point reference formulas.
+
+Usage:
+    python tools/bench_bme280.py [readings]
+"""
+
+import sys
+import time
+
+import hostenv
+
+hostenv.quiet()
+
+from machine import I2C
+from sensor_handler import BME280
+from simdevices import BME280Sim, BME280_CALIBRATION
+
+
+def reference(adc_t, adc_p, adc_h):
+    """Bosch floating-point compensation (datasheet 8.1)"""
+    T1, T2, T3 = BME280_CALIBRATION['T']
+    P1, P2, P3, P4, P5, P6, P7, P8, P9 = BME280_CALIBRATION['P']
+    H1, H2, H3, H4, H5, H6 = BME280_CALIBRATION['H']
+
+    var1 = (adc_t / 16384.0 - T1 / 1024.0) * T2
+    var2 = ((adc_t / 131072.0 - T1 / 8192.0) * (adc_t / 131072.0 - T1 / 8192.0)) * T3
+    t_fine = var1 + var2
+    temperature = t_fine / 5120.0
+
+    var1 = t_fine / 2.0 - 64000.0
+    var2 = var1 * var1 * P6 / 32768.0 + var1 * P5 * 2.0
+    var2 = var2 / 4.0 + P4 * 65536.0
+    var1 = (P3 * var1 * var1 / 524288.0 + P2 * var1) / 524288.0
+    var1 = (1.0 + var1 / 32768.0) * P1
+    p = 1048576.0 - adc_p
+    p = (p - var2 / 4096.0) * 6250.0 / var1
+    var1 = P9 * p * p / 2147483648.0
+    var2 = p * P8 / 32768.0
+    pressure = p + (var1 + var2 + P7) / 16.0
+
+    h = t_fine - 76800.0
+    h = (adc_h - (H4 * 64.0 + H5 / 16384.0 * h)) * \
+        (H2 / 65536.0 * (1.0 + H6 / 67108864.0 * h * (1.0 + H3 / 67108864.0 * h)))
+    humidity = h * (1.0 - H1 * h / 524288.0)
+    return temperature, humidity, pressure
+
+
+def main():
+    readings = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    I2C.detach_all()
+    sim = I2C.attach(BME280Sim(0x76))
+    i2c = I2C(0)
+    sensor = BME280(i2c, 0x76, max_age_ms=0)
+    sensor._meas_ms = 0         # Don't wait for the (simulated) conversion
+    init_transactions = i2c.transactions
+
+    # Check against the float reference
+    sensor.max_age_ms = 100
+    values = (sensor.temperature, sensor.humidity, sensor.pressure)
+    expected = reference(sim.adc_t, sim.adc_p, sim.adc_h)
+    ok = (abs(values[0] - expected[0]) < 0.01 and abs(values[1] - expected[1]) < 0.1
+          and abs(values[2] - expected[2]) < 1.0)
+
+    # One conversion per reading set: all three properties share it
+    sensor.max_age_ms = 0
+    i2c.transactions = 0
+    start = time.perf_counter()
+    for _ in range(readings):
+        sensor.measure()
+        sensor.temperature_centi, sensor.humidity_q10, sensor.pressure_q8
+    elapsed = time.perf_counter() - start
+
+    print("BME280 benchmark ({} readings)".format(readings))
+    print("  init transactions:        {}".format(init_transactions))
+    print("  transactions per reading: {:.2f} (trigger + one burst read)".format(
+        i2c.transactions / readings))
+    print("  time per reading (host):  {:.2f} us".format(elapsed / readings * 1e6))
+    print("  integer: T={:.2f} C  H={:.3f} %  P={:.2f} Pa".format(*values))
+    print("  float:   T={:.2f} C  H={:.3f} %  P={:.2f} Pa".format(*expected))
+
+    if not ok:
+        print("FAIL: integer compensation disagrees with reference")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Advertisement Collector Benchmark
+=================================
+Feeds the receiver-side collector (receiver/ble_scanner.py) from synthetic
+fleets of 10 to 1000 nodes in virtual time: every node advertises every
+100 ms and updates once a second, with 10 % of advertisements lost.
+
+Reported per fleet: decoded packets per second of host time, updates
+assembled, and memory per tracked device (tracemalloc, a separate run)
+with and without the history backfill table. Every device must end up
+holding its node's latest values. A last run puts the largest fleet
+through a collector capped at half of it: it must hold no more devices
+than the cap, dropping the least recently heard.
+
+Usage:
+    python tools/bench_collector.py [seconds]
+"""
+
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+
+import hostenv
+
+sys.path.insert(0, os.path.join(hostenv.ROOT_DIR, 'receiver'))
+
+from ble_scanner import Collector, SyntheticSource
+
+FLEETS = (10, 100, 1000)
+LOSS = 0.1
+
+
+def collect(nodes, seconds, history=True, trace=False, max_devices=None):
+    """One run; returns (collector, source, host seconds, bytes per device)"""
+    source = SyntheticSource(nodes, loss=LOSS, duration_s=seconds, realtime=False)
+    if trace:
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+    collector = Collector(history=history)
+    if max_devices:
+        collector.max_devices = max_devices
+    start = time.perf_counter()
+    asyncio.run(collector.run(source, report_s=0))
+    wall_s = time.perf_counter() - start
+    per_device = 0
+    if trace:
+        per_device = (tracemalloc.get_traced_memory()[0] - base) / max(1, len(collector.devices))
+        tracemalloc.stop()
+    return collector, source, wall_s, per_device
+
+
+def up_to_date(collector, source):
+    for node in source.nodes:
+        device = collector.devices.get(node.address)
+        expected = node.expected()
+        if device is None or {name: device.values[name] for name in expected} != expected:
+            return False
+    return True
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 60
+    print("Collector: synthetic fleets, {:.0f} s virtual, 100 ms advertising, 1 s updates, {:.0%} loss".format(
+        seconds, LOSS))
+    print("  {:>5} {:>9} {:>8} {:>10} {:>8} | {:>11} {:>11}".format(
+        'nodes', 'packets', 'updates', 'pkts/s', 'us/pkt', 'B/dev hist', 'B/dev none'))
+    ok = True
+    for nodes in FLEETS:
+        collector, source, wall_s, _ = collect(nodes, seconds)
+        ok = ok and up_to_date(collector, source) and collector.invalid == 0
+        short = min(seconds, 5)
+        _, _, _, with_history = collect(nodes, short, history=True, trace=True)
+        _, _, _, without = collect(nodes, short, history=False, trace=True)
+        print("  {:>5} {:>9} {:>8} {:>10.0f} {:>8.2f} | {:>11.0f} {:>11.0f}".format(
+            nodes, collector.packets, collector.updates, collector.packets / wall_s,
+            wall_s / collector.packets * 1e6, with_history, without))
+    cap = FLEETS[-1] // 2
+    collector, _, _, _ = collect(FLEETS[-1], min(seconds, 5), max_devices=cap)
+    print("  {} nodes, {} device cap: {} held, {} evicted".format(
+        FLEETS[-1], cap, len(collector.devices), collector.evicted))
+    ok = ok and len(collector.devices) <= cap and collector.evicted > 0
+    print("every device holds its node's latest values, cap kept: {}".format('PASS' if ok else 'FAIL'))
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+Repeat Suppression Benchmark
+============================
+Synthetic fleets of 10 to 1000 nodes (virtual time, every node
+advertising every 100 ms and updating once a second, 10 % of
+advertisements lost) through the receiver pipeline with and without the
+repeat cache (DedupCache, receiver/adv_decode.py and ESP32SignalK_adv.js).
+
+Reported per fleet: advertisements, frames forwarded to decode and emit,
+repeats suppressed, and host time per advertisement without and with the
+cache (Python collector; then the JS decoder in node, if installed, on
+the same frames). The last row runs the largest fleet through a cache
+holding half of it: least recently heard devices are evicted, and as
+nodes advertise round-robin every entry goes before it is heard again,
+so an undersized cache suppresses nothing (DEDUP_MAX_DEVICES must exceed
+the fleet).
+
+With the cache, every update must still be assembled and every device
+must hold the same values as without it, and the JS cache must make the
+same call on every frame as the Python one.
+
+Usage:
+    python tools/bench_dedup.py [seconds]
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import hostenv
+
+sys.path.insert(0, os.path.join(hostenv.ROOT_DIR, 'receiver'))
+
+from adv_decode import DedupCache
+from ble_scanner import Collector, SyntheticSource
+
+FLEETS = (10, 100, 1000)
+LOSS = 0.1
+JS_SECONDS = 20                     # Frames handed to node per fleet (virtual seconds)
+
+
+def collect(nodes, seconds, dedup, max_devices=None):
+    """One run; returns (collector, host seconds)"""
+    source = SyntheticSource(nodes, loss=LOSS, duration_s=seconds, realtime=False)
+    collector = Collector(dedup=dedup)
+    if max_devices:
+        collector.dedup = DedupCache(max_devices=max_devices)
+    start = time.perf_counter()
+    asyncio.run(collector.run(source, report_s=0))
+    return collector, time.perf_counter() - start
+
+
+def generate(nodes, seconds):
+    """The same advertisements (same seed) as (t, address, data)"""
+    frames = []
+    source = SyntheticSource(nodes, loss=LOSS, duration_s=seconds, realtime=False)
+    asyncio.run(source.run(lambda address, name, rssi, data, now: frames.append((now, address, data))))
+    return frames
+
+
+def same_state(a, b):
+    if a.updates != b.updates or a.devices.keys() != b.devices.keys():
+        return False
+    return all(a.devices[address].values == b.devices[address].values for address in a.devices)
+
+
+def js_dedup(node, frames):
+    """Run the frames through the JS cache"""
+    script = os.path.join(hostenv.TOOLS_DIR, 'js_decode.js')
+    stdin = ''.join('{} {} {}\n'.format(t, address, data.hex()) for t, address, data in frames)
+    result = subprocess.run([node, script, '--dedup'], input=stdin, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def python_flags(frames):
+    cache = DedupCache()
+    return ''.join('1' if cache.check(address, data, t) else '0' for t, address, data in frames)
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 60
+    node = shutil.which('node')
+    print("Repeat suppression: synthetic fleets, {:.0f} s virtual, 100 ms advertising, 1 s updates, "
+          "{:.0%} loss".format(seconds, LOSS))
+    print("  {:>5} {:>6} {:>8} {:>9} {:>6} {:>7} | py us/adv {:>5} {:>5} | js us/adv {:>5} {:>5}".format(
+        'nodes', 'cache', 'adverts', 'forwarded', 'suppr', 'evicted', 'all', 'dedup', 'all', 'dedup'))
+    ok = True
+    runs = [(nodes, None) for nodes in FLEETS] + [(FLEETS[-1], FLEETS[-1] // 2)]
+    for nodes, max_devices in runs:
+        plain, plain_s = collect(nodes, seconds, dedup=False)
+        deduped, dedup_s = collect(nodes, seconds, dedup=True, max_devices=max_devices)
+        stats = deduped.dedup.get_stats()
+        ok = ok and same_state(plain, deduped) and stats['devices'] <= deduped.dedup.max_devices
+        js = None
+        if node and max_devices is None:
+            frames = generate(nodes, min(seconds, JS_SECONDS))
+            js = js_dedup(node, frames)
+        if js:
+            ok = ok and js['flags'] == python_flags(frames)
+            js_cols = "{:>5.2f} {:>5.2f}".format(js['decode_all_ms'] * 1000 / len(frames),
+                                                 js['dedup_ms'] * 1000 / len(frames))
+        else:
+            js_cols = "{:>5} {:>5}".format('-', '-')
+        print("  {:>5} {:>6} {:>8} {:>9} {:>5.1f}% {:>7} |           {:>5.2f} {:>5.2f} |           {}".format(
+            nodes, max_devices or deduped.dedup.max_devices, deduped.packets, stats['forwarded'],
+            100 * stats['suppressed'] / max(1, deduped.packets), stats['evicted'],
+            plain_s / plain.packets * 1e6, dedup_s / deduped.packets * 1e6, js_cols))
+    if not node:
+        print("  (node not found: JS cache not checked)")
+    print("same updates and values with the cache, JS and Python agree: {}".format('PASS' if ok else 'FAIL'))
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""
+DS18B20 Pipeline Benchmark
+==========================
+Runs sensor_handler.DS18B20 against simulated probes on the fake one-wire
+bus and compares the pipelined driver (broadcast Convert T, collect on a
+later tick) with reading the probes one at a time and sleeping for each
+conversion.
+
+Bus time is estimated from standard-speed one-wire timing: ~960 us per
+reset and ~560 us per byte.
+
+Usage:
+    python tools/bench_ds18b20.py [probes] [resolution_bits] [reads_per_tick]
+"""
+
+import sys
+import time
+
+import hostenv
+
+hostenv.quiet()
+
+from machine import Pin
+from onewire import OneWire
+from sensor_handler import DS18B20
+from simdevices import DS18B20Sim
+
+_RESET_US = 960
+_BYTE_US = 560
+
+
+def bus_us(ow):
+    return ow.resets * _RESET_US + (ow.bytes_written + ow.bytes_read) * _BYTE_US
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    bits = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+    per_tick = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+
+    OneWire.detach_all()
+    sims = [OneWire.attach(DS18B20Sim(i + 1, 20.0 + i * 0.5)) for i in range(count)]
+    probes = DS18B20(Pin(4), resolution=bits, reads_per_tick=per_tick)
+    ok = len(probes.roms) == count
+
+    # Pipelined: start once, then every tick collects + restarts
+    conv_ms = probes.conversion_ms
+    probes.conversion_ms = 0        # Simulated probes convert instantly
+    probes.tick()
+    ow = probes.ow
+    ow.resets = ow.bytes_written = ow.bytes_read = 0
+    ticks = 0
+    start = time.perf_counter()
+    while probes.conversions < 100:
+        probes.tick()
+        ticks += 1
+    host_us = (time.perf_counter() - start) / ticks * 1e6
+    pipelined_bus_us = bus_us(ow) / ticks
+    ticks_per_sweep = ticks / probes.conversions
+
+    # 0.01 degC, from the 1/16 degC register value
+    expected = [(round(s.temperature * 16) * 100 + 8) >> 4 for s in sims]
+    ok = ok and probes.temps == expected
+
+    # Sequential blocking: per probe select + convert, wait, select + read
+    seq_bus_us = count * (2 * _RESET_US + (1 + 8 + 1 + 1 + 8 + 1 + 9) * _BYTE_US)
+    seq_blocking_ms = count * conv_ms + seq_bus_us / 1000
+
+    print("DS18B20 benchmark ({} probes, {}-bit)".format(count, bits))
+    print("  pipelined:  blocks {:.1f} ms per tick (bus), {} ms conversion + {:.0f} ticks to collect".format(
+        pipelined_bus_us / 1000, conv_ms, ticks_per_sweep))
+    print("              host CPU per tick: {:.0f} us".format(host_us))
+    print("  sequential: blocks {:.1f} ms per sweep".format(seq_blocking_ms))
+    print("  temperatures: {}".format(probes.temps))
+
+    if not ok:
+        print("FAIL: probe temperatures not read back correctly")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
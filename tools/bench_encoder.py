@@ -0,0 +1,100 @@
+"""
+Advertisement Encoder Allocation Benchmark
+==========================================
+Runs BLEAdvertiser.advertise_sensor_data (v2) and the multi-frame
+FrameAdvertiser (v3: diagnostics, encode and one rotation, history frames
+included) on CPython against the stub ``bluetooth`` module and reports
+net allocations per call (tracemalloc) plus the time per call.
+
+Allocation counts are the minimum over RUNS runs: CPython's free lists
+can keep a block alive across one measurement, but a per-call
+allocation shows up in every run. The encoder passes below
+MAX_BLOCKS_PER_CALL.
+
+Usage:
+    python tools/bench_encoder.py [calls]
+"""
+
+import sys
+import time
+import tracemalloc
+
+import hostenv
+
+hostenv.quiet()
+
+import config
+from ble_advertiser import BLEAdvertiser, FrameAdvertiser
+
+READINGS = ((21.37, 55.5, 101325.0), (-4.02, 80.25, 99870.5), (23.0, None, None))
+PROBES = ([4.5, 12.25, 60.0, -2.0, 18.5, 19.0, 20.5, 21.0], [4.75, None, 61.0, -1.5], None)
+RUNS = 3
+MAX_BLOCKS_PER_CALL = 0.001
+
+
+def call_v2(adv, i):
+    t, h, p = READINGS[i % 3]
+    adv.advertise_sensor_data(t, h, p)
+
+
+def call_v3(adv, i):
+    t, h, p = READINGS[i % 3]
+    adv.set_diagnostics(3600 + i, 98304 - i, 2, 7 + (i & 7))
+    adv.advertise_sensor_data(t, h, p, 12.6, 90, PROBES[i % 3])
+    adv.rotate()
+
+
+def net_allocations(adv, call, calls):
+    """One traced run; returns (net blocks, net bytes)"""
+    # Warm up under tracing so one-time allocations (interned formats,
+    # counters leaving the small-int cache) appear in both snapshots
+    tracemalloc.start()
+    for i in range(1000):
+        call(adv, i)
+
+    before = tracemalloc.take_snapshot()
+    for i in range(calls):
+        call(adv, i)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    # Only count allocations made by the firmware code itself
+    filters = [tracemalloc.Filter(True, '*ble_advertiser.py')]
+    diff = after.filter_traces(filters).compare_to(before.filter_traces(filters), 'lineno')
+    return sum(stat.count_diff for stat in diff), sum(stat.size_diff for stat in diff)
+
+
+def bench(label, adv, call, calls):
+    """Measure net allocations and time per call; returns blocks per call"""
+    net_blocks, net_bytes = min(net_allocations(adv, call, calls) for _ in range(RUNS))
+
+    start = time.perf_counter()
+    for i in range(calls):
+        call(adv, i)
+    elapsed = time.perf_counter() - start
+
+    print("Encoder benchmark: {} ({} calls)".format(label, calls))
+    print("  net allocations: {} blocks, {} bytes ({:.4f} blocks/call, best of {})".format(
+        net_blocks, net_bytes, net_blocks / calls, RUNS))
+    print("  time per call:   {:.2f} us".format(elapsed / calls * 1e6))
+    print("  payload:         {}".format(adv.ble.advertising[1].hex()))
+    return net_blocks / calls
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+    config.ADV_FORMAT_VERSION = 2
+    per_call = bench('v2', BLEAdvertiser(), call_v2, calls)
+
+    config.ADV_FORMAT_VERSION = 3
+    per_call = max(per_call, bench('v3 diagnostics + encode + rotate', FrameAdvertiser(), call_v3, calls))
+
+    if per_call >= MAX_BLOCKS_PER_CALL:
+        print("FAIL: encoder allocates per call")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
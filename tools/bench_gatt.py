@@ -0,0 +1,147 @@
+"""
+GATT Notification Benchmark
+===========================
+Runs ble_server.BLEServer on the stub bluetooth module with two centrals
+connected: one that accepts an MTU of up to 247 and one that stays at the
+BLE default of 23. The node requests config.BLE_MTU (64), so the
+negotiated MTUs are 64 and 23. Readings drift (temperature most updates, humidity often,
+pressure now and then, six DS18B20 probes), and the server is updated
+every `period` ms of virtual time.
+
+Reported per notification mode: notifications and ATT bytes per update
+for each central, and updates held back by the rate limit. The packed
+value (25 bytes here) fits one notification at MTU 64 and is split into
+two frames at 23. Every central must end up with the latest
+readings: packed notifications are decoded with the reference decoder
+(receiver/adv_decode.py, SnapshotAssembler), per-characteristic ones from
+the ESS formats.
+
+Usage:
+    python tools/bench_gatt.py [updates] [period_ms]
+"""
+
+import os
+import random
+import struct
+import sys
+import time
+
+import hostenv
+
+hostenv.quiet()
+sys.path.insert(0, os.path.join(hostenv.ROOT_DIR, 'receiver'))
+
+import config
+import ble_server
+import virtualtime
+from sensor_handler import Readings
+from adv_decode import decode, SnapshotAssembler
+
+PROBES = 6
+CENTRALS = ((1, 247), (2, 23))      # (connection handle, largest MTU the central accepts)
+MODES = (
+    # label, packed, min interval (ms)
+    ('per characteristic', False, 0),   # ESS only: no probes
+    ('packed', True, 0),
+    ('packed, 1 s limit', True, 1000),
+)
+
+
+def drift(readings, rng):
+    """One sensor period of change, in fixed-point units"""
+    readings.temperature += rng.choice((-2, -1, 1, 2))
+    if rng.random() < 0.5:
+        readings.humidity += rng.choice((-10, 10))
+    if rng.random() < 0.1:
+        readings.pressure += rng.choice((-10, 10))
+    for i in range(len(readings.probes)):
+        if rng.random() < 0.3:
+            readings.probes[i] += rng.choice((-6, 6))
+
+
+def received(server, handle):
+    """What a central knows from its notifications: channel -> fixed-point value"""
+    ble = server.ble
+    values = {}
+    assembler = SnapshotAssembler()
+    ess = {h: (ch, fmt) for ch, h, _, fmt in server._ess}
+    for conn, value_handle, data in ble.notifications:
+        if conn != handle:
+            continue
+        if value_handle == server._packed_handle:
+            assembler.add(decode(data))
+        else:
+            ch, fmt = ess[value_handle]
+            values[ch] = struct.unpack(fmt, data)[0]
+    current = assembler.current()
+    names = ('temperature', 'humidity', 'pressure')
+    scales = (100, 100, 10)
+    for ch, (name, scale) in enumerate(zip(names, scales)):
+        if current[name] is not None:
+            values[ch] = round(current[name] * scale)
+    for i in range(PROBES):
+        if current['probe%d' % i] is not None:
+            values[5 + i] = round(current['probe%d' % i] * 100)
+    return values
+
+
+def run(packed, min_interval_ms, updates, period_ms):
+    clock = virtualtime.VirtualClock(cpu_scale=0)
+    time.ticks_ms = clock.ticks_ms
+    config.GATT_NOTIFY_PACKED = packed
+    config.GATT_NOTIFY_MIN_INTERVAL_MS = min_interval_ms
+    server = ble_server.BLEServer()
+    server.start_advertising()
+    for handle, mtu in CENTRALS:
+        server.ble.connect(handle, mtu)
+
+    rng = random.Random(5)
+    readings = Readings()
+    readings.temperature, readings.humidity, readings.pressure = 2150, 5500, 1013250
+    readings.probes = [1800 + 150 * i for i in range(PROBES)]
+    for _ in range(updates):
+        drift(readings, rng)
+        server.update(readings)
+        clock.sleep_ms(period_ms)
+    # Quiet period: deferred changes go out
+    clock.sleep_ms(min_interval_ms)
+    server.update(readings)
+
+    expected = {0: readings.temperature, 1: readings.humidity, 2: readings.pressure}
+    if packed:
+        expected.update({5 + i: value for i, value in enumerate(readings.probes)})
+    per_central = {}
+    ok = True
+    for handle, _ in CENTRALS:
+        sent = [n for n in server.ble.notifications if n[0] == handle]
+        nbytes = sum(3 + len(n[2]) for n in sent)
+        per_central[handle] = (len(sent) / updates, nbytes / updates,
+                               server.get_stats()['connections'][handle]['mtu'])
+        ok = ok and received(server, handle) == expected
+    return per_central, server.get_stats(), ok
+
+
+def main():
+    updates = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+    period_ms = int(sys.argv[2]) if len(sys.argv) > 2 else 250
+    print("GATT notifications: {} updates every {} ms, node requests MTU {}, two centrals "
+          "accepting up to {} and {}".format(updates, period_ms, config.BLE_MTU, CENTRALS[0][1], CENTRALS[1][1]))
+    print("  {:<19} | {:>9} {:>9} | {:>9} {:>9} | {:>8}".format(
+        'mode', 'notif/upd', 'bytes/upd', 'notif/upd', 'bytes/upd', 'deferred'))
+    all_ok = True
+    for label, packed, min_interval_ms in MODES:
+        per_central, stats, ok = run(packed, min_interval_ms, updates, period_ms)
+        cells = []
+        for handle, _ in CENTRALS:
+            notifs, nbytes, mtu = per_central[handle]
+            cells.append("{:>9.2f} {:>9.1f}".format(notifs, nbytes))
+        print("  {:<19} | {} | {:>8}  {}".format(label, ' | '.join(cells), stats['deferred'],
+                                                 'ok' if ok else 'MISMATCH'))
+        all_ok = all_ok and ok
+    print("  (negotiated MTU: {} and {})".format(*(per_central[h][2] for h, _ in CENTRALS)))
+    print("every central holds the latest readings: {}".format('PASS' if all_ok else 'FAIL'))
+    return 0 if all_ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
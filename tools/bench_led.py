@@ -0,0 +1,169 @@
+"""
+Status LED Latency Check
+========================
+Runs the advertisement-mode runtime (main_adv.AdvertiserApp) on CPython
+with mock sensors while the status LED plays, and checks that the LED
+costs the loop nothing: the worst task wake-up latency (sensor, advertise
+and rotate tickers, plus the profiled advertise cycle) must stay under
+LATENCY_BOUND_MS.
+
+  no LED    - baseline
+  StatusLed - timer-driven (status_led.py, host machine.Timer on a
+              thread): the 'no_sensors' blink code for the first half,
+              then an activity flash per advertisement update
+  blocking  - the old start-up blink_led() (time.sleep_ms per step) run
+              once a second from a task; must break the bound, or the
+              check could not catch a blocking LED
+
+The pin's transitions are recorded: the blink code must come out with its
+configured timing, and the activity flashes must appear once it clears.
+
+Usage:
+    python tools/bench_led.py [seconds]
+"""
+
+import sys
+import time
+
+import hostenv
+
+hostenv.quiet()
+
+import config
+
+config.USE_MOCK_SENSORS = True
+config.SENSOR_UPDATE_INTERVAL_MS = 100
+
+import main_adv
+import status_led
+from ble_advertiser import BLEAdvertiser, FrameAdvertiser
+from machine import Pin
+from profiler import STAGE_CYCLE
+from runtime import asyncio, sleep_ms
+from sensor_handler import SensorHandler
+
+LATENCY_BOUND_MS = 20               # Worst wake-up latency allowed on the host
+TIMING_TOLERANCE_MS = 40            # Host thread timer accuracy
+
+
+class RecordingPin(Pin):
+    """Pin that keeps (ms, value) for every change"""
+
+    def __init__(self, pin, mode=-1):
+        super().__init__(pin, mode)
+        self.changes = []
+
+    def value(self, v=None):
+        if v is not None and (1 if v else 0) != self._value:
+            self.changes.append((time.perf_counter() * 1000, 1 if v else 0))
+        return super().value(v)
+
+
+def make_leds():
+    pin = RecordingPin(config.LED_PIN, Pin.OUT)
+    return status_led.StatusLed(pin, config.LED_PATTERNS, config.LED_PRIORITY,
+                                config.LED_BLINK_CODES, config.LED_TIMER_ID)
+
+
+async def blocking_blink():
+    """The old blocking blink, three 200 ms blinks, once a second"""
+    pin = Pin(config.LED_PIN, Pin.OUT)
+    while True:
+        await sleep_ms(1000)
+        for _ in range(3):
+            pin.on()
+            time.sleep_ms(200)
+            pin.off()
+            time.sleep_ms(200)
+
+
+async def scenario(app, seconds, blocking):
+    task = asyncio.create_task(app.run())
+    extra = asyncio.create_task(blocking_blink()) if blocking else None
+    leds = app.leds
+    if leds:
+        leds.set('no_sensors')
+        await asyncio.sleep(seconds / 2)
+        leds.set('no_sensors', False)
+        await asyncio.sleep(seconds / 2)
+        leds.stop()
+    else:
+        await asyncio.sleep(seconds)
+    for t in (task, extra):
+        if t:
+            t.cancel()
+            try:
+                await t
+            except asyncio.CancelledError:
+                pass
+
+
+def run(seconds, leds, blocking=False):
+    advertiser = FrameAdvertiser() if config.ADV_FORMAT_VERSION >= 3 else BLEAdvertiser()
+    app = main_adv.AdvertiserApp(advertiser, SensorHandler(), leds)
+    asyncio.run(scenario(app, seconds, blocking))
+    tickers = (app.sensor_ticker, app.advertise_ticker, app.rotate_ticker)
+    worst_us = max(t.late_max_us for t in tickers)
+    mean_us = sum(t.late_total_us for t in tickers) // max(1, sum(t.ticks for t in tickers))
+    cycle_us = app.profiler.worst_us(STAGE_CYCLE) if app.profiler else 0
+    return worst_us, mean_us, cycle_us
+
+
+def pulses(changes):
+    """(on ms, following off ms) per blink from recorded transitions"""
+    result = []
+    for i in range(len(changes) - 2):
+        (t0, v0), (t1, _), (t2, _) = changes[i:i + 3]
+        if v0:
+            result.append((t1 - t0, t2 - t1))
+    return result
+
+
+def check_code(pulses, count):
+    """Blink code: count blinks, the last one followed by the pause"""
+    blink = status_led._CODE_BLINK_MS
+    ok = len(pulses) >= count
+    for i, (on_ms, off_ms) in enumerate(pulses):
+        last = i % count == count - 1
+        ok = ok and abs(on_ms - blink) <= TIMING_TOLERANCE_MS
+        ok = ok and abs(off_ms - (status_led._CODE_PAUSE_MS if last else blink)) <= TIMING_TOLERANCE_MS
+    return ok
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 8.0
+    print("Status LED vs loop latency ({:.0f} s, {} ms update interval, bound {} ms)".format(
+        seconds, config.SENSOR_UPDATE_INTERVAL_MS, LATENCY_BOUND_MS))
+    print("  {:<10} {:>10} {:>10} {:>11}".format('LED', 'late max', 'late mean', 'cycle max'))
+    results = {}
+    leds = None
+    for label in ('no LED', 'StatusLed', 'blocking'):
+        if label == 'StatusLed':
+            leds = make_leds()
+        worst_us, mean_us, cycle_us = run(seconds, leds if label == 'StatusLed' else None,
+                                          blocking=label == 'blocking')
+        results[label] = worst_us
+        print("  {:<10} {:>8.1f}ms {:>8.2f}ms {:>9.1f}ms".format(
+            label, worst_us / 1000, mean_us / 1000, cycle_us / 1000))
+
+    changes = leds.pin.changes
+    half = changes[0][0] + seconds * 500
+    code = pulses([c for c in changes if c[0] < half])
+    flashes = pulses([c for c in changes if c[0] > half + 2500])
+    stats = leds.get_stats()
+    code_ok = check_code(code, config.LED_BLINK_CODES['no_sensors'])
+    flash_ok = len(flashes) > 0 and all(abs(on - 50) <= TIMING_TOLERANCE_MS for on, _ in flashes)
+    print("  blink code 'no_sensors': {} blinks, timing {}".format(len(code), 'ok' if code_ok else 'OFF'))
+    print("  activity flashes after it cleared: {}, timing {}".format(
+        len(flashes), 'ok' if flash_ok else 'OFF'))
+    print("  timer callbacks: {}, longest {} us".format(stats['steps'], stats['step_max_us']))
+
+    ok = (results['StatusLed'] < LATENCY_BOUND_MS * 1000 and results['blocking'] >= LATENCY_BOUND_MS * 1000
+          and code_ok and flash_ok)
+    print("StatusLed under the latency bound, blocking blink caught, patterns on time: {}".format(
+        'PASS' if ok else 'FAIL'))
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Logger Benchmark
+================
+Cost of one hot-path log.debug() call on CPython: disabled, recorded in
+the ring buffer only, and printed. Net allocations made by log.py are
+counted with tracemalloc (disabled and ring-only must be zero).
+
+Printing goes to a discarding stream here; on the device the console is
+a blocking UART, so the estimate of the time spent transmitting each line
+at UART_BAUD is what matters for the loop time.
+
+Usage:
+    python tools/bench_log.py [calls]
+"""
+
+import io
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+import hostenv
+
+import log
+
+UART_BAUD = 115200
+MESSAGE = "[BLE] Advertising: T={}°C H={}% P={}Pa seq={}"
+READINGS = ((21.37, 55.5, 101325.0), (-4.02, None, 99870.5), (23.0, 48.25, None))
+
+
+def call(i):
+    t, h, p = READINGS[i % 3]
+    log.debug(MESSAGE, t, h, p, i & 0xFF)
+
+
+def bench(label, print_level, ring_level, calls):
+    """Measure net allocations and time per call; returns net blocks"""
+    log.set_level(print_level, ring_level)
+    sink = io.StringIO()
+    with redirect_stdout(sink):
+        tracemalloc.start()
+        for i in range(1000):
+            call(i)
+        sink.seek(0)
+        sink.truncate()
+
+        before = tracemalloc.take_snapshot()
+        for i in range(calls):
+            call(i)
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        printed = sink.tell()
+        sink.seek(0)
+        sink.truncate()
+
+        start = time.perf_counter()
+        for i in range(calls):
+            call(i)
+        elapsed = time.perf_counter() - start
+
+    filters = [tracemalloc.Filter(True, '*log.py')]
+    diff = after.filter_traces(filters).compare_to(before.filter_traces(filters), 'lineno')
+    net_blocks = sum(stat.count_diff for stat in diff)
+
+    line = ''
+    if printed:
+        # 10 bits per byte on the wire (start + 8 data + stop)
+        uart_ms = printed / calls * 10 * 1000 / UART_BAUD
+        line = ", UART at {} baud: {:.2f} ms/line".format(UART_BAUD, uart_ms)
+    print("  {:<10} {:>6.2f} us/call, net allocations {:>3} blocks{}".format(
+        label, elapsed / calls * 1e6, net_blocks, line))
+    return net_blocks
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+    print("Logger benchmark: log.debug() with 4 arguments ({} calls)".format(calls))
+    disabled = bench('disabled', 'off', 'off', calls)
+    ring = bench('ring', 'off', 'debug', calls)
+    bench('printed', 'debug', 'debug', calls)
+
+    print("  ring buffer: {}".format(log.get_stats()))
+    if disabled or ring:
+        print("FAIL: logger allocates when not printing")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
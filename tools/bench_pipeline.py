@@ -0,0 +1,157 @@
+"""
+Sensor Pipeline Benchmark
+=========================
+Cycles per second of one full read (temperature, humidity, pressure) plus
+validation on CPython: the compiled read plan (SensorHandler.read_all +
+validate_all_readings) against the previous per-cycle path, reproduced
+here as it was - config.SENSOR_TYPES lookups, a fresh readings dict,
+config offset/precision/mock-range lookups in every read method and
+string-keyed range checks.
+
+Both run against the same simulated BME280 (and in mock mode), so the
+difference is the pipeline overhead alone. Absolute rates are host CPU
+speed; the ratio is what carries over to the device.
+
+Usage:
+    python tools/bench_pipeline.py [seconds]
+"""
+
+import random
+import sys
+import time
+
+import hostenv
+
+hostenv.quiet()
+
+import config
+from machine import I2C
+from sensor_handler import SensorHandler
+from simdevices import BME280Sim
+
+
+class LegacyPipeline:
+    """The per-cycle read path before the compiled plan"""
+
+    def __init__(self, handler):
+        self.use_mock = handler.use_mock
+        self.sensors = handler.sensors
+
+    def read_temperature(self):
+        try:
+            if self.use_mock:
+                min_temp, max_temp = config.MOCK_TEMPERATURE_RANGE
+                temp = random.uniform(min_temp, max_temp)
+            elif 'bme280' in self.sensors:
+                temp = self.sensors['bme280'].temperature
+            else:
+                temp = 22.0
+            temp += config.TEMPERATURE_OFFSET
+            return round(temp, config.TEMPERATURE_PRECISION)
+        except Exception:
+            return None
+
+    def read_humidity(self):
+        try:
+            if self.use_mock:
+                min_hum, max_hum = config.MOCK_HUMIDITY_RANGE
+                humidity = random.uniform(min_hum, max_hum)
+            elif 'bme280' in self.sensors:
+                humidity = self.sensors['bme280'].humidity
+            else:
+                humidity = 50.0
+            humidity += config.HUMIDITY_OFFSET
+            humidity = max(0.0, min(100.0, humidity))
+            return round(humidity, config.HUMIDITY_PRECISION)
+        except Exception:
+            return None
+
+    def read_pressure(self):
+        try:
+            if self.use_mock:
+                min_press, max_press = config.MOCK_PRESSURE_RANGE
+                pressure_pa = random.uniform(min_press, max_press) * 100
+            elif 'bme280' in self.sensors:
+                pressure_pa = self.sensors['bme280'].pressure
+            else:
+                pressure_pa = 101325.0
+            pressure_pa += (config.PRESSURE_OFFSET * 100)
+            return round(pressure_pa, config.PRESSURE_PRECISION)
+        except Exception:
+            return None
+
+    def read_all(self):
+        readings = {}
+        if config.SENSOR_TYPES.get('temperature', False):
+            readings['temperature'] = self.read_temperature()
+        if config.SENSOR_TYPES.get('humidity', False):
+            readings['humidity'] = self.read_humidity()
+        if config.SENSOR_TYPES.get('pressure', False):
+            readings['pressure'] = self.read_pressure()
+        return readings
+
+    @staticmethod
+    def validate_reading(value, min_val, max_val):
+        if value is None:
+            return False
+        return min_val <= value <= max_val
+
+    def validate_all_readings(self, readings):
+        valid = True
+        if 'temperature' in readings:
+            if not self.validate_reading(readings['temperature'], -40, 85):
+                valid = False
+        if 'humidity' in readings:
+            if not self.validate_reading(readings['humidity'], 0, 100):
+                valid = False
+        if 'pressure' in readings:
+            if not self.validate_reading(readings['pressure'], 30000, 110000):
+                valid = False
+        return valid
+
+
+def legacy_cycle(pipeline):
+    pipeline.validate_all_readings(pipeline.read_all())
+
+
+def plan_cycle(handler):
+    handler.read_all()
+    handler.validate_all_readings()
+
+
+def rate(cycle, target, seconds):
+    """Cycles per second, run for about `seconds`"""
+    for _ in range(200):
+        cycle(target)
+    count = 0
+    start = time.perf_counter()
+    end = start + seconds
+    while True:
+        for _ in range(200):
+            cycle(target)
+        count += 200
+        now = time.perf_counter()
+        if now >= end:
+            return count / (now - start)
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    config.DS18B20_PIN = None
+    config.OVERSAMPLE_WINDOW = 1            # Read path only, no aggregation
+
+    print("Sensor pipeline benchmark ({:g} s per row, cycles/s, higher is better)".format(seconds))
+    for label, mock in (('BME280 driver', False), ('mock sensors', True)):
+        config.USE_MOCK_SENSORS = mock
+        I2C.detach_all()
+        I2C.attach(BME280Sim(0x76))
+        handler = SensorHandler()
+        before = rate(legacy_cycle, LegacyPipeline(handler), seconds)
+        after = rate(plan_cycle, handler, seconds)
+        print("  {:<14} before {:>9.0f}  after {:>9.0f}  ({:+.0%})".format(
+            label, before, after, after / before - 1))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
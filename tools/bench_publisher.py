@@ -0,0 +1,170 @@
+"""
+SignalK Publisher Benchmark
+===========================
+Runs collector -> delta publisher (receiver/signalk_publisher.py) against
+a local stand-in SignalK server: a WebSocket endpoint (websockets) that
+sends a hello and records every delta with its arrival time.
+Synthetic fleets of 10 to 1000 nodes advertise in real time every 100 ms
+and update once a second (10 % of advertisements lost). Halfway through
+each run the server drops the connection and refuses new ones for a
+second, so the publisher has to reconnect with its queue intact.
+
+Reported per fleet: advertisements, the deltas a per-advertisement
+publisher would send, deltas actually sent (messages saved by batching),
+values suppressed as unchanged, queue drops, reconnects, and end-to-end
+latency percentiles (advertisement received -> delta at the server).
+Every node's latest values must reach the server.
+
+Requirements:
+    pip install websockets
+
+Usage:
+    python tools/bench_publisher.py [seconds]
+"""
+
+import asyncio
+import calendar
+import json
+import os
+import sys
+import time
+from http import HTTPStatus
+
+from websockets.asyncio.server import serve
+from websockets.exceptions import ConnectionClosed
+
+import hostenv
+
+sys.path.insert(0, os.path.join(hostenv.ROOT_DIR, 'receiver'))
+
+from adv_decode import TO_SIGNALK
+from ble_scanner import Collector, SyntheticSource
+from signalk_publisher import DeltaPublisher
+import config
+
+FLEETS = (10, 100, 1000)
+LOSS = 0.1
+OUTAGE_S = 1.0
+
+
+class StandInServer:
+    """Local WebSocket endpoint standing in for the SignalK stream"""
+
+    def __init__(self):
+        self.server = None
+        self.port = None
+        self.clients = []
+        self.refusing = False
+        self.connections = 0
+        self.deltas = 0
+        self.latencies = []         # ms, live updates only
+        self.state = {}             # (source, path) -> latest value
+
+    async def start(self):
+        self.server = await serve(self.serve, '127.0.0.1', 0, process_request=self.check)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return 'ws://127.0.0.1:{}/signalk/v1/stream?subscribe=none'.format(self.port)
+
+    async def stop(self):
+        self.drop()
+        self.server.close()
+        await self.server.wait_closed()
+
+    def drop(self):
+        """Cut every open connection (no closing handshake)"""
+        for ws in self.clients:
+            ws.transport.abort()
+        self.clients = []
+
+    async def outage(self, seconds):
+        self.drop()
+        self.refusing = True
+        await asyncio.sleep(seconds)
+        self.refusing = False
+
+    def check(self, ws, request):
+        """Refuse the upgrade during an outage"""
+        if self.refusing:
+            return ws.respond(HTTPStatus.SERVICE_UNAVAILABLE, "outage\n")
+        return None
+
+    async def serve(self, ws):
+        hello = {'name': 'stand-in', 'version': '2.0.0', 'self': 'vessels.self', 'roles': ['master']}
+        self.connections += 1
+        self.clients.append(ws)
+        try:
+            await ws.send(json.dumps(hello))
+            async for message in ws:
+                self.receive(json.loads(message))
+        except (ConnectionClosed, OSError):
+            pass
+
+    def receive(self, delta):
+        arrival_ms = time.time() * 1000
+        self.deltas += 1
+        for update in delta['updates']:
+            stamp = update['timestamp']
+            stamp_ms = calendar.timegm(time.strptime(stamp[:19], '%Y-%m-%dT%H:%M:%S')) * 1000 + int(stamp[20:23])
+            latency = arrival_ms - stamp_ms
+            if latency < 5000:
+                self.latencies.append(latency)
+            for value in update['values']:
+                self.state[(update['$source'], value['path'])] = value['value']
+
+
+def delivered(server, source):
+    """Does the server hold every node's latest values?"""
+    for node in source.nodes:
+        name = 'esp32-sk.' + node.address.replace(':', '')
+        for field, value in node.expected().items():
+            if server.state.get((name, config.SIGNALK_PATHS[field])) != TO_SIGNALK[field](value):
+                return False
+    return True
+
+
+async def run(nodes, seconds):
+    server = StandInServer()
+    url = await server.start()
+    publisher = DeltaPublisher(url)
+    collector = Collector(on_update=publisher.submit)
+    source = SyntheticSource(nodes, loss=LOSS, duration_s=seconds)
+    sender = asyncio.create_task(publisher.run())
+    outage = asyncio.get_running_loop().call_later(
+        seconds / 2, lambda: asyncio.ensure_future(server.outage(OUTAGE_S)))
+    try:
+        await collector.run(source, report_s=0)
+        flushed = await publisher.flush()
+    finally:
+        outage.cancel()
+        sender.cancel()
+        await asyncio.gather(sender, return_exceptions=True)
+        await server.stop()
+    return server, publisher, collector, source, flushed
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    print("Publisher: synthetic fleets, {:.0f} s real time, 100 ms advertising, 1 s updates, {:.0%} loss, "
+          "{:.0f} s server outage".format(seconds, LOSS, OUTAGE_S))
+    print("  {:>5} {:>8} {:>8} {:>6} {:>6} {:>8} {:>6} {:>5} | latency ms {:>5} {:>5} {:>5} {:>5}".format(
+        'nodes', 'adverts', 'naive', 'sent', 'saved', 'suppr', 'drops', 'conn', 'p50', 'p90', 'p99', 'max'))
+    ok = True
+    for nodes in FLEETS:
+        server, publisher, collector, source, flushed = asyncio.run(run(nodes, seconds))
+        stats = publisher.get_stats()
+        lat = server.latencies
+        ok = (ok and flushed and delivered(server, source) and stats['dropped'] == 0
+              and server.connections >= 2 and stats['deltas'] < collector.packets)
+        print("  {:>5} {:>8} {:>8} {:>6} {:>5.1f}% {:>8} {:>6} {:>5} |            {:>5.0f} {:>5.0f} {:>5.0f} {:>5.0f}".format(
+            nodes, source.sent, collector.packets, stats['deltas'],
+            100 * (1 - stats['deltas'] / max(1, collector.packets)), stats['suppressed'], stats['dropped'],
+            server.connections, *(hostenv.percentile(lat, p) for p in (0.5, 0.9, 0.99)),
+            max(lat) if lat else 0))
+    print("  (naive: one delta per advertisement; latency includes the outage)")
+    print("reconnected after the outage and delivered every node's latest values: {}".format(
+        'PASS' if ok else 'FAIL'))
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""
+Runtime Jitter Benchmark
+========================
+Runs the advertisement-mode asyncio runtime (main_adv.AdvertiserApp) on
+CPython with stub hardware and mock sensors, then reports how late each
+periodic task woke up relative to its deadline, the per-sensor
+achieved sampling rates and the per-stage timing table.
+
+Usage:
+    python tools/bench_runtime.py [seconds] [interval_ms]
+"""
+
+import sys
+
+import hostenv
+
+hostenv.quiet()
+
+import config
+
+config.USE_MOCK_SENSORS = True
+
+import main_adv
+from ble_advertiser import BLEAdvertiser, FrameAdvertiser
+from runtime import asyncio
+from sensor_handler import SensorHandler
+
+
+async def run_for(app, seconds):
+    task = asyncio.create_task(app.run())
+    await asyncio.sleep(seconds)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    config.SENSOR_UPDATE_INTERVAL_MS = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    advertiser = FrameAdvertiser() if config.ADV_FORMAT_VERSION >= 3 else BLEAdvertiser()
+    app = main_adv.AdvertiserApp(advertiser, SensorHandler())
+    asyncio.run(run_for(app, seconds))
+
+    expected = int(seconds * 1000 / config.SENSOR_UPDATE_INTERVAL_MS)
+    print("Runtime benchmark ({:.1f} s, {} ms update interval)".format(
+        seconds, config.SENSOR_UPDATE_INTERVAL_MS))
+    print("  sensor task:       {}".format(app.sensor_ticker.get_stats()))
+    print("  advertise task:    {} (expected ~{} ticks)".format(
+        app.advertise_ticker.get_stats(), expected))
+    print("  housekeeping task: {}".format(app.housekeeping_ticker.get_stats()))
+    print("  advertiser:        {}".format(app.ble_advertiser.get_stats()))
+    print("  memory:            {}".format(app.memory.get_stats()))
+    for name, stats in app.sensor_handler.get_schedule_stats().items():
+        print("  sensor {:<12} {}".format(name + ':', stats))
+    if app.profiler:
+        app.profiler.report()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""
+Host stand-in for the MicroPython ``bluetooth`` module
+======================================================
+A fake BLE radio that records every gap_advertise call so host tools can
+inspect what the firmware would have put on air. Setting BLE.adv_log to a
+list also keeps every call, timestamped, across radio instances (and so
+across simulated deep-sleep wakes).
+
+GATT server side: services get handles as on the device, characteristic
+values are stored per handle, and gatts_notify() records what a central
+would receive. A host tool plays the central with connect(),
+disconnect() and the MTU it supports.
+"""
+
+import time
+
+_IRQ_CENTRAL_CONNECT = 1
+_IRQ_CENTRAL_DISCONNECT = 2
+_IRQ_MTU_EXCHANGED = 21
+_DEFAULT_MTU = 23
+
+
+class UUID:
+    """16-bit or 128-bit UUID"""
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return isinstance(other, UUID) and self.value == other.value
+
+    def __hash__(self):
+        return hash(self.value)
+
+    def __repr__(self):
+        if isinstance(self.value, int):
+            return "UUID(0x{:04x})".format(self.value)
+        return "UUID({!r})".format(self.value)
+
+
+class BLE:
+    """Fake BLE radio"""
+    adv_log = None                  # List of (ticks_ms, interval_us, adv_data) per gap_advertise
+
+    def __init__(self):
+        self._active = False
+        self._irq = None
+        self.advertising = None     # (interval_us, adv_data, resp_data) or None
+        self.adv_calls = 0          # Number of gap_advertise calls (incl. stop)
+        self.mtu = _DEFAULT_MTU     # Preferred MTU (config(mtu=...))
+        self.values = {}            # Characteristic value per handle
+        self.uuids = {}             # Characteristic UUID per handle
+        self.notifications = []     # (conn_handle, value_handle, data) per notify
+        self.notify_bytes = 0       # ATT payload bytes notified
+        self.connections = {}       # conn_handle -> ATT MTU in use
+        self._central_mtu = {}      # conn_handle -> largest MTU the central accepts
+
+    def active(self, state=None):
+        if state is not None:
+            self._active = bool(state)
+        return self._active
+
+    def irq(self, handler):
+        self._irq = handler
+
+    def gap_advertise(self, interval_us, adv_data=None, resp_data=None, connectable=True):
+        self.adv_calls += 1
+        if BLE.adv_log is not None:
+            BLE.adv_log.append((time.ticks_ms(), interval_us,
+                                bytes(adv_data) if adv_data is not None else None))
+        if interval_us is None:
+            self.advertising = None
+            return
+        # The real stack copies the payload into the controller, so do the
+        # same here; callers are free to reuse their buffers afterwards.
+        self.advertising = (
+            interval_us,
+            bytes(adv_data) if adv_data is not None else None,
+            bytes(resp_data) if resp_data is not None else None,
+        )
+
+    def config(self, *args, **kwargs):
+        if args:
+            return {'mtu': self.mtu}.get(args[0])
+        if 'mtu' in kwargs:
+            self.mtu = kwargs['mtu']
+
+    def gatts_register_services(self, services):
+        """Assign handles as NimBLE does: one per characteristic value,
+        counting up across services"""
+        handles = []
+        handle = 0
+        for _, characteristics in services:
+            handle += 1                         # Service declaration
+            service_handles = []
+            for uuid, _flags in characteristics:
+                handle += 2                     # Declaration + value
+                self.values[handle] = b''
+                self.uuids[handle] = uuid
+                service_handles.append(handle)
+            handles.append(tuple(service_handles))
+        return tuple(handles)
+
+    def gatts_set_buffer(self, value_handle, length, append=False):
+        pass
+
+    def gatts_read(self, value_handle):
+        return self.values[value_handle]
+
+    def gatts_write(self, value_handle, data, send_update=False):
+        self.values[value_handle] = bytes(data)
+
+    def gatts_notify(self, conn_handle, value_handle, data=None):
+        if conn_handle not in self.connections:
+            raise OSError(128)                  # ENOTCONN
+        data = self.values[value_handle] if data is None else bytes(data)
+        limit = self.connections[conn_handle] - 3
+        if len(data) > limit:
+            data = data[:limit]                 # The stack truncates to ATT_MTU - 3
+        self.notifications.append((conn_handle, value_handle, data))
+        self.notify_bytes += len(data)
+
+    def gattc_exchange_mtu(self, conn_handle):
+        mtu = min(self.mtu, self._central_mtu[conn_handle])
+        self.connections[conn_handle] = mtu
+        if self._irq:
+            self._irq(_IRQ_MTU_EXCHANGED, (conn_handle, mtu))
+
+    def gap_disconnect(self, conn_handle):
+        if conn_handle not in self.connections:
+            return False
+        self.disconnect(conn_handle)
+        return True
+
+    # Host only: play the central
+
+    def connect(self, conn_handle, mtu=_DEFAULT_MTU):
+        """A central connects (it will accept an MTU up to `mtu`)"""
+        self.connections[conn_handle] = _DEFAULT_MTU
+        self._central_mtu[conn_handle] = mtu
+        self.advertising = None             # Advertising stops on connect
+        if self._irq:
+            self._irq(_IRQ_CENTRAL_CONNECT, (conn_handle, 0, bytes(6)))
+
+    def disconnect(self, conn_handle):
+        del self.connections[conn_handle]
+        del self._central_mtu[conn_handle]
+        if self._irq:
+            self._irq(_IRQ_CENTRAL_DISCONNECT, (conn_handle, 0, bytes(6)))
@@ -0,0 +1,243 @@
+"""
+Host stand-in for the MicroPython ``machine`` module
+====================================================
+Pin, Timer, ADC and I2C fakes so firmware modules run on CPython. The I2C bus
+serves register reads/writes from simulated devices (see
+tools/simdevices.py) and counts bus transactions.
+
+deepsleep() raises DeepSleep instead of resetting; a host tool catches
+it and "wakes" the firmware by running it again. RTC memory and the
+reset cause survive, as they do on the device.
+"""
+
+import errno
+import threading
+
+PWRON_RESET = 1
+HARD_RESET = 2
+WDT_RESET = 3
+DEEPSLEEP_RESET = 4
+SOFT_RESET = 5
+
+_reset_cause = PWRON_RESET
+
+
+class DeepSleep(Exception):
+    """Raised by deepsleep() (host only); args[0] is the sleep time in ms"""
+
+
+def reset_cause():
+    return _reset_cause
+
+
+def deepsleep(time_ms=0):
+    global _reset_cause
+    _reset_cause = DEEPSLEEP_RESET
+    raise DeepSleep(time_ms)
+
+
+def power_on():
+    """Simulate a power cycle: RTC memory is lost"""
+    global _reset_cause
+    _reset_cause = PWRON_RESET
+    RTC._memory = b''
+
+
+class RTC:
+    """Fake RTC with user memory (kept across deepsleep() on the host)"""
+    _memory = b''
+
+    def memory(self, data=None):
+        if data is None:
+            return RTC._memory
+        if len(data) > 2048:
+            raise ValueError("RTC memory is limited to 2048 bytes")
+        RTC._memory = bytes(data)
+
+
+class Pin:
+    """Fake GPIO pin"""
+    IN = 0
+    OUT = 1
+
+    def __init__(self, pin, mode=-1, pull=None):
+        self.pin = pin
+        self.mode = mode
+        self._value = 0
+
+    def value(self, v=None):
+        if v is None:
+            return self._value
+        self._value = 1 if v else 0
+
+    def on(self):
+        self._value = 1
+
+    def off(self):
+        self._value = 0
+
+
+class Timer:
+    """Fake hardware timer: callbacks run on a thread, outside the asyncio
+    loop, as soft timer callbacks run between the firmware's bytecodes"""
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, id=-1, **kwargs):
+        self.id = id
+        self._timer = None
+        if kwargs:
+            self.init(**kwargs)
+
+    def init(self, mode=PERIODIC, period=-1, callback=None, freq=None):
+        self.deinit()
+        if freq:
+            period = 1000 / freq
+        self._mode = mode
+        self._period_s = max(period, 0) / 1000
+        self._callback = callback
+        self._arm()
+
+    def _arm(self):
+        self._timer = threading.Timer(self._period_s, self._fire)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _fire(self):
+        timer = self._timer
+        if self._mode == Timer.PERIODIC:
+            self._arm()
+        if self._callback:
+            self._callback(self)
+        if self._timer is timer:
+            self._timer = None
+
+    def deinit(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+
+class ADC:
+    """Fake ADC
+
+    The input comes from the class-level ``source``: a callable returning
+    the pin voltage in uV (tools set it to model a battery). read_u16()
+    scales by the nominal range of the attenuation, read_uv() returns the
+    voltage as the eFuse calibration would.
+    """
+    ATTN_0DB = 0
+    ATTN_2_5DB = 1
+    ATTN_6DB = 2
+    ATTN_11DB = 3
+    _FULL_SCALE_UV = (1100000, 1500000, 2200000, 3900000)
+    source = staticmethod(lambda: 0)
+
+    def __init__(self, pin, atten=ATTN_0DB):
+        self.pin = pin
+        self.atten = atten
+        self.reads = 0
+
+    def read_uv(self):
+        self.reads += 1
+        return min(max(0, int(ADC.source())), self._FULL_SCALE_UV[self.atten])
+
+    def read_u16(self):
+        self.reads += 1
+        full = self._FULL_SCALE_UV[self.atten]
+        return min(max(0, int(ADC.source())), full) * 65535 // full
+
+
+class RegisterDevice:
+    """Simulated I2C device with a 256-byte register map
+
+    Subclasses override on_write() to react to register writes. Plain
+    transfers (writeto/readfrom) set and read from a register pointer;
+    command-based devices override command() and read_raw() instead.
+    """
+
+    def __init__(self, addr):
+        self.addr = addr
+        self.regs = bytearray(256)
+        self.pointer = 0
+
+    def read(self, reg, nbytes):
+        return bytes(self.regs[reg:reg + nbytes])
+
+    def write(self, reg, data):
+        self.regs[reg:reg + len(data)] = data
+        self.on_write(reg, data)
+
+    def on_write(self, reg, data):
+        pass
+
+    def command(self, data):
+        self.pointer = data[0]
+        if len(data) > 1:
+            self.write(data[0], data[1:])
+
+    def read_raw(self, nbytes):
+        return self.read(self.pointer, nbytes)
+
+
+class I2C:
+    """Fake I2C bus
+
+    Devices attached to the class-level ``devices`` map appear on every
+    bus instance (firmware creates its own I2C object).
+    """
+    devices = {}
+
+    def __init__(self, bus_id, scl=None, sda=None, freq=400000):
+        self.bus_id = bus_id
+        self.freq = freq
+        self.transactions = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    @classmethod
+    def attach(cls, device):
+        cls.devices[device.addr] = device
+        return device
+
+    @classmethod
+    def detach_all(cls):
+        cls.devices = {}
+
+    def _device(self, addr):
+        self.transactions += 1
+        try:
+            return self.devices[addr]
+        except KeyError:
+            raise OSError(errno.ENODEV)
+
+    def scan(self):
+        self.transactions += 112            # One address probe per 7-bit address (0x08-0x77)
+        return sorted(self.devices)
+
+    def writeto(self, addr, buf):
+        self._device(addr).command(bytes(buf))
+        self.bytes_written += len(buf)
+        return 1
+
+    def readfrom(self, addr, nbytes):
+        data = self._device(addr).read_raw(nbytes)
+        self.bytes_read += nbytes
+        return data
+
+    def readfrom_into(self, addr, buf):
+        buf[:] = self._device(addr).read_raw(len(buf))
+        self.bytes_read += len(buf)
+
+    def readfrom_mem(self, addr, memaddr, nbytes):
+        data = self._device(addr).read(memaddr, nbytes)
+        self.bytes_read += nbytes
+        return data
+
+    def readfrom_mem_into(self, addr, memaddr, buf):
+        buf[:] = self._device(addr).read(memaddr, len(buf))
+        self.bytes_read += len(buf)
+
+    def writeto_mem(self, addr, memaddr, buf):
+        self._device(addr).write(memaddr, bytes(buf))
+        self.bytes_written += len(buf)
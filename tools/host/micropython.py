@@ -0,0 +1,10 @@
+"""
+Host stand-in for the MicroPython ``micropython`` module
+========================================================
+Only the pieces the firmware uses are provided.
+"""
+
+
+def const(value):
+    """Compile-time constant on device, identity on CPython"""
+    return value
@@ -0,0 +1,117 @@
+"""
+Host stand-in for the MicroPython ``onewire`` module
+====================================================
+A one-wire bus with simulated DS18B20 probes (see tools/simdevices.py).
+Implements the OneWire API the firmware uses and counts bus traffic.
+"""
+
+
+class OneWireError(Exception):
+    pass
+
+
+class OneWire:
+    """Fake one-wire bus
+
+    Probes attached to the class-level ``devices`` list are visible on
+    every bus instance.
+    """
+    SEARCH_ROM = 0xF0
+    MATCH_ROM = 0x55
+    SKIP_ROM = 0xCC
+
+    devices = []
+
+    def __init__(self, pin):
+        self.pin = pin
+        self.resets = 0
+        self.bytes_written = 0
+        self.bytes_read = 0
+        self._selected = []
+        self._state = 'idle'
+        self._match = bytearray()
+        self._out = b''
+
+    @classmethod
+    def attach(cls, device):
+        cls.devices.append(device)
+        return device
+
+    @classmethod
+    def detach_all(cls):
+        cls.devices = []
+
+    def reset(self, required=False):
+        self.resets += 1
+        self._state = 'rom'
+        self._selected = []
+        self._out = b''
+        present = bool(self.devices)
+        if required and not present:
+            raise OneWireError
+        return present
+
+    def writebyte(self, value):
+        self.bytes_written += 1
+        if self._state == 'rom':
+            if value == self.SKIP_ROM:
+                self._selected = list(self.devices)
+                self._state = 'function'
+            elif value == self.MATCH_ROM:
+                self._match = bytearray()
+                self._state = 'match'
+        elif self._state == 'match':
+            self._match.append(value)
+            if len(self._match) == 8:
+                self._selected = [d for d in self.devices if d.rom == bytes(self._match)]
+                self._state = 'function'
+        elif self._state == 'function':
+            self._state = 'data'
+            for device in self._selected:
+                self._out = device.command(value) or self._out
+        elif self._state == 'data':
+            for device in self._selected:
+                device.data(value)
+
+    def write(self, buf):
+        for b in buf:
+            self.writebyte(b)
+
+    def readbyte(self):
+        self.bytes_read += 1
+        if self._out:
+            value, self._out = self._out[0], self._out[1:]
+            return value
+        return 0xFF
+
+    def readinto(self, buf):
+        for i in range(len(buf)):
+            buf[i] = self.readbyte()
+
+    def select_rom(self, rom):
+        self.reset()
+        self.writebyte(self.MATCH_ROM)
+        self.write(rom)
+
+    def scan(self):
+        # Each search pass costs a reset plus 64 bit triplets; count it as
+        # roughly 24 byte times per device found.
+        self.resets += len(self.devices)
+        self.bytes_written += 24 * len(self.devices)
+        return [bytearray(d.rom) for d in self.devices]
+
+    def crc8(self, data):
+        return crc8(data)
+
+
+def crc8(data):
+    """Dallas/Maxim CRC-8 (0 when data includes a valid CRC byte)"""
+    crc = 0
+    for byte in data:
+        for _ in range(8):
+            mix = (crc ^ byte) & 0x01
+            crc >>= 1
+            if mix:
+                crc ^= 0x8C
+            byte >>= 1
+    return crc
@@ -0,0 +1,112 @@
+"""
+Host Environment
+================
+Lets the ESP32 firmware run on CPython for benchmarks and simulations.
+
+Importing this module puts the stand-in MicroPython modules (tools/host)
+and the firmware directory (esp32/) on sys.path, and adds the MicroPython
+``time`` extensions the firmware relies on.
+
+Usage (from a script in tools/):
+    import hostenv
+    import ble_advertiser
+"""
+
+import gc
+import os
+import sys
+import time
+import traceback
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(TOOLS_DIR)
+ESP32_DIR = os.path.join(ROOT_DIR, 'esp32')
+HOST_DIR = os.path.join(TOOLS_DIR, 'host')
+
+for _path in (ESP32_DIR, HOST_DIR):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+_TICKS_PERIOD = 1 << 30
+_TICKS_MAX = _TICKS_PERIOD - 1
+_TICKS_HALFPERIOD = _TICKS_PERIOD // 2
+
+
+_epoch = 0.0
+
+
+def _ticks_ms():
+    return int((time.monotonic() - _epoch) * 1000) & _TICKS_MAX
+
+
+def _ticks_us():
+    return int((time.monotonic() - _epoch) * 1000000) & _TICKS_MAX
+
+
+def reset_ticks():
+    """Restart ticks_ms/ticks_us at zero, as a reset or deep-sleep wake does"""
+    global _epoch
+    _epoch = time.monotonic()
+
+
+def _ticks_add(ticks, delta):
+    return (ticks + delta) & _TICKS_MAX
+
+
+def _ticks_diff(end, start):
+    return ((end - start + _TICKS_HALFPERIOD) & _TICKS_MAX) - _TICKS_HALFPERIOD
+
+
+def _sleep_ms(ms):
+    time.sleep(ms / 1000)
+
+
+def _sleep_us(us):
+    time.sleep(us / 1000000)
+
+
+# Install MicroPython time extensions (only where CPython lacks them)
+for _name, _fn in (('ticks_ms', _ticks_ms), ('ticks_us', _ticks_us),
+                   ('ticks_add', _ticks_add), ('ticks_diff', _ticks_diff),
+                   ('sleep_ms', _sleep_ms), ('sleep_us', _sleep_us)):
+    if not hasattr(time, _name):
+        setattr(time, _name, _fn)
+
+
+# MicroPython gc/sys extensions (values are nominal on the host)
+if not hasattr(gc, 'mem_free'):
+    gc.mem_free = lambda: 100000
+    gc.mem_alloc = lambda: 20000
+if not hasattr(gc, 'threshold'):
+    _gc_threshold = [-1]
+
+    def _threshold(amount=None):
+        if amount is None:
+            return _gc_threshold[0]
+        _gc_threshold[0] = amount
+
+    gc.threshold = _threshold
+if not hasattr(sys, 'print_exception'):
+    sys.print_exception = traceback.print_exception
+
+
+# No flash cache of the I2C scan on the host (tools attach their own
+# simulated devices and must not leave files behind)
+import config as _config
+_config.I2C_SCAN_CACHE = None
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of values, p from 0 to 1 (0 if empty)"""
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0
+
+
+def quiet():
+    """Turn off firmware debug output (benchmarks measure the hot path)"""
+    import config
+    config.DEBUG = False
+    config.LOG_LEVEL = 'off'
+    config.LOG_RING_LEVEL = 'off'
+    import log
+    log.set_level('off', 'off')
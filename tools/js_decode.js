@@ -0,0 +1,73 @@
+// Runs ESP32SignalK.decode() from ESP32SignalK_adv.js outside SignalK.
+// Reads one hex payload (company ID stripped) per stdin line and prints
+// the decoded values as one JSON object per line.
+//
+// With --dedup, reads "time_ms address hex" lines and runs them through
+// ESP32SignalK.DedupCache, then prints one JSON object: the verdict per
+// line ("1" forwarded, "0" repeat), the cache counters, and the time to
+// decode every line vs. to check every line and decode the forwarded ones.
+//
+// Usage: node tools/js_decode.js < payloads.txt
+//        node tools/js_decode.js --dedup < frames.txt
+
+const Module = require("module");
+const path = require("path");
+const readline = require("readline");
+
+// Minimal stand-in for the plugin's BTSensor base class
+class BTSensor {}
+BTSensor.SensorDomains = { environmental: "environmental" };
+
+const load = Module._load;
+Module._load = function (request, parent, isMain) {
+    if (request === "../BTSensor") {
+        return BTSensor;
+    }
+    return load.apply(this, arguments);
+};
+
+const ESP32SignalK = require(path.join(__dirname, "..", "ESP32SignalK_adv.js"));
+
+function dedup(lines) {
+    const frames = lines.filter((line) => line.trim()).map((line) => {
+        const [t, address, hex] = line.trim().split(" ");
+        return [Number(t), address, Buffer.from(hex, "hex")];
+    });
+    const elapsedMs = (fn) => {
+        const start = process.hrtime.bigint();
+        fn();
+        return Number(process.hrtime.bigint() - start) / 1e6;
+    };
+
+    const decodeAllMs = elapsedMs(() => {
+        for (const [, , data] of frames) {
+            ESP32SignalK.decode(data);
+        }
+    });
+    const cache = new ESP32SignalK.DedupCache();
+    const flags = new Array(frames.length);
+    const dedupMs = elapsedMs(() => {
+        frames.forEach(([t, address, data], i) => {
+            flags[i] = cache.check(address, data, t) ? "1" : "0";
+            if (flags[i] == "1") {
+                ESP32SignalK.decode(data);
+            }
+        });
+    });
+    console.log(JSON.stringify({
+        flags: flags.join(""), forwarded: cache.forwarded, suppressed: cache.suppressed,
+        evicted: cache.evicted, decode_all_ms: decodeAllMs, dedup_ms: dedupMs,
+    }));
+}
+
+const rl = readline.createInterface({ input: process.stdin });
+if (process.argv.includes("--dedup")) {
+    const lines = [];
+    rl.on("line", (line) => lines.push(line));
+    rl.on("close", () => dedup(lines));
+} else {
+    rl.on("line", (line) => {
+        const hex = line.trim();
+        console.log(JSON.stringify(ESP32SignalK.decode(Buffer.from(hex, "hex"))));
+    });
+}
@@ -0,0 +1,110 @@
+// Runs the ESP32SignalK sensor class from ESP32SignalK_adv.js outside
+// SignalK, with stand-ins for the plugin's BTSensor base class and the
+// server app. Reads "time_ms hex" lines (manufacturer data, company ID
+// stripped), hands each to propertiesChanged() at that time, and prints
+// every delta the server would receive as one JSON line { t, delta }:
+// live values as the plugin publishes them (one per emitted tag, stamped
+// on arrival by the server) and backfill deltas with their own timestamps.
+// Each --path replaces a tag's default path, as configuring the plugin does.
+//
+// Usage: node tools/js_sensor.js [--path tag=path ...] < frames.txt
+
+const EventEmitter = require("events");
+const Module = require("module");
+const path = require("path");
+const readline = require("readline");
+
+let now = 0;
+Date.now = () => now;
+
+const MAC = "EE:00:00:00:00:01";
+const PLUGIN_ID = "bt-sensors-plugin-sk";
+
+const app = {
+    handleMessage: (id, delta) => console.log(JSON.stringify({ t: now, delta: delta })),
+};
+
+const configured = {};
+const args = process.argv.slice(2);
+for (let i = 0; i < args.length; i++) {
+    if (args[i] === "--path") {
+        const [tag, path] = args[++i].split("=");
+        configured[tag] = path;
+    }
+}
+
+// Minimal stand-in for the plugin's BTSensor base class: a schema of tags
+// (a path record per tag), and emitted values published on each tag's
+// path, attributed to the device, as the plugin does
+class BTSensor extends EventEmitter {
+    constructor(device) {
+        super();
+        this.device = device;
+        this._paths = {};
+    }
+    getMacAddress() {
+        return this.device.address;
+    }
+    addDefaultParam() {}
+    addDefaultPath(tag, defaultPath) {
+        this._paths[tag] = { path: defaultPath };
+        return this._paths[tag];
+    }
+    addMetadatum(tag) {
+        this._paths[tag] = { path: null };
+        return this._paths[tag];
+    }
+    initSchema() {}
+    propertiesChanged() {}
+    valueIfVariant(value) {
+        return value;
+    }
+    getManufacturerData() {
+        return this._md;
+    }
+    emitValuesFrom(buffer) {
+        for (const [tag, entry] of Object.entries(this._paths)) {
+            const value = entry.read(buffer);
+            if (value !== null && value !== undefined) {
+                this.emit(tag, value);
+                if (entry.path) {
+                    app.handleMessage(PLUGIN_ID, { updates: [{ $source: PLUGIN_ID + "." + this.getMacAddress(),
+                        values: [{ path: entry.path, value: value }] }] });
+                }
+            }
+        }
+    }
+}
+BTSensor.SensorDomains = { environmental: "environmental" };
+
+const load = Module._load;
+Module._load = function (request, parent, isMain) {
+    if (request === "../BTSensor") {
+        return BTSensor;
+    }
+    return load.apply(this, arguments);
+};
+
+const ESP32SignalK = require(path.join(__dirname, "..", "ESP32SignalK_adv.js"));
+
+let sensor = null;
+const rl = readline.createInterface({ input: process.stdin });
+rl.on("line", (line) => {
+    const [t, hex] = line.trim().split(" ");
+    if (!hex) {
+        return;
+    }
+    now = Number(t);
+    const data = Buffer.from(hex, "hex");
+    if (!sensor) {
+        sensor = new ESP32SignalK({ address: MAC }, { app: app });
+        sensor._md = data;
+        sensor.initSchema();
+        // The plugin keeps a configured path in the tag's path record
+        for (const [tag, path] of Object.entries(configured)) {
+            sensor._paths[tag].path = path;
+        }
+    }
+    sensor._md = data;
+    sensor.propertiesChanged({ ManufacturerData: data });
+});
@@ -0,0 +1,161 @@
+"""
+Advertisement Format Round-Trip Check
+=====================================
+Encodes readings with the firmware's BLEAdvertiser (v1 and v2) and
+FrameAdvertiser (v3, every frame of the rotation) on the host stubs, then
+decodes the on-air payloads with the Python reference decoder
+(receiver/adv_decode.py) and, if node is installed, with the
+ESP32SignalK_adv.js decoder itself. Every decoded value must match the
+input at the format's resolution, v3 frames must reassemble into the full
+snapshot, history frames must repeat earlier updates, and the two decoders
+must agree.
+
+Usage:
+    python tools/roundtrip_adv.py
+"""
+
+import itertools
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import hostenv
+
+hostenv.quiet()
+sys.path.insert(0, os.path.join(hostenv.ROOT_DIR, 'receiver'))
+
+import config
+import ble_advertiser
+from adv_decode import decode, manufacturer_data, FIELDS, HISTORY_VERSION, SnapshotAssembler
+
+# Value sets: typical, negative/low, and format extremes
+SAMPLES = (
+    {'temperature': 21.37, 'humidity': 55.5, 'pressure': 101325.3, 'voltage': 12.734, 'battery': 87},
+    {'temperature': -40.0, 'humidity': 0.0, 'pressure': 30000.0, 'voltage': 0.0, 'battery': 0},
+    {'temperature': 85.0, 'humidity': 100.0, 'pressure': 110000.0, 'voltage': 65.535, 'battery': 100},
+)
+SCALE = {'temperature': 100, 'humidity': 100, 'pressure': 10, 'voltage': 1000, 'battery': 1}
+PROBE_SETS = (None, [4.56], [-10.5, None, 99.99, 0.01, 21.0, 22.0, 23.0, 24.0])
+DIAGNOSTICS = (7380, 81234, 3, 12)     # uptime s, mem free, overruns, worst ms
+DIAG_EXPECTED = {'uptime': 7380 // 60 * 60, 'mem_free': 81234 >> 4 << 4,
+                 'overruns': 3, 'worst_cycle': 12}
+
+
+def expected(version, reading):
+    """What a decoder should report for `reading` in `version` format"""
+    out = {}
+    for name in FIELDS:
+        value = reading.get(name)
+        if version == 1 and name == 'voltage':
+            value = None
+        elif version == 1 and value is None:
+            value = 100 if name == 'battery' else 0
+        if value is not None:
+            value = round(value * SCALE[name]) / SCALE[name]
+        out[name] = value
+    return out
+
+
+def main():
+    payloads = []
+    failures = 0
+
+    for version in (1, 2):
+        config.ADV_FORMAT_VERSION = version
+        adv = ble_advertiser.BLEAdvertiser()
+        for sample in SAMPLES:
+            for present in itertools.product((False, True), repeat=len(FIELDS)):
+                reading = {n: (sample[n] if p else None) for n, p in zip(FIELDS, present)}
+                adv._last_adv_ms -= config.ADV_MAX_STALE_MS   # Force a broadcast
+                assert adv.advertise_sensor_data(**reading)
+                data = manufacturer_data(adv.ble.advertising[1])
+                payloads.append((version, reading, data))
+
+                decoded = decode(data)
+                want = expected(version, reading)
+                got = {n: decoded[n] for n in FIELDS} if decoded else None
+                if got != want or len(adv.ble.advertising[1]) > 31:
+                    failures += 1
+                    print("MISMATCH v{} {}: got {} want {}".format(version, reading, got, want))
+
+    frames = {}
+    history = {}                # seq -> history entry expected for that update
+    history_checked = 0
+    config.ADV_FORMAT_VERSION = 3
+    adv = ble_advertiser.FrameAdvertiser()
+    adv.set_diagnostics(*DIAGNOSTICS)
+    for sample in SAMPLES:
+        for probes in PROBE_SETS:
+            for present in itertools.product((False, True), repeat=len(FIELDS)):
+                reading = {n: (sample[n] if p else None) for n, p in zip(FIELDS, present)}
+                adv._last_adv_ms -= config.ADV_MAX_STALE_MS
+                assert adv.advertise_sensor_data(probes=probes, **reading)
+
+                history[adv.seq] = {n: (expected(2, reading)[n] if n in config.ADV_HISTORY_CHANNELS
+                                        else None) for n in FIELDS}
+                history[adv.seq].update(seq=adv.seq, age=0)
+
+                assembler = SnapshotAssembler()
+                complete = False
+                for _ in range(adv.slots()):
+                    _, adv_data, resp_data = adv.ble.advertising
+                    data = manufacturer_data(adv_data)
+                    decoded = decode(data)
+                    if data[0] == HISTORY_VERSION:
+                        payloads.append((4, reading, data))
+                        for entry in decoded['entries']:
+                            history_checked += 1
+                            if entry != history.get(entry['seq']) or entry['seq'] == adv.seq:
+                                failures += 1
+                                print("MISMATCH history: got {} want {}".format(
+                                    entry, history.get(entry['seq'])))
+                    else:
+                        payloads.append((3, reading, data))
+                        complete = assembler.add(decoded)
+                    if len(adv_data) > 31 or config.DEVICE_NAME.encode() not in resp_data:
+                        failures += 1
+                        print("BAD FRAME v{} {}".format(data[0], adv_data.hex()))
+                    adv.rotate()
+                frames[adv.frame_count] = frames.get(adv.frame_count, 0) + 1
+
+                want = expected(2, reading)
+                want.update(('probe%d' % i, None) for i in range(8))
+                for i, t in enumerate(probes or ()):
+                    want['probe%d' % i] = None if t is None else round(t * 100) / 100
+                want.update(DIAG_EXPECTED)
+                got = assembler.current()
+                if not complete or got != want:
+                    failures += 1
+                    print("MISMATCH v3 {} {}: got {} want {}".format(reading, probes, got, want))
+
+    node = shutil.which('node')
+    js_checked = 0
+    if node:
+        script = os.path.join(hostenv.TOOLS_DIR, 'js_decode.js')
+        stdin = ''.join(data.hex() + '\n' for _, _, data in payloads)
+        result = subprocess.run([node, script], input=stdin, capture_output=True, text=True, check=True)
+        for (version, reading, data), line in zip(payloads, result.stdout.splitlines()):
+            js = json.loads(line)
+            py = decode(data)
+            if js != py:
+                failures += 1
+                print("JS/PY DISAGREE v{} {}: js {} py {}".format(version, data.hex(), js, py))
+            js_checked += 1
+
+    sizes = {v: sorted({len(d) for ver, _, d in payloads if ver == v}) for v in (1, 2, 3, 4)}
+    print("Round trip: {} payloads, {} checked against JS decoder{}".format(
+        len(payloads), js_checked, '' if node else ' (node not found)'))
+    print("  manufacturer data bytes: v1 {}  v2 {}-{}  v3 {}-{}  history {}-{}".format(
+        sizes[1], sizes[2][0], sizes[2][-1], sizes[3][0], sizes[3][-1], sizes[4][0], sizes[4][-1]))
+    print("  v3 updates by frame count: {}".format(dict(sorted(frames.items()))))
+    print("  history entries checked: {}".format(history_checked))
+    if failures:
+        print("FAIL: {} mismatches".format(failures))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
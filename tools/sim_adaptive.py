@@ -0,0 +1,132 @@
+"""
+Adaptive Advertising Interval Simulation
+========================================
+Compares the fixed BLE_ADVERTISING_INTERVAL_MS against the adaptive
+interval (ADV_ADAPTIVE) over hours of a synthetic temperature signal, in
+virtual time.
+
+The signal drifts slowly, carries noise below the deadband and makes a
+step change every 20-40 minutes (a hatch opened, a heater switched on).
+Readings go to the firmware's BLEAdvertiser once per second, as
+advertise_task does. Between readings the advertiser emits one packet per
+current interval (plus the BLE advDelay of 0-10 ms); a gap_advertise call
+restarts advertising, so the first packet after it follows at once. The
+receiver misses each packet with probability `loss`.
+
+Reported for both modes: advertising events per hour (radio airtime and
+receiver scan load), time spent at each interval, and the latency from a
+step change until the receiver has the new value.
+
+Usage:
+    python tools/sim_adaptive.py [hours] [loss]
+"""
+
+import math
+import random
+import sys
+import time
+
+import hostenv
+
+hostenv.quiet()
+
+import config
+import ble_advertiser
+
+SAMPLE_MS = 1000
+ADV_DELAY_MS = 10
+
+_clock_ms = 0
+
+
+def virtual_ticks_ms():
+    return _clock_ms & 0x3FFFFFFF
+
+
+def signal(t_ms, steps):
+    """Temperature at t: drift + noise + the step changes so far"""
+    hours = t_ms / 3600000
+    value = 20.0 + math.sin(hours * math.pi / 3) + random.uniform(-0.02, 0.02)
+    for start, delta in steps:
+        if start <= t_ms:
+            value += delta
+    return value
+
+
+def simulate(adaptive, hours, loss):
+    global _clock_ms
+    config.ADV_ADAPTIVE = adaptive
+    config.ADV_FORMAT_VERSION = 2
+    _clock_ms = 0
+    rng = random.Random(7)
+    random.seed(7)
+
+    duration = int(hours * 3600000)
+    steps = []
+    t = rng.uniform(20, 40) * 60000
+    while t < duration:
+        steps.append((int(t), rng.choice((-1.5, 1.5))))
+        t += rng.uniform(20, 40) * 60000
+
+    adv = ble_advertiser.BLEAdvertiser()
+    events = 0
+    latencies = []
+    pending = list(steps)          # Steps the receiver has not caught up with
+    next_sample = 0
+    next_event = 0.0
+    while next_sample < duration:
+        if next_sample <= next_event:
+            _clock_ms = next_sample
+            calls = adv.ble.adv_calls
+            adv.advertise_sensor_data(signal(next_sample, steps), 50.0, 101325.0)
+            if adv.ble.adv_calls != calls:
+                next_event = next_sample + rng.uniform(0, ADV_DELAY_MS)
+            next_sample += SAMPLE_MS
+            continue
+
+        _clock_ms = int(next_event)
+        events += 1
+        received = rng.random() >= loss
+        if received and pending and pending[0][0] <= next_event:
+            # Has the value on air caught up with the step?
+            on_air = adv._last_values[0] / 100
+            expected = signal(pending[0][0] + SAMPLE_MS, steps)
+            if abs(on_air - expected) < 0.5:
+                latencies.append(next_event - pending[0][0])
+                pending.pop(0)
+        next_event += adv.interval_ms() + rng.uniform(0, ADV_DELAY_MS)
+
+    return adv, events, latencies, len(steps)
+
+
+def report(label, adv, events, latencies, steps, hours):
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0
+    mean = sum(latencies) / len(latencies) if latencies else 0
+    stats = adv.get_stats()
+    print("  {:<9} {:>8.0f} events/h | {} steps, latency mean {:.0f} ms, p95 {:.0f} ms".format(
+        label, events / hours, steps, mean, p95))
+    total = sum(stats['interval_time_ms'].values()) or 1
+    share = ', '.join('{} ms {:.1%}'.format(interval, ms / total)
+                      for interval, ms in stats['interval_time_ms'].items())
+    print("            time per interval: {}".format(share))
+    return events
+
+
+def main():
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 6
+    loss = float(sys.argv[2]) if len(sys.argv) > 2 else 0.3
+    time.ticks_ms = virtual_ticks_ms
+
+    print("Adaptive interval simulation: {:g} h, {:.0%} packet loss, floor {} ms, "
+          "ceiling {} ms, {} events per level".format(
+              hours, loss, config.ADV_INTERVAL_FLOOR_MS, config.ADV_INTERVAL_CEILING_MS,
+              config.ADV_EVENTS_PER_LEVEL))
+    fixed = report('fixed', *simulate(False, hours, loss), hours)
+    adaptive = report('adaptive', *simulate(True, hours, loss), hours)
+    print("  airtime / scan load reduction: {:.1%}".format(1 - adaptive / fixed))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
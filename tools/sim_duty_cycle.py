@@ -0,0 +1,139 @@
+"""
+Deep-Sleep Duty Cycle Simulation
+================================
+Runs main_adv.main() with DEEP_SLEEP_ENABLED through many wakes on the
+host. machine.deepsleep() raises instead of resetting; the loop then
+restarts ticks at zero and calls main() again, with RTC memory kept (see
+tools/host/machine.py). Sleeps inside a wake advance a virtual clock, so
+the simulation runs faster than real time.
+
+A simulated BME280 drifts slowly between wakes, so some wakes find
+nothing beyond the deadbands and skip the radio entirely (only possible
+while the sleep time is below ADV_MAX_STALE_MS).
+
+Reports per-phase awake time (host CPU speed - the radio burst dominates
+on the device too), the share of skipped wakes, that the sequence number,
+broadcast history and oversampling windows survived sleep, and an
+estimated average current and battery life from nominal ESP32 currents.
+
+Usage:
+    python tools/sim_duty_cycle.py [wakes] [sleep_ms] [burst_ms]
+"""
+
+import random
+import sys
+import time
+
+import hostenv
+
+hostenv.quiet()
+
+import config
+
+config.USE_MOCK_SENSORS = False
+config.DS18B20_PIN = None
+config.DEEP_SLEEP_ENABLED = True
+
+import machine
+from machine import I2C
+import duty_cycle
+import main_adv
+from simdevices import BME280Sim
+
+# Nominal ESP32 figures for the estimate (datasheet / typical measurements)
+BOOT_MS = 250                   # ROM bootloader + MicroPython start on the device
+CPU_MA = 40.0                   # CPU on, radio off
+RADIO_MA = 110.0                # Advertising
+SLEEP_MA = 0.01                 # Deep sleep (RTC memory retained)
+ALWAYS_ON_MA = 110.0            # The continuous (non-sleeping) firmware
+BATTERY_MAH = 2000.0
+
+
+def virtual_sleep_ms(ms):
+    """Advance ticks without waiting"""
+    hostenv._epoch -= ms / 1000
+
+
+class RecordingDutyCycle(duty_cycle.DutyCycle):
+    """Keeps a handle on each wake and what load() restored"""
+    last = None
+
+    def run(self):
+        RecordingDutyCycle.last = self
+        super().run()
+
+    def load(self, advertiser, sensor_handler):
+        restored = super().load(advertiser, sensor_handler)
+        self.windows = {sensor.name: sensor.ring.count for sensor in sensor_handler.schedule
+                        if sensor.ring is not None}
+        history = getattr(advertiser, 'history', None)
+        self.history = history.count if history is not None else 0
+        return restored
+
+
+def main():
+    wakes = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    config.DEEP_SLEEP_DURATION_MS = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    config.DEEP_SLEEP_BURST_MS = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+    time.sleep_ms = virtual_sleep_ms
+    duty_cycle.DutyCycle = RecordingDutyCycle
+
+    rng = random.Random(1)
+    I2C.detach_all()
+    bme = I2C.attach(BME280Sim(0x76))
+    machine.power_on()
+
+    totals = dict.fromkeys(duty_cycle.PHASES, 0)
+    sent = 0
+    for _ in range(wakes):
+        hostenv.reset_ticks()
+        bme.adc_t += rng.randint(-60, 60)      # Slow drift
+        bme.adc_p += rng.randint(-20, 20)
+        bme.adc_h += rng.randint(-40, 40)
+        try:
+            main_adv.main()
+        except machine.DeepSleep:
+            pass
+
+        cycle = RecordingDutyCycle.last
+        for i, name in enumerate(duty_cycle.PHASES):
+            totals[name] += cycle.timings[i]
+        if cycle.timings[duty_cycle.PHASE_BURST]:
+            sent += 1
+    seq = machine.RTC._memory[7]
+
+    mean = {name: total / wakes for name, total in totals.items()}
+    cpu_ms = BOOT_MS + mean['restore'] + mean['sample'] + mean['save']
+    radio_ms = mean['advertise'] + mean['burst']
+    period_ms = cpu_ms + radio_ms + config.DEEP_SLEEP_DURATION_MS
+    avg_ma = (cpu_ms * CPU_MA + radio_ms * RADIO_MA
+              + config.DEEP_SLEEP_DURATION_MS * SLEEP_MA) / period_ms
+
+    print("Duty cycle simulation: {} wakes, {} ms sleep, {} ms burst".format(
+        wakes, config.DEEP_SLEEP_DURATION_MS, config.DEEP_SLEEP_BURST_MS))
+    print("  mean phase ms:   {}".format({k: round(v, 1) for k, v in mean.items()}))
+    print("  wakes sent:      {} ({} skipped, nothing beyond deadband)".format(
+        sent, wakes - sent))
+    print("  RTC state:       wakes={} skipped={} seq={} uptime={} s".format(
+        cycle.wakes, cycle.skipped, seq, cycle.uptime_ms // 1000))
+    print("  restored window samples (last wake): {}".format(cycle.windows))
+    print("  restored history entries (last wake): {}".format(cycle.history))
+    print("  est. current:    {:.3f} mA avg (always-on {:.0f} mA), "
+          "{:.0f} days on {:.0f} mAh".format(
+              avg_ma, ALWAYS_ON_MA, BATTERY_MAH / avg_ma / 24, BATTERY_MAH))
+
+    # History restored at the last wake: every earlier broadcast, up to its depth
+    depth = config.ADV_HISTORY_DEPTH + 1 if config.ADV_FORMAT_VERSION >= 3 and config.ADV_HISTORY_DEPTH else 0
+    history_ok = cycle.history == min(sent - (1 if cycle.timings[duty_cycle.PHASE_BURST] else 0), depth)
+
+    ok = (cycle.wakes == wakes and cycle.skipped == wakes - sent and seq == sent & 0xFF
+          and (wakes < 2 or all(count > 1 for count in cycle.windows.values()))
+          and history_ok)
+    if not ok:
+        print("FAIL: state did not survive deep sleep")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
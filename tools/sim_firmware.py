@@ -0,0 +1,279 @@
+"""
+Firmware Simulation
+===================
+Runs the unmodified advertisement-mode entry point, main_adv.main(), on
+CPython in virtual time (tools/virtualtime.py): the asyncio runtime,
+sensor reads, the status LED timer and blocking driver waits all run on
+one clock that skips idle time, so hours pass in seconds.
+
+The node sees a simulated I2C bus (BME280 whose temperature, pressure and
+humidity drift) and a battery on the ADC pin discharging slowly; the fake
+radio logs every gap_advertise with its virtual timestamp. A virtual
+Timer ends the run with a KeyboardInterrupt, so main() shuts down through
+its normal cleanup path. With config.DEEP_SLEEP_ENABLED the node sleeps
+and wakes (main() runs again) until the time is up.
+
+Reported: advertisements per second (radio calls, and those carrying a
+new payload), payload sizes and samples, advertising intervals, the
+advertise-cycle time distribution (deadline to done, so including wake-up
+latency), task lateness, and with tracing on, net allocations by
+firmware file after the first minute (steady state, boot excluded) and
+the peak traced heap.
+
+Usage:
+    python tools/sim_firmware.py [hours] [cpu_scale] [trace]
+
+    cpu_scale  host CPU time charged to the virtual clock: 1 = host speed,
+               ~50 = roughly an ESP32 (default 1)
+    trace      1 = trace allocations (slows the host, and so the charged
+               cycle times, down)
+"""
+
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+import hostenv
+
+hostenv.quiet()
+
+import virtualtime
+
+hours = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+cpu_scale = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+trace = len(sys.argv) > 3 and sys.argv[3] == '1'
+clock = virtualtime.install(cpu_scale)
+
+import bluetooth
+import config
+import machine
+from machine import ADC, I2C, Timer
+from simdevices import BME280Sim
+
+config.USE_MOCK_SENSORS = False
+config.DS18B20_PIN = None
+config.SENSOR_TYPES['voltage'] = True
+config.BATTERY_ADC_PIN = 34
+config.BATTERY_ADC_RATE_HZ = 0      # Free-running bursts: pacing busy-waits on ticks_us
+config.PROFILE_ENABLED = True
+
+import main_adv
+from profiler import Profiler, STAGE_CYCLE
+
+DRIFT_PERIOD_MS = 10000             # Environment changes this often
+CYCLE_BUCKETS_US = (500, 1000, 2000, 5000, 10000, 20000, 50000)
+SAMPLE_PAYLOADS = 3                 # Payloads shown from the start and the end
+WARMUP_MS = 60000                   # Allocations are counted from here
+
+
+class HistogramProfiler(Profiler):
+    """Profiler that also keeps every advertise-cycle time in buckets"""
+
+    def __init__(self):
+        super().__init__()
+        self.buckets = [0] * (len(CYCLE_BUCKETS_US) + 1)
+
+    def add(self, stage, us):
+        super().add(stage, us)
+        if stage == STAGE_CYCLE:
+            i = 0
+            while i < len(CYCLE_BUCKETS_US) and us >= CYCLE_BUCKETS_US[i]:
+                i += 1
+            self.buckets[i] += 1
+
+
+class SimApp(main_adv.AdvertiserApp):
+    """AdvertiserApp that keeps a reference to itself and a histogram"""
+    apps = []
+
+    def __init__(self, ble_advertiser, sensor_handler, leds=None):
+        super().__init__(ble_advertiser, sensor_handler, leds)
+        self.profiler = ble_advertiser.profiler = HistogramProfiler()
+        SimApp.apps.append(self)
+
+
+class Environment:
+    """Slowly drifting sensor values and a discharging battery"""
+
+    def __init__(self, bme, seed=7):
+        self.bme = bme
+        self.rng = random.Random(seed)
+        self.drift = Timer(-1)
+
+    def start(self):
+        self.drift.init(mode=Timer.PERIODIC, period=DRIFT_PERIOD_MS, callback=self.step)
+
+    def step(self, _timer):
+        bme, rng = self.bme, self.rng
+        bme.adc_t += rng.randint(-150, 150)
+        bme.adc_p += rng.randint(-40, 40)
+        bme.adc_h += rng.randint(-80, 80)
+
+    def battery_uv(self):
+        hours = clock.now_us() / 3600e6
+        mv = 12700 - 40 * hours + self.rng.gauss(0, 10)
+        return mv / config.BATTERY_DIVIDER_RATIO * 1000
+
+
+def stop(_timer):
+    raise KeyboardInterrupt
+
+
+def run(end_us, hooks):
+    """main_adv.main() until end_us, through deep-sleep wakes
+
+    Args:
+        end_us: Virtual time to stop at
+        hooks: Objects whose start() arms their timers at each boot
+    """
+    output = io.StringIO()
+    wakes = 0
+    while clock.now_us() < end_us:
+        for hook in hooks:
+            hook.start()
+        Timer(-1).init(mode=Timer.ONE_SHOT, period=(end_us - clock.now_us()) / 1000, callback=stop)
+        try:
+            with contextlib.redirect_stdout(output):
+                main_adv.main()
+            break
+        except KeyboardInterrupt:
+            break
+        except machine.DeepSleep as e:
+            # Reset: timers stop, the node sleeps, then boots again
+            wakes += 1
+            clock.cancel_timers()
+            clock.advance_to(clock.now_us() + e.args[0] * 1000)
+            clock.reset_ticks()
+    return wakes, output.getvalue().count('\n')
+
+
+def report_radio(log, seconds):
+    calls = [entry for entry in log if entry[1] is not None]
+    updates = []
+    previous = None
+    for entry in calls:
+        if entry[2] != previous:
+            updates.append(entry)
+        previous = entry[2]
+    sizes = [len(entry[2]) for entry in calls]
+    intervals = {}
+    for _, interval_us, _ in calls:
+        intervals[interval_us // 1000] = intervals.get(interval_us // 1000, 0) + 1
+    print("Radio")
+    print("  gap_advertise:     {} calls, {:.2f}/s ({} stops)".format(
+        len(calls), len(calls) / seconds, len(log) - len(calls)))
+    print("  new payloads:      {}, {:.2f}/s ({} distinct)".format(
+        len(updates), len(updates) / seconds, len({entry[2] for entry in calls})))
+    if sizes:
+        print("  payload bytes:     min {} mean {:.1f} max {}".format(
+            min(sizes), sum(sizes) / len(sizes), max(sizes)))
+    print("  intervals (ms):    {}".format(
+        ', '.join("{}: {}".format(k, v) for k, v in sorted(intervals.items()))))
+    shown = updates if len(updates) <= 2 * SAMPLE_PAYLOADS else (
+        updates[:SAMPLE_PAYLOADS] + [None] + updates[-SAMPLE_PAYLOADS:])
+    for entry in shown:
+        if entry is None:
+            print("    ...")
+        else:
+            print("    ticks_ms {:>10}  {}".format(entry[0], entry[2].hex()))
+    return len(updates)
+
+
+def report_loop(app):
+    profiler = app.profiler
+    total = sum(profiler.buckets)
+    print("Advertise cycle (deadline to done), {} cycles".format(total))
+    low = 0
+    for i, count in enumerate(profiler.buckets):
+        high = CYCLE_BUCKETS_US[i] if i < len(CYCLE_BUCKETS_US) else None
+        label = "{:>5.1f}-{:<5.1f}ms".format(low / 1000, high / 1000) if high else ">= {:.1f} ms".format(low / 1000)
+        print("  {:<14} {:>8} {:>6.2f}%".format(label, count, 100 * count / max(1, total)))
+        low = high
+    stats = profiler.get_stats()
+    for name in ('poll', 'encode', 'radio', 'rotate', 'gc', 'cycle'):
+        if name in stats:
+            s = stats[name]
+            print("  {:<7} mean {:>6} us  p99 {:>6} us  max {:>6} us".format(
+                name, s['mean_us'], s['p99_us'], s['max_us']))
+    for name, ticker in (('sensor', app.sensor_ticker), ('advertise', app.advertise_ticker),
+                         ('rotate', app.rotate_ticker)):
+        s = ticker.get_stats()
+        print("  {:<9} task: {} ticks, late mean {} us max {} us, {} overruns".format(
+            name, s['ticks'], s['late_mean_us'], s['late_max_us'], s['overruns']))
+
+
+class AllocTrace:
+    """Firmware allocations between a snapshot after warm-up and the end"""
+
+    def __init__(self):
+        self.filters = [tracemalloc.Filter(True, os.path.join(hostenv.ESP32_DIR, '*'))]
+        self.before = None
+        self.timer = Timer(-1)
+        tracemalloc.start()
+
+    def start(self):
+        if self.before is None:
+            self.timer.init(mode=Timer.ONE_SHOT, period=max(0, WARMUP_MS - clock.now_us() // 1000),
+                            callback=self.warm)
+
+    def snapshot(self, _timer=None):
+        return tracemalloc.take_snapshot().filter_traces(self.filters)
+
+    def warm(self, _timer):
+        self.before = self.snapshot()
+
+
+def report_alloc(trace):
+    if trace.before is None:
+        print("Allocations: run shorter than the warm-up, not counted")
+        return
+    stats = trace.snapshot().compare_to(trace.before, 'filename')
+    print("Allocations (firmware files, net from {} s to the end)".format(WARMUP_MS // 1000))
+    for stat in stats:
+        if stat.count_diff or stat.size_diff:
+            print("  {:<22} {:>+6} blocks {:>+8} bytes".format(
+                os.path.basename(stat.traceback[0].filename), stat.count_diff, stat.size_diff))
+    current, peak = tracemalloc.get_traced_memory()
+    print("  traced heap: {} bytes now, {} bytes peak".format(current, peak))
+
+
+I2C.detach_all()
+bme = I2C.attach(BME280Sim(0x76))
+env = Environment(bme)
+ADC.source = env.battery_uv
+main_adv.AdvertiserApp = SimApp
+bluetooth.BLE.adv_log = []
+
+
+def main():
+    end_us = int(hours * 3600e6)
+    alloc = AllocTrace() if trace else None
+    start = time.perf_counter()
+    wakes, lines = run(end_us, [env, alloc] if alloc else [env])
+    wall_s = time.perf_counter() - start
+    seconds = clock.now_us() / 1e6
+
+    print("Firmware simulation: {:.2f} h virtual in {:.1f} s host ({:.0f}x), cpu_scale {}".format(
+        seconds / 3600, wall_s, seconds / wall_s, cpu_scale))
+    print("  idle time skipped: {:.1f}%, deep-sleep wakes: {}, console lines: {}".format(
+        100 * clock.skipped_us / max(1, clock.now_us()), wakes, lines))
+    updates = report_radio(bluetooth.BLE.adv_log, seconds)
+    ok = updates > 0
+    if SimApp.apps:
+        app = SimApp.apps[-1]
+        report_loop(app)
+        print("  status LED: {}".format(app.leds.get_stats() if app.leds else None))
+        ok = ok and app.advertise_ticker.ticks >= seconds * 1000 / config.SENSOR_UPDATE_INTERVAL_MS * 0.99
+    if alloc:
+        report_alloc(alloc)
+        tracemalloc.stop()
+    print("ran to the end on the virtual clock, advertising throughout: {}".format('PASS' if ok else 'FAIL'))
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
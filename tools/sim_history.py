@@ -0,0 +1,243 @@
+"""
+History Backfill Simulation
+===========================
+How much of the data a receiver misses comes back from the history
+frames, for each ADV_HISTORY_DEPTH?
+
+The firmware's FrameAdvertiser runs on the host stubs in virtual time:
+readings drift enough to make an update most seconds, frames rotate every
+ADV_FRAME_ROTATE_MS and one packet goes out per advertising event (plus the
+0-10 ms advDelay). The receiver loses packets in bursts - a two-state
+model with short random losses while good and outages (WiFi coexistence,
+BlueZ restarts) while bad - and feeds the rest through the reference
+decoder and HistoryBackfill.
+
+Reported per depth: updates broadcast, the share received live, recovered
+from history and lost for good, backfilled updates that had been seen
+live (should be 0), the mean error of the recovered timestamps and the
+share of advertising events spent on history frames.
+
+If node is installed, the frames received at the configured depth also go
+through the plugin's sensor class (tools/js_sensor.js), with each tag
+configured to the firmware's path (config.SIGNALK_PATHS) instead of the
+class default: every update missed live and recovered from history must
+show up in the deltas it publishes, with its broadcast timestamp and
+values, on the configured paths and from the same $source as the live
+values.
+
+Usage:
+    python tools/sim_history.py [hours] [outage_s]
+"""
+
+import calendar
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import time
+
+import hostenv
+
+hostenv.quiet()
+sys.path.insert(0, os.path.join(hostenv.ROOT_DIR, 'receiver'))
+
+import config
+import ble_advertiser
+import virtualtime
+from adv_decode import decode, manufacturer_data, FIELDS, HISTORY_VERSION, TO_SIGNALK, HistoryBackfill
+
+DEPTHS = (0, 2, 4, 8, 16)
+ADV_DELAY_MS = 10
+GOOD_LOSS = 0.2                 # Packet loss while the link is good
+GOOD_MEAN_S = 30                # Mean time between outages
+JS_TAGS = ('temperature', 'humidity', 'pressure', 'battery')      # Tags the sensor class publishes
+
+
+class BurstLoss:
+    """Two-state (good/outage) packet loss
+
+    The outage schedule depends on time only, so every depth sees the same
+    outages; random losses while good come from a separate generator.
+    """
+
+    def __init__(self, seed, outage_s):
+        self.schedule = random.Random(seed)
+        self.rng = random.Random(seed + 1)
+        self.outage_ms = outage_s * 1000
+        self.bad = False
+        self.until = self.schedule.expovariate(1 / (GOOD_MEAN_S * 1000))
+
+    def lost(self, now):
+        while now >= self.until:
+            self.bad = not self.bad
+            mean = self.outage_ms if self.bad else GOOD_MEAN_S * 1000
+            self.until += self.schedule.expovariate(1 / mean)
+        return self.bad or self.rng.random() < GOOD_LOSS
+
+
+def simulate(depth, hours, outage_s, frames=None):
+    """One run; frames, if given, collects the received (time, data)"""
+    rng = random.Random(7)
+    clock = virtualtime.VirtualClock(cpu_scale=0)
+    time.ticks_ms = clock.ticks_ms
+    time.ticks_us = clock.ticks_us
+    config.ADV_FORMAT_VERSION = 3
+    config.ADV_HISTORY_DEPTH = depth
+    adv = ble_advertiser.FrameAdvertiser()
+    adv.set_diagnostics(7380, 81234, 3, 12)
+    loss = BurstLoss(11, outage_s)
+    backfill = HistoryBackfill()
+
+    updates = []                # (time, values) per broadcast
+    latest = {}                 # seq -> index of its most recent update
+    live = set()
+    recovered = set()
+    duplicates = 0
+    backfilled = []             # (timestamp, values, update index)
+    errors = []
+    events = history_events = 0
+    reading = {'temperature': 21.0, 'humidity': 55.0, 'pressure': 101325.0}
+
+    end = int(hours * 3600000)
+    next_update = 0
+    next_rotate = config.ADV_FRAME_ROTATE_MS
+    next_adv = rng.uniform(0, ADV_DELAY_MS)
+    while clock.now_ms() < end:
+        now = min(next_update, next_rotate, next_adv)
+        clock.advance_to(int(now) * 1000)
+        if now == next_update:
+            next_update += config.SENSOR_UPDATE_INTERVAL_MS
+            reading['temperature'] += rng.uniform(-0.15, 0.15)
+            reading['humidity'] += rng.uniform(-0.5, 0.5)
+            reading['pressure'] += rng.uniform(-5, 5)
+            if adv.advertise_sensor_data(**reading):
+                expected = {n: round(reading[n] * adv.SCALES[i]) / adv.SCALES[i]
+                            if n in config.ADV_HISTORY_CHANNELS else None
+                            for i, n in enumerate(FIELDS) if n in reading}
+                latest[adv.seq] = len(updates)
+                updates.append((clock.now_ms(), expected))
+                next_adv = now + rng.uniform(0, ADV_DELAY_MS)
+            continue
+        if now == next_rotate:
+            next_rotate += config.ADV_FRAME_ROTATE_MS
+            if adv.rotate():
+                next_adv = now + rng.uniform(0, ADV_DELAY_MS)
+            continue
+
+        next_adv += adv.interval_ms() + rng.uniform(0, ADV_DELAY_MS)
+        events += 1
+        data = manufacturer_data(adv.ble.advertising[1])
+        if data[0] == HISTORY_VERSION:
+            history_events += 1
+        if loss.lost(now):
+            continue
+        if frames is not None:
+            frames.append((clock.now_ms(), data))
+        frame = decode(data)
+        if frame['version'] != HISTORY_VERSION and frame['temperature'] is not None:
+            live.add(latest[frame['seq']])
+        for timestamp, values in backfill.add(frame, clock.now_ms()):
+            # The update this entry repeats: nearest in time with equal values
+            match = min((i for i in range(len(updates))
+                         if all(updates[i][1][n] == values[n] for n in config.ADV_HISTORY_CHANNELS)),
+                        key=lambda i: abs(updates[i][0] - timestamp), default=None)
+            if match is None:
+                continue
+            if match in live:
+                duplicates += 1
+            recovered.add(match)
+            backfilled.append((timestamp, values, match))
+            errors.append(abs(updates[match][0] - timestamp))
+
+    total = len(updates)
+    recovered -= live
+    return {
+        'updates': total,
+        'live': len(live) / total,
+        'recovered': len(recovered) / total,
+        'lost': 1 - (len(live) + len(recovered)) / total,
+        'duplicates': duplicates,
+        'ts_error_ms': sum(errors) / len(errors) if errors else 0,
+        'history_share': history_events / events,
+        'missed': [(timestamp, values) for timestamp, values, match in backfilled if match not in live],
+    }
+
+
+def js_published(node, frames, paths):
+    """Run received frames through the sensor class, tags configured to paths
+
+    Returns:
+        tuple: (set of (timestamp ms, path, value, $source) of every
+        timestamped delta value, set of (path, $source) of live values)
+    """
+    script = os.path.join(hostenv.TOOLS_DIR, 'js_sensor.js')
+    args = [node, script]
+    for tag, path in paths.items():
+        args += ['--path', '{}={}'.format(tag, path)]
+    stdin = ''.join('{} {}\n'.format(t, data.hex()) for t, data in frames)
+    result = subprocess.run(args, input=stdin, capture_output=True, text=True, check=True)
+    published = set()
+    live = set()
+    for line in result.stdout.splitlines():
+        for update in json.loads(line)['delta']['updates']:
+            source = update.get('$source')
+            if 'timestamp' not in update:
+                live.update((value['path'], source) for value in update['values'])
+                continue
+            stamp = update['timestamp']
+            ms = calendar.timegm(time.strptime(stamp[:19], '%Y-%m-%dT%H:%M:%S')) * 1000 + int(stamp[20:23])
+            for value in update['values']:
+                published.add((ms, value['path'], value['value'], source))
+    return published, live
+
+
+def missing(missed, published, live, paths):
+    """Missed updates not found in the backfill deltas on the live paths and $source"""
+    sources = {path: source for path, source in live}
+    count = 0
+    for timestamp, values in missed:
+        if any(values[name] is not None and (timestamp, path, TO_SIGNALK[name](values[name]),
+                                             sources.get(path)) not in published
+               for name, path in paths.items()):
+            count += 1
+    return count
+
+
+def main():
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 2
+    outage_s = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    print("History backfill simulation: {:g} h, {:.0%} loss with {:g} s mean outages "
+          "every {} s".format(hours, GOOD_LOSS, outage_s, GOOD_MEAN_S))
+    print("{:>5} {:>8} | {:>6} {:>9} {:>6} | {:>4} {:>8} | {:>7}".format(
+        'depth', 'updates', 'live', 'recovered', 'lost', 'dups', 'ts err', 'history'))
+    node = shutil.which('node')
+    configured = config.ADV_HISTORY_DEPTH
+    ok = True
+    js_line = None
+    for depth in DEPTHS:
+        frames = [] if node and depth == configured else None
+        r = simulate(depth, hours, outage_s, frames)
+        if frames:
+            paths = {tag: config.SIGNALK_PATHS[tag] for tag in JS_TAGS}
+            published, live = js_published(node, frames, paths)
+            lost = missing(r['missed'], published, live, paths)
+            js_line = ("  sensor class: {} of {} missed updates published with their timestamps, "
+                       "on the configured paths".format(
+                len(r['missed']) - lost, len(r['missed'])))
+            on_paths = {path for path, _ in live} | {entry[1] for entry in published}
+            ok = ok and lost == 0 and r['missed'] and on_paths <= set(paths.values())
+        print("{:>5} {:>8} | {:>6.1%} {:>9.1%} {:>6.1%} | {:>4} {:>6.0f}ms | {:>7.1%}".format(
+            depth, r['updates'], r['live'], r['recovered'], r['lost'], r['duplicates'],
+            r['ts_error_ms'], r['history_share']))
+    if js_line:
+        print(js_line)
+        print("missed updates reach SignalK through the sensor class: {}".format('PASS' if ok else 'FAIL'))
+    else:
+        print("  (node not found: sensor class not checked)")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Garbage Collection Policy Simulation
+====================================
+Compares the old housekeeping policy (gc.collect() every
+HOUSEKEEPING_INTERVAL_MS) with MemoryManager on a modelled MicroPython
+heap, in virtual time.
+
+The model: a heap of HEAP bytes with LIVE bytes reachable; the firmware
+allocates a few hundred bytes per one-second cycle (more while readings
+are changing and during periodic bursts, e.g. a debug dump). A collection
+frees everything but the live set and pauses for a fixed cost plus time
+proportional to the live data (mark) and the heap (sweep). Allocations
+past gc.threshold trigger a collection wherever the firmware happens to
+be - the unpredictable pauses the manager tries to avoid.
+
+Usage:
+    python tools/sim_memory.py [hours]
+"""
+
+import gc
+import random
+import sys
+import time
+
+import hostenv
+
+hostenv.quiet()
+
+import config
+import memory_manager
+import virtualtime
+
+HEAP = 110000
+LIVE = 32000
+CYCLE_MS = config.SENSOR_UPDATE_INTERVAL_MS
+
+
+class ModelHeap:
+    """Stands in for gc.collect/mem_alloc/mem_free/threshold"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.alloc = LIVE
+        self.since_collect = 0
+        self.limit = -1
+        self.collections = 0
+        self.auto = 0
+        self.pause_us = []
+
+    def allocate(self, size):
+        self.alloc += size
+        self.since_collect += size
+        if (self.limit > 0 and self.since_collect >= self.limit) or self.alloc >= HEAP:
+            self.auto += 1
+            self.collect()
+
+    def collect(self):
+        pause = 400 + LIVE // 40 + HEAP // 100
+        self.clock.sleep_us(pause)
+        self.pause_us.append(pause)
+        self.collections += 1
+        self.alloc = LIVE
+        self.since_collect = 0
+
+    def threshold(self, amount=None):
+        if amount is None:
+            return self.limit
+        self.limit = amount
+
+
+def simulate(managed, hours):
+    clock = virtualtime.VirtualClock(cpu_scale=0)
+    heap = ModelHeap(clock)
+    time.ticks_ms = clock.ticks_ms
+    time.ticks_us = clock.ticks_us
+    gc.collect = heap.collect
+    gc.threshold = heap.threshold
+    gc.mem_alloc = lambda: heap.alloc
+    gc.mem_free = lambda: HEAP - heap.alloc
+
+    rng = random.Random(3)
+    manager = memory_manager.MemoryManager() if managed else None
+    heap.collections = heap.auto = 0
+    heap.pause_us = []
+    cycles = int(hours * 3600000 / CYCLE_MS)
+    for cycle in range(cycles):
+        size = rng.randint(150, 450)
+        if cycle % 600 < 20:
+            size += 4000            # Burst
+        # Allocations are spread over the cycle
+        for _ in range(4):
+            heap.allocate(size // 4)
+            clock.sleep_us(CYCLE_MS * 250)
+        if managed:
+            manager.idle()
+        else:
+            heap.collect()
+
+    pauses = sorted(heap.pause_us)
+    return {
+        'collections_per_hour': heap.collections / hours,
+        'outside_idle_slot': heap.auto,
+        'pause_ms_per_hour': sum(pauses) / 1000 / hours,
+        'pause_us_max': pauses[-1] if pauses else 0,
+        'manager': manager.get_stats() if managed else None,
+    }
+
+
+def main():
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 2
+    print("GC policy simulation: {:g} h, {} byte heap, {} byte live set".format(hours, HEAP, LIVE))
+    for label, managed in (('every cycle', False), ('managed', True)):
+        result = simulate(managed, hours)
+        print("  {:<11} {:>7.0f} collections/h, {:>4} outside idle slot, "
+              "{:>7.1f} ms paused/h (max {} us)".format(
+                  label, result['collections_per_hour'], result['outside_idle_slot'],
+                  result['pause_ms_per_hour'], result['pause_us_max']))
+        if result['manager']:
+            stats = result['manager']
+            print("              rate {} B/s, budget {} B, threshold {} B, peak {} B".format(
+                stats['alloc_rate'], stats['budget'], stats['threshold'], stats['peak_alloc']))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Multi-frame Rotation Simulation
+===============================
+How long does a receiver need to see a complete v3 snapshot, for each
+rotation policy, rotation period and frame size?
+
+The firmware's FrameAdvertiser runs on the host stubs in virtual time.
+Each trial puts a new update on air at a random phase of the rotation
+ticker; the advertiser emits one packet per BLE_ADVERTISING_INTERVAL_MS
+(plus the 0-10 ms advDelay the BLE spec adds to every event), and a
+gap_advertise call (a rotation) restarts advertising, so the next packet
+follows within advDelay. The receiver misses each packet with probability
+`loss` (scan window duty cycle, collisions, WiFi coexistence) and feeds the
+rest through the reference SnapshotAssembler. Reported per configuration:
+mean and 95th percentile time until frame 0 (environment channels) and
+until the complete snapshot, and radio re-programs per second. The history
+frame (ADV_HISTORY_DEPTH) takes its slot in the rotation like any other.
+
+Usage:
+    python tools/sim_rotation.py [trials] [loss]
+"""
+
+import os
+import random
+import sys
+
+import hostenv
+
+hostenv.quiet()
+sys.path.insert(0, os.path.join(hostenv.ROOT_DIR, 'receiver'))
+
+import config
+import ble_advertiser
+from adv_decode import decode, manufacturer_data, HISTORY_VERSION, SnapshotAssembler
+
+READING = {'temperature': 21.37, 'humidity': 55.5, 'pressure': 101325.3,
+           'voltage': 12.734, 'battery': 87}
+PROBES = [4.5, 12.25, 60.0, -2.0, 18.5, 19.0, 20.5, 21.0]
+TIMEOUT_MS = 60000
+ADV_DELAY_MS = 10
+
+
+def trial(adv, rng, rotate_ms, loss):
+    """Run one update; returns (ms to frame 0, ms to full snapshot, rotations)"""
+    interval = config.BLE_ADVERTISING_INTERVAL_MS
+    adv._last_adv_ms -= config.ADV_MAX_STALE_MS     # Force a broadcast
+    adv.advertise_sensor_data(probes=PROBES, **READING)
+
+    assembler = SnapshotAssembler()
+    first_ms = None
+    rotations = adv.rotations
+    now = 0.0
+    next_adv = rng.uniform(0, ADV_DELAY_MS)
+    next_rotate = rng.uniform(0, rotate_ms)
+    while now < TIMEOUT_MS:
+        if next_rotate <= next_adv:
+            now = next_rotate
+            next_rotate += rotate_ms
+            if adv.rotate():
+                next_adv = now + rng.uniform(0, ADV_DELAY_MS)
+            continue
+
+        now = next_adv
+        next_adv += interval + rng.uniform(0, ADV_DELAY_MS)
+        if rng.random() < loss:
+            continue
+        frame = decode(manufacturer_data(adv.ble.advertising[1]))
+        if frame['version'] == HISTORY_VERSION:
+            continue
+        if frame['frame'] == 0 and first_ms is None:
+            first_ms = now
+        if assembler.add(frame):
+            return first_ms, now, adv.rotations - rotations
+    return first_ms, None, adv.rotations - rotations
+
+
+def main():
+    trials = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    loss = float(sys.argv[2]) if len(sys.argv) > 2 else 0.3
+    rng = random.Random(1)
+
+    print("Rotation simulation: {} trials per row, {:.0%} packet loss, "
+          "{} ms advertising interval".format(trials, loss, config.BLE_ADVERTISING_INTERVAL_MS))
+    print("{:>11} {:>6} {:>6} {:>6} | {:>9} {:>9} | {:>9} {:>9} {:>8} | {:>7}".format(
+        'policy', 'rot_ms', 'bytes', 'frames', 'f0 mean', 'f0 p95',
+        'full mean', 'full p95', 'timeouts', 'rot/s'))
+
+    for frame_bytes in (18, 10):
+        for policy in ('round_robin', 'primary'):
+            for rotate_ms in (100, 300, 1000):
+                config.ADV_FORMAT_VERSION = 3
+                config.ADV_ADAPTIVE = False
+                config.ADV_FRAME_BYTES = frame_bytes
+                config.ADV_ROTATION_POLICY = policy
+                adv = ble_advertiser.FrameAdvertiser()
+                adv.set_diagnostics(7380, 81234, 3, 12)
+
+                first, full = [], []
+                timeouts = 0
+                rotations = 0
+                for _ in range(trials):
+                    first_ms, full_ms, rot = trial(adv, rng, rotate_ms, loss)
+                    rotations += rot
+                    if full_ms is None:
+                        timeouts += 1
+                        continue
+                    first.append(first_ms)
+                    full.append(full_ms)
+
+                elapsed_s = sum(full) / 1000 or 1
+                print("{:>11} {:>6} {:>6} {:>6} | {:>9.0f} {:>9.0f} | {:>9.0f} {:>9.0f} {:>8} | {:>7.2f}".format(
+                    policy, rotate_ms, frame_bytes, adv.frame_count,
+                    sum(first) / len(first), hostenv.percentile(first, 0.95),
+                    sum(full) / len(full), hostenv.percentile(full, 0.95), timeouts,
+                    rotations / elapsed_s))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
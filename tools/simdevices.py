@@ -0,0 +1,161 @@
+"""
+Simulated Sensor Devices
+========================
+Register-level models of the sensors the firmware drives, for use with
+the fake I2C bus in tools/host/machine.py.
+"""
+
+import struct
+
+from machine import RegisterDevice
+
+# Calibration and raw readings from the BME280 datasheet example
+# (dig_T*, dig_P*) plus typical humidity coefficients.
+BME280_CALIBRATION = {
+    'T': (27504, 26435, -1000),
+    'P': (36477, -10685, 3024, 2855, 140, -7, 15500, -14600, 6000),
+    'H': (75, 362, 0, 313, 50, 30),
+}
+
+
+class BME280Sim(RegisterDevice):
+    """BME280 model: calibration registers plus forced-mode conversions
+
+    Each write of forced mode to ctrl_meas "converts" by copying the raw
+    ADC values (adc_t, adc_p, adc_h) into the data registers.
+    """
+
+    def __init__(self, addr=0x76, adc_t=519888, adc_p=415148, adc_h=30000):
+        super().__init__(addr)
+        self.adc_t = adc_t
+        self.adc_p = adc_p
+        self.adc_h = adc_h
+        self.conversions = 0
+
+        self.regs[0xD0] = 0x60
+        t, p, h = BME280_CALIBRATION['T'], BME280_CALIBRATION['P'], BME280_CALIBRATION['H']
+        self.regs[0x88:0x88 + 24] = struct.pack('<HhhHhhhhhhhh', *(t + p))
+        self.regs[0xA1] = h[0]
+        h4, h5 = h[3], h[4]
+        self.regs[0xE1:0xE8] = struct.pack('<hBBBBb', h[1], h[2], (h4 >> 4) & 0xFF,
+                                           (h4 & 0x0F) | ((h5 & 0x0F) << 4),
+                                           (h5 >> 4) & 0xFF, h[5])
+
+    def on_write(self, reg, data):
+        if reg == 0xF4 and data[0] & 0x03 == 0x01:
+            self.conversions += 1
+            p, t, h = self.adc_p, self.adc_t, self.adc_h
+            self.regs[0xF7:0xFF] = bytes((
+                (p >> 12) & 0xFF, (p >> 4) & 0xFF, (p << 4) & 0xF0,
+                (t >> 12) & 0xFF, (t >> 4) & 0xFF, (t << 4) & 0xF0,
+                (h >> 8) & 0xFF, h & 0xFF,
+            ))
+
+
+class DS18B20Sim:
+    """DS18B20 probe model for the fake one-wire bus
+
+    Convert T latches ``temperature`` (Celsius) quantised to the probe's
+    resolution; Read Scratchpad returns it with a valid CRC.
+    """
+
+    def __init__(self, serial, temperature=20.0):
+        from onewire import crc8
+
+        rom = bytes((0x28,)) + serial.to_bytes(6, 'little')
+        self.rom = rom + bytes((crc8(rom),))
+        self.temperature = temperature
+        self.resolution = 12
+        self.conversions = 0
+        self._latched = 0x0550          # Power-on value: 85 C
+        self._write = None
+
+    def command(self, value):
+        from onewire import crc8
+
+        if value == 0x44:
+            self.conversions += 1
+            raw = int(round(self.temperature * 16))
+            raw &= ~((1 << (12 - self.resolution)) - 1)
+            self._latched = raw & 0xFFFF
+        elif value == 0xBE:
+            config = ((self.resolution - 9) << 5) | 0x1F
+            pad = bytes((self._latched & 0xFF, self._latched >> 8, 0x4B, 0x46,
+                         config, 0xFF, 0x0C, 0x10))
+            return pad + bytes((crc8(pad),))
+        elif value == 0x4E:
+            self._write = []
+        return None
+
+    def data(self, value):
+        if self._write is not None:
+            self._write.append(value)
+            if len(self._write) == 3:
+                self.resolution = ((self._write[2] >> 5) & 0x03) + 9
+                self._write = None
+
+
+def _sht3x_word(value):
+    """16-bit word plus its Sensirion CRC-8"""
+    data = bytes((value >> 8, value & 0xFF))
+    crc = 0xFF
+    for b in data:
+        crc ^= b
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x31) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+    return data + bytes((crc,))
+
+
+class SHT3xSim(RegisterDevice):
+    """SHT3x model: single-shot measurements and the status register
+
+    A measurement command latches ``temperature`` (Celsius) and
+    ``humidity`` (%) as raw words; the next read returns them with CRCs.
+    """
+
+    def __init__(self, addr=0x44, temperature=21.5, humidity=48.0):
+        super().__init__(addr)
+        self.temperature = temperature
+        self.humidity = humidity
+        self.conversions = 0
+        self._out = b''
+
+    def command(self, data):
+        cmd = (data[0] << 8) | data[1]
+        if cmd == 0xF32D:
+            self._out = _sht3x_word(0x8010)
+        elif cmd == 0x2400:
+            self.conversions += 1
+            t = round((self.temperature + 45) * 65535 / 175)
+            h = round(self.humidity * 65535 / 100)
+            self._out = _sht3x_word(t) + _sht3x_word(h)
+
+    def read_raw(self, nbytes):
+        out, self._out = self._out[:nbytes], b''
+        return out
+
+
+class INA219Sim(RegisterDevice):
+    """INA219 model: big-endian 16-bit registers (register n at regs[2n])
+
+    The bus and shunt registers follow ``bus_mv`` and ``shunt_uv``; the
+    reset bit restores the power-on configuration (0x399F).
+    """
+
+    def __init__(self, addr=0x40, bus_mv=12840, shunt_uv=-1250):
+        super().__init__(addr)
+        self.bus_mv = bus_mv
+        self.shunt_uv = shunt_uv
+        self.resets = 0
+        self.write(0, b'\x80\x00')
+
+    def read(self, reg, nbytes):
+        self.regs[2:6] = struct.pack('>hH', self.shunt_uv // 10,
+                                     ((self.bus_mv // 4) << 3) | 0x02)    # CNVR set
+        return bytes(self.regs[2 * reg:2 * reg + nbytes])
+
+    def write(self, reg, data):
+        if reg == 0 and data[0] & 0x80:
+            self.resets += 1
+            data = b'\x39\x9f'
+        self.regs[2 * reg:2 * reg + len(data)] = data
@@ -40,6 +40,14 @@ $files = @(
     "config.py",
     "ble_server.py",
     "sensor_handler.py",
+    "runtime.py",
+    "ringbuffer.py",
+    "log.py",
+    "profiler.py",
+    "status_led.py",
+    "duty_cycle.py",
+    "memory_manager.py",
+    "history.py",
     "main.py"
 )
 
@@ -0,0 +1,197 @@
+"""
+Virtual Time
+============
+One virtual clock behind everything the firmware uses to tell or spend
+time on the host: time.ticks_ms/ticks_us/sleep_ms/sleep_us, machine.Timer
+and the asyncio event loop. Idle time is skipped: when every task is
+waiting, the loop jumps the clock to the next deadline (task or timer)
+instead of sleeping, so hours of the runtime pass in seconds.
+
+While firmware code runs, the clock moves with the host's perf_counter
+scaled by cpu_scale: 1.0 charges code at host speed, a larger factor
+models a slower CPU (MicroPython on an ESP32 is very roughly 30-100x
+slower than CPython on a PC), 0 makes code free. Blocking sleeps advance
+the clock by the requested time.
+
+Timer callbacks run between event loop iterations and inside blocking
+sleeps, as soft timer callbacks run between the firmware's bytecodes.
+
+Usage (after importing hostenv, before importing firmware modules):
+    import virtualtime
+    clock = virtualtime.install(cpu_scale=1.0)
+    asyncio.run(...)        # Event loops created from now on use the clock
+"""
+
+import asyncio
+import heapq
+import math
+import selectors
+import time
+
+import machine
+
+_TICKS_MAX = (1 << 30) - 1
+
+
+class VirtualClock:
+    """Virtual time in microseconds since install()"""
+
+    def __init__(self, cpu_scale=1.0):
+        self.cpu_scale = cpu_scale
+        self._base_us = 0
+        self._mark = time.perf_counter()
+        self._epoch_us = 0          # ticks_ms/ticks_us count from here
+        self._timers = []           # Heap of (due_us, seq, Timer)
+        self._seq = 0
+        self.skipped_us = 0         # Idle time jumped over
+
+    def now_us(self):
+        return self._base_us + int((time.perf_counter() - self._mark) * 1000000 * self.cpu_scale)
+
+    def advance_to(self, us):
+        """Move the clock forward to us (never back)"""
+        now = self.now_us()
+        if us > now:
+            self.skipped_us += us - now
+            now = us
+        self._base_us = now
+        self._mark = time.perf_counter()
+
+    def now_ms(self):
+        return self.now_us() // 1000
+
+    def reset_ticks(self):
+        """Restart ticks_ms/ticks_us at zero, as a reset or deep-sleep wake does"""
+        self._epoch_us = self.now_us()
+
+    # MicroPython time functions
+    def ticks_ms(self):
+        return ((self.now_us() - self._epoch_us) // 1000) & _TICKS_MAX
+
+    def ticks_us(self):
+        return (self.now_us() - self._epoch_us) & _TICKS_MAX
+
+    def sleep_us(self, us):
+        self.advance_to(self.now_us() + us)
+        self.run_timers()
+
+    def sleep_ms(self, ms):
+        self.sleep_us(ms * 1000)
+
+    # Timers
+    def schedule(self, timer, due_us):
+        self._seq += 1
+        heapq.heappush(self._timers, (due_us, self._seq, timer))
+
+    def next_timer_us(self):
+        return self._timers[0][0] if self._timers else None
+
+    def run_timers(self):
+        """Fire the timers that are due"""
+        timers = self._timers
+        while timers and timers[0][0] <= self.now_us():
+            due, _, timer = heapq.heappop(timers)
+            timer._fire(due)
+
+    def cancel_timers(self):
+        """Drop every armed timer (a reset stops them on the device)"""
+        for _, _, timer in self._timers:
+            timer._due = None
+        self._timers = []
+
+
+class Timer:
+    """machine.Timer on the virtual clock"""
+    ONE_SHOT = 0
+    PERIODIC = 1
+    clock = None                    # Set by install()
+
+    def __init__(self, id=-1, **kwargs):
+        self.id = id
+        self._due = None
+        if kwargs:
+            self.init(**kwargs)
+
+    def init(self, mode=PERIODIC, period=-1, callback=None, freq=None):
+        if freq:
+            period = 1000 / freq
+        self._mode = mode
+        self._period_us = max(int(period * 1000), 0)
+        self._callback = callback
+        self._arm(Timer.clock.now_us() + self._period_us)
+
+    def _arm(self, due_us):
+        self._due = due_us
+        Timer.clock.schedule(self, due_us)
+
+    def _fire(self, due_us):
+        if due_us != self._due:
+            return                  # Re-armed or stopped since
+        self._due = None
+        if self._mode == Timer.PERIODIC:
+            self._arm(due_us + max(self._period_us, 1))
+        if self._callback:
+            self._callback(self)
+
+    def deinit(self):
+        self._due = None
+
+
+class _Selector(selectors.DefaultSelector):
+    """Polls without blocking; a wait jumps the clock instead"""
+
+    def __init__(self, clock):
+        super().__init__()
+        self.clock = clock
+
+    def select(self, timeout=None):
+        events = super().select(0)
+        clock = self.clock
+        if not events and timeout != 0:
+            target = clock.next_timer_us()
+            if timeout is not None:
+                wake = clock.now_us() + math.ceil(timeout * 1000000)
+                if target is None or wake < target:
+                    target = wake
+            if target is None:
+                raise RuntimeError("virtual time: every task waits and no timer is armed")
+            clock.advance_to(target)
+        clock.run_timers()
+        return events
+
+
+class VirtualEventLoop(asyncio.SelectorEventLoop):
+    """asyncio event loop whose time is the virtual clock"""
+
+    def __init__(self, clock):
+        super().__init__(_Selector(clock))
+        self.clock = clock
+
+    def time(self):
+        return self.clock.now_us() / 1000000
+
+
+class _Policy(asyncio.DefaultEventLoopPolicy):
+    def __init__(self, clock):
+        super().__init__()
+        self.clock = clock
+
+    def new_event_loop(self):
+        return VirtualEventLoop(self.clock)
+
+
+def install(cpu_scale=1.0):
+    """Put a new virtual clock behind time, machine.Timer and asyncio
+
+    Returns:
+        VirtualClock
+    """
+    clock = VirtualClock(cpu_scale)
+    time.ticks_ms = clock.ticks_ms
+    time.ticks_us = clock.ticks_us
+    time.sleep_ms = clock.sleep_ms
+    time.sleep_us = clock.sleep_us
+    Timer.clock = clock
+    machine.Timer = Timer
+    asyncio.set_event_loop_policy(_Policy(clock))
+    return clock